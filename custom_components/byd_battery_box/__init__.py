@@ -4,16 +4,25 @@ from __future__ import annotations
 
 import logging
 
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+import voluptuous as vol
+
+from homeassistant.config_entries import ConfigEntry, ConfigEntryState
+from homeassistant.core import HomeAssistant, ServiceCall
 from homeassistant.const import Platform
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.typing import ConfigType
 
 from homeassistant.const import CONF_NAME, CONF_HOST, CONF_PORT, CONF_SCAN_INTERVAL
 from .const import (
     DOMAIN,
     CONF_UNIT_ID,
     CONF_BMS_SCAN_INTERVAL,
-    CONF_LOG_SCAN_INTERVAL
+    CONF_LOG_SCAN_INTERVAL,
+    SERVICE_PROFILE_UPDATE_CYCLES,
+    ATTR_CYCLES,
+    ATTR_UPDATE_ALL,
+    DEFAULT_PROFILE_CYCLES,
+    MAX_PROFILE_CYCLES,
 )
 
 from . import hub
@@ -26,6 +35,25 @@ PLATFORMS = [Platform.SENSOR, Platform.BUTTON]
 
 type HubConfigEntry = ConfigEntry[hub.Hub]
 
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+PROFILE_UPDATE_CYCLES_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_CYCLES, default=DEFAULT_PROFILE_CYCLES): vol.All(vol.Coerce(int), vol.Range(min=1, max=MAX_PROFILE_CYCLES)),
+    vol.Optional(ATTR_UPDATE_ALL, default=True): cv.boolean,
+})
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the services of BYD Battery Box."""
+
+    async def profile_update_cycles(call: ServiceCall) -> None:
+        """Profile the next update cycles of the loaded hubs."""
+        for entry in hass.config_entries.async_entries(DOMAIN):
+            if entry.state is ConfigEntryState.LOADED:
+                entry.runtime_data.start_profile(call.data[ATTR_CYCLES], call.data[ATTR_UPDATE_ALL])
+
+    hass.services.async_register(DOMAIN, SERVICE_PROFILE_UPDATE_CYCLES, profile_update_cycles, schema=PROFILE_UPDATE_CYCLES_SCHEMA)
+    return True
+
 async def async_setup_entry(hass: HomeAssistant, entry: HubConfigEntry) -> bool:
     """Set up BYD Battery Box from a config entry."""
 
@@ -42,15 +70,23 @@ async def async_setup_entry(hass: HomeAssistant, entry: HubConfigEntry) -> bool:
 
     # Store an instance of the "connecting" class that does the work of speaking
     # with your actual devices.
-    entry.runtime_data = hub.Hub(hass = hass, name = name, host = host, port = port, unit_id=unit_id, scan_interval = scan_interval, scan_interval_bms = scan_interval_bms, scan_interval_log=scan_interval_log)
+    # the log of previous versions, shared by all entries, is moved to the log folder of the entry when it is the only one
+    migrate_log = len(hass.config_entries.async_entries(DOMAIN)) == 1
+    entry.runtime_data = hub.Hub(hass = hass, name = name, host = host, port = port, unit_id=unit_id, scan_interval = scan_interval, scan_interval_bms = scan_interval_bms, scan_interval_log=scan_interval_log, entry_id=entry.entry_id, migrate_log=migrate_log)
     
     await entry.runtime_data.init_data()
 
     # This creates each HA object for each platform your device requires.
     # It's done by calling the `async_setup_entry` function in each platform module.
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    # reload to add or remove the cell sensors when the options change
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
     return True
 
+async def async_reload_entry(hass: HomeAssistant, entry: HubConfigEntry) -> None:
+    """Reload the config entry after the options changed."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     # This is called when an entry/configured device is to be removed. The class
@@ -13,6 +13,7 @@ from homeassistant.helpers.entity import Entity
 from . import HubConfigEntry
 from .const import (
     BMU_BUTTON_TYPES,
+    BMU_LOG_BUTTON_TYPES,
     ENTITY_PREFIX,
 )
 from .hub import Hub
@@ -30,7 +31,7 @@ async def async_setup_entry(
 
     entities = []
 
-    for info in BMU_BUTTON_TYPES.values():
+    for info in list(BMU_BUTTON_TYPES.values()) + list(BMU_LOG_BUTTON_TYPES.values()):
         button = BydBoxButton(
             platform_name = ENTITY_PREFIX,
             hub = hub,
@@ -93,6 +94,10 @@ class BydBoxButton(ButtonEntity):
     async def async_press(self) -> None:
         """Async: Handle button press"""
 
+        if self._key == 'rebuild_log_files':
+            await self._hub.rebuild_log_files()
+            return
+
         parts = self._key.split('_')
         log_depth = int(float(parts[-1]) * 0.05)
         device = parts[0]
@@ -108,6 +113,11 @@ class BydBoxButton(ButtonEntity):
         """Return the name."""
         return f"{self._name}"
 
+    @property
+    def icon(self):
+        """Return the sensor icon."""
+        return self._icon
+
     @property
     def unique_id(self) -> Optional[str]:
         return f"{self._platform_name}_{self._key}"
@@ -9,8 +9,30 @@ import asyncio
 import binascii
 import json
 import csv
+import functools
 import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from .cellarrays import CELL_ARRAYS, CellArray
 from .extmodbusclient import ExtModbusClient
+from .logdecoder import decode_log_data
+from .logindex import LogIndex
+from .logstore import LogStore
+from .registermap import (
+    BMU_STATUS_REGISTERS,
+    BMS_STATUS_REGISTERS,
+    BYTE_SET_BITS,
+    RegisterBuffer,
+    cell_average,
+    count_cell_balancing,
+    decode_cell_balancing,
+    decode_cell_temps,
+    decode_cell_voltages,
+)
+from .responsedelay import AdaptiveResponseDelay
+from .scheduler import Priority, RequestExpired, scheduled
 
 from .bydbox_const import (
     INVERTER_LIST,
@@ -18,26 +40,18 @@ from .bydbox_const import (
     HVL_INVERTER_LIST,
 
     APPLICATION_LIST,
-    MODULE_TYPE,
     PHASE_LIST,
     WORKING_AREA,
 
-    BMU_CALIBRATION,
     BMU_ERRORS,
     BMU_LOG_CODES,
     BMU_STATUS,
 
     BMS_ERRORS,
     BMS_LOG_CODES,
-    BMU_LOG_ERRORS,
-    BMU_LOG_WARNINGS,
-    BMS_POWER_OFF,
-    BMS_STATUS_ON,
-    BMS_STATUS_OFF,
     BMS_WARNINGS,
     BMS_WARNINGS3,
 
-    DATA_POINTS,
     MODULE_SPECS
 )
 
@@ -53,44 +67,107 @@ class BydBoxClient(ExtModbusClient):
     _cells = 0 # number of cells per module
     _temps = 0 # number of temp sensors per module
     _bat_type = ''
-    _new_logs = {}
-    _b_cells_total = {}
-    _min_response_delay = 0.2 # minimum delayin s after write register
-    _retry_delay = 0.2
-
-    data = {}
-    log = {}
-
-    def __init__(self, host: str, port: int, unit_id: int, timeout: int) -> None:
+    _min_response_delay = 0.2 # delay in s after write register until first ready probe without history
+    _retry_delay = 0.05 # first delay in s between ready probes, increases with each probe
+    _response_timeout = 5
+    _mailbox_page_size = 65 # registers per mailbox page incl. length register
+    _mailbox_page_length = 64 # value of the length register at the start of every page
+    _mailbox_read_sizes = (125, 100, 65) # read sizes to probe, 125 is the modbus limit
+    _mailbox_size_rejections = 2 # rejected probes of a read size before the next smaller size is probed
+    _mailbox_max_requests = 5 # mailbox requests of a read with rejected probes
+    _mailbox_probe_timeout = 2 # s response timeout of a probe, without retries, gateways may drop large reads
+    _mailbox_reuse_buffers = True # the mailbox reads fill preallocated buffers, False allocates a buffer per read (tools/bench_allocations.py)
+    _bms_status_pages = 4
+    _log_pages = 5
+    _log_max_restarts = 3 # restarts of the log paging from the newest entry before a log update fails
+    _log_entry_size = 15 # registers per log entry
+    _log_decoded_size = 1000 # decoded log entries kept, most recently used
+    _log_balancing_cells = 160 # cells in the bit mask of a balancing log entry (code 17)
+    _log_summary_entries = 20 # newest log entries in the log summary
+    default_log_path = './custom_components/byd_battery_box/log/' # log folder shared by all boxes of previous versions
+    _log_file_names = ['byd_log.db', 'byd_log.db-wal', 'byd_log.db-shm', 'byd_log.json', 'byd_log.csv', 'byd.log',
+                       'byd_log_history.json', 'byd_log_sync.json', 'byd_log_balancing.json', 'byd_log_summary.json']
+
+    def __init__(self, host: str, port: int, unit_id: int, timeout: int, log_path: str | None = None) -> None:
         """Init Class"""
         super(BydBoxClient, self).__init__(host = host, port = port, unit_id=unit_id, timeout=timeout, framer='rtu')
 
+        self.data = {}
+        self.log = LogIndex()
+        self.log_loaded = False # the whole log is loaded, until then the log may hold only the newest entries
+        self._new_logs = {}
+        self._unsaved_logs = {} # entries not in the log store yet
+        self._unexported_logs = {} # entries not in the CSV and text files yet
+        self._log_export_last = None # newest key in the CSV and text files, None until checked
         self.data['unit_id'] = unit_id
-
-        self._log_path = './custom_components/byd_battery_box/log/'
+        self._response_delay = AdaptiveResponseDelay(initial_delay=self._min_response_delay, retry_delay=self._retry_delay)
+        self._mailbox_read_size = self._mailbox_read_sizes[0]
+        self._mailbox_read_size_confirmed = False
+        self._mailbox_read_size_rejections = 0
+        self._bms_buffer = RegisterBuffer(self._bms_status_pages * self._mailbox_page_size)
+        self._log_buffer = RegisterBuffer(self._log_pages * self._mailbox_page_size)
+
+        self._log_path = self.default_log_path if log_path is None else log_path
         self._log_csv_path = self._log_path + 'byd_log.csv'
         self._log_txt_path = self._log_path + 'byd.log'
-        self._log_json_path = self._log_path + 'byd_log.json'
-
-    def toggle_busy(func):
-        async def wrapper(self, *args, **kwargs):
-            if self.busy:
-                _LOGGER.debug(f"skip {func.__name__} client busy") 
-                return False
-            self.busy = True
-            error = None
-            try:
-                result = await func(self, *args, **kwargs)
-            except Exception as e:
-                _LOGGER.warning(f'Exception in wrapper {e}')
-                error = e
-            self.busy = False
-            if not error is None:
-                raise error
-            return result
-        return wrapper
-
-    @toggle_busy
+        self._log_json_path = self._log_path + 'byd_log.json' # log of previous versions, imported into the log store
+        self._log_store = LogStore(self._log_path + 'byd_log.db')
+        self._log_history_path = self._log_path + 'byd_log_history.json'
+        self._log_sync_path = self._log_path + 'byd_log_sync.json'
+        self._log_balancing_path = self._log_path + 'byd_log_balancing.json'
+        self._log_summary_path = self._log_path + 'byd_log_summary.json'
+        self.log_page_keys = [] # keys of the entries of the last log page read, newest first
+        self.log_page_new = 0 # new entries on the last log page read
+        self.log_page_restarted = False # page > 0 was requested but the BMU started from the newest entry again
+        self.log_sync = {} # unit_id -> watermark {'head', 'oldest', 'entries', 'complete'}
+        self.log_balancing = {} # unit_id -> {'total': balancing entries, 'cells': balancing entries per cell}
+        self._log_sync_last = {} # unit_id -> oldest key of the last page read
+        self._log_heads = {} # unit_id -> header registers of the newest entry at the last log poll
+        self.counters = {'log_polls': 0, 'log_polls_unchanged': 0, 'log_decode_hits': 0, 'log_decode_misses': 0, 'log_decode_evictions': 0}
+        self._log_decoded = OrderedDict() # log key -> decoded entry, least recently used first
+        self._log_decoded_lock = threading.Lock() # used by the event loop and the executor saving the log
+        self._cell_arrays = {} # data key -> CellArray
+
+    def _cell_array_attribute(self, unit_id: int, name: str, values: list | None) -> dict | None:
+        """Compact attribute of the per cell values of BMS unit_id, rebuilt only when the values changed."""
+        if values is None:
+            return None
+        key = f'bms{unit_id}_{name}'
+        cell_array = self._cell_arrays.get(key)
+        if cell_array is None:
+            cell_array = self._cell_arrays[key] = CellArray(*CELL_ARRAYS[name])
+        return cell_array.update(values)
+
+    def get_cell_values(self, unit_id: int, name: str) -> list | None:
+        """Per cell values of BMS unit_id, a list per module, None before the first BMS status update."""
+        cell_array = self._cell_arrays.get(f'bms{unit_id}_{name}')
+        return None if cell_array is None else cell_array.values
+
+    @property
+    def cell_layout(self) -> tuple:
+        """Modules per BMS, cells and temperature sensors per module."""
+        return self._modules, self._cells, self._temps
+
+    @property
+    def log_path(self) -> str:
+        """Folder of the log files."""
+        return self._log_path
+
+    @property
+    def log(self) -> LogIndex:
+        """Log entries by key, "YYYYmmdd HH:MM:SS-code-unit" -> {'ts', 'u', 'c', 'data'}"""
+        return self._log
+
+    @log.setter
+    def log(self, log: dict) -> None:
+        self._log = log if isinstance(log, LogIndex) else LogIndex(log)
+
+    def close(self, linger: float | None = None):
+        """Release the connection and close the log store, it reopens on next use."""
+        super().close(linger)
+        self._log_store.close()
+
+    @scheduled(Priority.BMU_STATUS)
     async def init_data(self, close = False) -> bool:
 
         if not self._client.connected: await self._client.connect() 
@@ -111,42 +188,127 @@ class BydBoxClient(ExtModbusClient):
         return True
 
     def update_log_from_file(self) -> bool:
+        """Load the whole log at once without an event loop, see load_log_summary and load_log."""
+        entries = self.load_log_summary()
+        if not entries is None:
+            self.update_log_entries_data(entries)
+        entries = self.load_log()
+        self.log_loaded = True
+        if entries is None:
+            return False
+        self.update_log_entries_data()
+        return True
+
+    def _check_log_folder(self) -> bool:
         if not os.path.exists(self._log_path):
             try:
-                os.mkdir(self._log_path)
+                os.makedirs(self._log_path)
                 _LOGGER.warning(f"log did not exist, created new log folder: {self._log_path}")  
                 return False
             except Exception as e:
                 _LOGGER.error(f'Failed to create log folder {self._log_path}')
                 return False
+        return True
 
-        if os.path.isfile(self._log_json_path):
-            try:
-                with open(self._log_json_path, 'r') as openfile:
-                    # Reading from json file
-                    log = json.load(openfile)
-            except Exception as e:
-                _LOGGER.debug(f"Failed loading json log file {e}")   
-                return False       
-            #self.save_log_txt_file(log, append=False)
-            self.log = log        
-            self.data['log_entries'] = len(self.log)    
-            self.data[f'log'] = self.get_log_list(20)
-            self._update_balancing_cells_totals()
-            self.save_log_csv_file()
-            _LOGGER.debug(f"log entries loaded: {len(log)}")  
-
-            #TODO update last_log per unit
-            # last_log = logs[-1]
-            # log = {'ts': ts.timestamp(), 'u': unit_id, 'c': code, 'data': hexdata}
-            # last_log_id = self._get_unit_log_sensor_id(0)                
-            # code_desc = self._get_log_code_desc(unit_id, code)
-            # self.data[last_log_id] = f'{ts.strftime("%m/%d/%Y, %H:%M:%S")} {code} {code_desc}'
-            return True
-        
-        return False
+    def migrate_log_folder(self, path: str) -> bool:
+        """Move the log files of the folder shared by all boxes of previous versions to the log folder of this box."""
+        if os.path.abspath(path) == os.path.abspath(self._log_path) or self._log_store.exists():
+            return False
+        names = [name for name in self._log_file_names if os.path.isfile(path + name)]
+        if len(names) == 0:
+            return False
+        try:
+            os.makedirs(self._log_path, exist_ok=True)
+            for name in names:
+                os.replace(path + name, self._log_path + name)
+        except Exception as e:
+            _LOGGER.error(f"Failed to move the log files of {path} to {self._log_path}: {e}")
+            return False
+        _LOGGER.warning(f"Moved the log files of {path} to the log folder of this box {self._log_path}")
+        return True
+
+    def load_log_summary(self) -> int | None:
+        """Load the log summary saved with the log, fast enough for startup.
+
+        The summary holds the number of entries and the newest entries, with
+        the balancing counters and sync watermarks the log sensors are
+        available before the whole log is loaded by load_log. Returns the
+        number of entries, None without a summary matching the log store.
+        """
+        if not self._check_log_folder() or not os.path.isfile(self._log_summary_path) or not self._log_store.exists():
+            return None
+        try:
+            with open(self._log_summary_path, 'r') as openfile:
+                summary = json.load(openfile)
+            if summary['newest'] != self._log_store.newest_key():
+                _LOGGER.debug(f"log summary does not match the log store, newest entry {summary['newest']}")
+                return None
+        except Exception as e:
+            _LOGGER.error(f"Failed loading log summary {e}")
+            return None
+
+        self.log = summary['latest']
+        self.log_sync = self.load_log_sync()
+        # checked against the log store by load_log
+        self.load_log_balancing(check=False)
+        _LOGGER.debug(f"log summary loaded: {summary['entries']} entries")
+        return summary['entries']
+
+    def load_log(self) -> int | None:
+        """Load the whole log from the log store, slow for large logs.
+
+        Imports the JSON log of previous versions, checks the balancing
+        counters and the CSV and text files and rebuilds them when they do not
+        match the log. Returns the number of entries, None when loading failed
+        or the log is empty.
+        """
+        if not self._check_log_folder():
+            return None
+        try:
+            if self._log_store.count() == 0 and os.path.isfile(self._log_json_path):
+                self._log_store.import_json(self._log_json_path)
+            log = self._log_store.load()
+        except Exception as e:
+            _LOGGER.debug(f"Failed loading log store {e}")   
+            return None
+
+        if len(log) == 0:
+            return None
+
+        #self.save_log_txt_file(log, append=False)
+        self.log = log        
+        self.log_sync = self.load_log_sync()
+        if not self.load_log_balancing():
+            self.rebuild_log_balancing()
+            self.save_log_balancing_file()
+        self.save_log_export_files({})
+        self.save_log_summary_file()
+        _LOGGER.debug(f"log entries loaded: {len(log)}")  
+
+        #TODO update last_log per unit
+        # last_log = logs[-1]
+        # log = {'ts': ts.timestamp(), 'u': unit_id, 'c': code, 'data': hexdata}
+        # last_log_id = self._get_unit_log_sensor_id(0)                
+        # code_desc = self._get_log_code_desc(unit_id, code)
+        # self.data[last_log_id] = f'{ts.strftime("%m/%d/%Y, %H:%M:%S")} {code} {code_desc}'
+        return len(log)
+
+    def update_log_entries_data(self, entries: int | None = None) -> None:
+        """Log sensors of the loaded log, entries defaults to the entries of the log.
+
+        load_log_summary and load_log run in the executor, the sensors are
+        updated by this on the event loop that reads self.data and the cell arrays.
+        """
+        self.data['log_entries'] = len(self.log) if entries is None else entries
+        self.data[f'log'] = self.get_log_list(20)
+        self._update_balancing_cells_totals()
+
+    def save_log_summary_file(self) -> None:
+        """Save the number of entries and the newest entries of the log, see load_log_summary."""
+        summary = {'entries': len(self.log), 'newest': self.log.newest_key(), 'latest': dict(self.log.latest(self._log_summary_entries))}
+        with open(self._log_summary_path, "w") as outfile:
+            json.dump(summary, outfile, indent=1)
 
-    @toggle_busy
     async def update_all_bms_status_data(self) -> bool:
         for bms_id in range(1, self._bms_qty + 1):
             if bms_id > 0:
@@ -161,10 +323,16 @@ class BydBoxClient(ExtModbusClient):
                 return False
         return True   
 
-    @toggle_busy
+    def update_timing_data(self) -> None:
+        """Timing sensors, the p95 in ms of each operation with its summary (see Histogram.summary)."""
+        for name, summary in self.timings.summary().items():
+            self.data[f'timing_{name}'] = summary['p95']
+            self.data[f'timing_{name}_stats'] = summary
+
     async def update_all_log_data(self) -> bool:
         result = False
         self._new_logs = {}
+        self.data['log_new_entries'] = 0
         for device_id in range(self._bms_qty + 1):
             if device_id > 0:
                 await asyncio.sleep(.2)
@@ -176,9 +344,8 @@ class BydBoxClient(ExtModbusClient):
                 _LOGGER.debug(f'Failed update log {self._get_device_name(device_id)} data')
                 return False
 
-        self.data[f'log'] = self.get_log_list(20)
-        self._update_balancing_cells_totals()
-        self.data['log_entries'] = len(self.log)    
+        self.data['log_new_entries'] = len(self._new_logs)
+        self.update_log_entries_data()
         return True
 
     def _update_balancing_cells_totals(self) -> None:
@@ -186,50 +353,60 @@ class BydBoxClient(ExtModbusClient):
             if len(self.log) == 0:
                 # skip until logs are available
                 return
-            balancing_total = [0,0,0]
-            b_cells_total = {}
-            for k, log in self.log.items():
-                if log['c'] == 17:
-                    ts = datetime.fromtimestamp(log['ts'])
-                    decoded = self.decode_bms_log_data(ts, 17, bytearray.fromhex(log['data']))
-                    b_cells = decoded['b_cells']
-                    unit_id = log['u']
-                    balancing_total[unit_id] += 1
-                    unit_b_cells_total = {}
-                    if unit_id in b_cells_total.keys():
-                        unit_b_cells_total = b_cells_total.get(unit_id)
-                    for cell_id in b_cells:
-                        if cell_id in unit_b_cells_total.keys():
-                            unit_b_cells_total[cell_id] += 1
-                        else:
-                            unit_b_cells_total[cell_id] = 1
-                    b_cells_total[unit_id] = unit_b_cells_total
-
-            r1, r2 = None, None
-            if not b_cells_total.get(1) is None:
-                r1 = self._get_balancings_totals_per_module(b_cells_total.get(1))
-            if not b_cells_total.get(2) is None:
-                r2 = self._get_balancings_totals_per_module(b_cells_total.get(2))
-            
-            self.data['bms1_b_total'] = balancing_total[1]
-            self.data['bms2_b_total'] = balancing_total[2]
-            self.data['bms1_b_cells_total'] = r1
-            self.data['bms2_b_cells_total'] = r2
+            units = max([2, self._bms_qty] + list(self.log_balancing.keys()))
+            for unit_id in range(1, units + 1):
+                counters = self.log_balancing.get(unit_id)
+                total = 0 if counters is None else counters['total']
+                self.data[f'bms{unit_id}_b_total'] = total
+                self.data[f'bms{unit_id}_b_cells_total'] = self._cell_array_attribute(unit_id, 'b_cells_total', None if total == 0 else self._get_balancings_totals_per_module(counters['cells']))
         except Exception as e:
             _LOGGER.error(f'Unknown error calculation balancing totals {e}', exc_info=True)
-        #_LOGGER.debug(f'balancing {balancing_total[1]} {self._b_cells_total.get(1)}')
-        #_LOGGER.debug(f'balancing {balancing_total[2]} {self._b_cells_total.get(2)}')
-        
+
+    def _count_log_balancing(self, unit_id, data) -> None:
+        """Add a balancing log entry (code 17) of a BMS to the balancing counters."""
+        counters = self.log_balancing.get(unit_id)
+        if counters is None:
+            counters = self.log_balancing[unit_id] = {'total': 0, 'cells': array('I', bytes(4 * self._log_balancing_cells))}
+        counters['total'] += 1
+        cells = counters['cells']
+        for j in range(self._log_balancing_cells // 8):
+            for bit in BYTE_SET_BITS[data[j]]:
+                cells[j * 8 + bit] += 1
+
+    def rebuild_log_balancing(self) -> None:
+        """Rebuild the balancing counters from all balancing entries of the log."""
+        self.log_balancing = {}
+        for log in self.log.values():
+            if log['c'] == 17 and log['u'] > 0:
+                self._count_log_balancing(log['u'], bytes.fromhex(log['data']))
+        _LOGGER.debug(f'Rebuilt balancing counters from {sum(c["total"] for c in self.log_balancing.values())} log entries')
+
+    def load_log_balancing(self, check=True) -> bool:
+        """Load the balancing counters, False when missing or, with check, not matching the log store."""
+        self.log_balancing = {}
+        if not os.path.isfile(self._log_balancing_path):
+            return False
+        try:
+            with open(self._log_balancing_path, 'r') as openfile:
+                self.log_balancing = {int(unit_id): {'total': counters['total'], 'cells': array('I', counters['cells'])} for unit_id, counters in json.load(openfile).items()}
+        except Exception as e:
+            _LOGGER.error(f"Failed loading balancing counters {e}")
+            return False
+        if not check:
+            return True
+        totals = {unit_id: c['total'] for unit_id, c in self.log_balancing.items() if c['total'] > 0}
+        return totals == {u: n for u, n in self._log_store.count_by_unit(code=17).items() if u > 0}
+
+    def save_log_balancing_file(self) -> None:
+        with open(self._log_balancing_path, "w") as outfile:
+            json.dump({unit_id: {'total': c['total'], 'cells': c['cells'].tolist()} for unit_id, c in self.log_balancing.items()}, outfile)
+
     def _get_balancings_totals_per_module(self, t) -> list:
         r = []
         for m in range(self._modules):
-            mct = []
-            for c in range(self._cells):
-                ct = t.get(str((m * self._cells) + c))
-                if ct is None:
-                    ct = 0
-                mct.append(ct)
-            r.append({'m': m, 'bct':mct})
+            mct = t[m * self._cells:(m + 1) * self._cells].tolist()
+            mct += [0] * (self._cells - len(mct))
+            r.append(mct)
         return r
 
     def _get_inverter_model(self,model,id) -> str:
@@ -352,7 +529,7 @@ class BydBoxClient(ExtModbusClient):
 
         return True
 
-    @toggle_busy
+    @scheduled(Priority.BMU_STATUS, timeout_attr='_timeout')
     async def update_bmu_status_data(self) -> bool:
         """start reading bmu status data"""
         regs = await self.get_registers(address=0x0500, count=21) # 1280
@@ -360,103 +537,83 @@ class BydBoxClient(ExtModbusClient):
             _LOGGER.warning('update_bmu_status_data regs is None')
             return False
 
-        soc = self._client.convert_from_registers(regs[0:1], data_type = self._client.DATATYPE.UINT16)
-        max_cell_voltage = round(self._client.convert_from_registers(regs[1:2], data_type = self._client.DATATYPE.UINT16) * 0.01,2)
-        min_cell_voltage = round(self._client.convert_from_registers(regs[2:3], data_type = self._client.DATATYPE.UINT16) * 0.01,2)
-        soh = self._client.convert_from_registers(regs[3:4], data_type = self._client.DATATYPE.UINT16)
-        current = round(self._client.convert_from_registers(regs[4:5], data_type = self._client.DATATYPE.INT16) * 0.1,1)
-        bat_voltage = round(self._client.convert_from_registers(regs[5:6], data_type = self._client.DATATYPE.UINT16) * 0.01,2)
-        max_cell_temp = self._client.convert_from_registers(regs[6:7], data_type = self._client.DATATYPE.INT16)
-        min_cell_temp = self._client.convert_from_registers(regs[7:8], data_type = self._client.DATATYPE.INT16)
-        bmu_temp = self._client.convert_from_registers(regs[8:9], data_type = self._client.DATATYPE.INT16)
-        # 9-12 ?
+        # see registermap.BMU_STATUS_MAP for the layout
+        start = self.timings.start()
+        v = BMU_STATUS_REGISTERS.decode(regs)
         if regs[9:13] != [0, 792, 0, 0]:
             _LOGGER.debug(f'bmu status reg 9-12: {regs[9:13]} [0, 792, 0, 0]')
-        errors = self._client.convert_from_registers(regs[13:14], data_type = self._client.DATATYPE.UINT16)
-        param_t_v1, param_t_v2 = self.convert_from_registers_int8(regs[14:15]) 
-        output_voltage = round(self._client.convert_from_registers(regs[16:17], data_type = self._client.DATATYPE.UINT16) * 0.01,2)
-        # TODO: change to use standard pymodbus function once HA has been upgraded to later version
-        charge_lfte = self.convert_from_registers(regs[17:19], data_type = self._client.DATATYPE.UINT32, word_order='little') * 0.1
-        discharge_lfte = self.convert_from_registers(regs[19:21], data_type = self._client.DATATYPE.UINT32, word_order='little') * 0.1
-
-        param_t_v = f"{param_t_v1}.{param_t_v2}"
-        efficiency = round((discharge_lfte / charge_lfte) * 100.0,1)
-
-        self.data['soc'] = soc
-        self.data['max_cell_v'] = max_cell_voltage
-        self.data['min_cell_v'] = min_cell_voltage
-        self.data['soh'] = soh
-        self.data['current'] = current
-        self.data['bat_voltage'] = bat_voltage
-        self.data['max_cell_temp'] = max_cell_temp
-        self.data['min_cell_temp'] = min_cell_temp
-        self.data['bmu_temp'] = bmu_temp
-        self.data['errors'] =  self.bitmask_to_string(errors, BMU_ERRORS, 'Normal')    
+
+        param_t_v = f"{v['param_t_v1']}.{v['param_t_v2']}"
+        efficiency = round((v['discharge_lfte'] / v['charge_lfte']) * 100.0,1)
+
+        self.data['soc'] = v['soc']
+        self.data['max_cell_v'] = v['max_cell_v']
+        self.data['min_cell_v'] = v['min_cell_v']
+        self.data['soh'] = v['soh']
+        self.data['current'] = v['current']
+        self.data['bat_voltage'] = v['bat_voltage']
+        self.data['max_cell_temp'] = v['max_cell_temp']
+        self.data['min_cell_temp'] = v['min_cell_temp']
+        self.data['bmu_temp'] = v['bmu_temp']
+        self.data['errors'] =  self.bitmask_to_string(v['errors'], BMU_ERRORS, 'Normal')    
         self.data['param_t_v'] = param_t_v
-        self.data['output_voltage'] = output_voltage
-        self.data['power'] = current * output_voltage
-        self.data['charge_lfte'] = charge_lfte
-        self.data['discharge_lfte'] = discharge_lfte
+        self.data['output_voltage'] = v['output_voltage']
+        self.data['power'] = v['current'] * v['output_voltage']
+        self.data['charge_lfte'] = v['charge_lfte']
+        self.data['discharge_lfte'] = v['discharge_lfte']
         self.data['efficiency'] = efficiency
         self.data[f'updated'] = datetime.now()
+        self.timings.record('decode_bmu_status', start)
 
         return True
        
+    @scheduled(Priority.BMS_STATUS)
     async def update_bms_status_data(self, bms_id) -> bool:
+        """Read the status of a BMS, timed as bms_status."""
+        start = self.timings.start()
+        result = await self._update_bms_status_data(bms_id)
+        self.timings.record('bms_status', start, not result)
+        return result
+
+    async def _update_bms_status_data(self, bms_id) -> bool:
         """start reading status data"""
 
-        await self.write_registers(unit_id=self._unit_id, address=0x0550, payload=[bms_id,0x8100])
- 
-        response_reg = await self._wait_for_response(address = 0x0551)
-        if not response_reg:
+        request = functools.partial(self._request_mailbox, 0x0550, bms_id)
+        if not await request():
             return None
 
-        regs = []
-        for i in range(4):
-            new_regs = await self.get_registers(address=0x0558, count=65)
-            if new_regs is None:
-                _LOGGER.error(f"Failed reading BMS {bms_id} status part {i}", exc_info=True)
-                return False
-            else:
-                regs += new_regs
+        regs = self._mailbox_buffer(self._bms_buffer)
+        regs.clear()
+        if await self._read_mailbox(address=0x0558, pages=self._bms_status_pages, buffer=regs, request=request) is None:
+            _LOGGER.error(f"Failed reading BMS {bms_id} status", exc_info=True)
+            return False
 
         if not len(regs) == 260:
             _LOGGER.error(f"unexpected number of BMS {bms_id} status regs: {len(regs)}")
             return False
 
-        # skip 1st register with length
-        max_voltage = round(self._client.convert_from_registers(regs[1:2], data_type = self._client.DATATYPE.INT16) * 0.001,3)
+        # see registermap.BMS_STATUS_MAP for the layout, 1st register holds the length
+        start = self.timings.start()
+        v = BMS_STATUS_REGISTERS.decode(regs)
+        max_voltage = v['max_c_v']
         if max_voltage > 5:
             _LOGGER.error(f"BMS {bms_id} unexpected max voltage {max_voltage}", exc_info=True)
             return False
-        min_voltage = round(self._client.convert_from_registers(regs[2:3], data_type = self._client.DATATYPE.INT16) * 0.001,3)
-        max_voltage_cell_module, min_voltage_cell_module = self.convert_from_registers_int8(regs[3:4])
-        max_temp = self._client.convert_from_registers(regs[4:5], data_type = self._client.DATATYPE.INT16)
-        min_temp = self._client.convert_from_registers(regs[5:6], data_type = self._client.DATATYPE.INT16)
-        max_temp_cell_module, min_temp_cell_module = self.convert_from_registers_int8(regs[6:7])
-
-        cell_balancing = []
-        balancing_cells = 0
-        for m in range(self._modules):
-            flags = self._client.convert_from_registers(regs[7+m:7+m+1], data_type = self._client.DATATYPE.UINT16)
-            bl = []
-            for bit in range(16):
-                #b = flags & (1>>bit)
-                b = flags >> bit & 1
-                #_LOGGER.debug(f'bit {b} {flags} {bit} {m}')
-                balancing_cells += b 
-                bl.append(b)
-            cell_balancing.append({'m':m+1, 'b':bl})
-
-        # TODO: change to use standard pymodbus function once HA has been upgraded to later version
-        charge_lfte = self.convert_from_registers(regs[15:17], data_type = self._client.DATATYPE.UINT32, word_order='little') * 0.001
-        discharge_lfte = self.convert_from_registers(regs[17:19], data_type = self._client.DATATYPE.UINT32, word_order='little') * 0.001
+        min_voltage = v['min_c_v']
+        max_voltage_cell_module, min_voltage_cell_module = v['max_c_v_id'], v['min_c_v_id']
+        max_temp = v['max_c_t']
+        min_temp = v['min_c_t']
+        max_temp_cell_module, min_temp_cell_module = v['max_c_t_id'], v['min_c_t_id']
+
+        cell_balancing = decode_cell_balancing(regs, self._modules)
+        balancing_cells = count_cell_balancing(regs, self._modules)
+
+        charge_lfte = v['charge_lfte']
+        discharge_lfte = v['discharge_lfte']
         # 20 ? 
-        reg20 = self.convert_from_registers(regs[20:21], data_type = self._client.DATATYPE.UINT16) 
-        reg20a, reg20b = self.convert_from_registers_int8(regs[3:4])
-        _LOGGER.debug(f'bms {bms_id} reg 20: uint16 {reg20} int8 a {reg20a} b {reg20b}')
+        _LOGGER.debug(f'bms {bms_id} reg 20: uint16 {v["reg20"]} int8 a {max_voltage_cell_module} b {min_voltage_cell_module}')
 
-        bat_voltage = round(self._client.convert_from_registers(regs[21:22], data_type = self._client.DATATYPE.INT16) * 0.1,2)
+        bat_voltage = v['bat_voltage']
         # 22 ?
         if regs[22] != 0:
             _LOGGER.debug(f'bms {bms_id} reg 22: {regs[22]} 0')
@@ -464,13 +621,13 @@ class BydBoxClient(ExtModbusClient):
         if regs[23] != 1560:
             _LOGGER.debug(f'bms {bms_id} reg 23: {regs[23]} 1560')
 
-        output_voltage = round(self._client.convert_from_registers(regs[24:25], data_type = self._client.DATATYPE.INT16) * 0.1,2)
-        soc = round(self._client.convert_from_registers(regs[25:26], data_type = self._client.DATATYPE.INT16) * 0.1,2)
-        soh = self._client.convert_from_registers(regs[26:27], data_type = self._client.DATATYPE.INT16)
-        current = round(self._client.convert_from_registers(regs[27:28], data_type = self._client.DATATYPE.INT16) * 0.1,2)
-        warnings1 = self._client.convert_from_registers(regs[28:29], data_type = self._client.DATATYPE.UINT16)
-        warnings2 = self._client.convert_from_registers(regs[29:30], data_type = self._client.DATATYPE.UINT16)
-        warnings3 = self._client.convert_from_registers(regs[30:31], data_type = self._client.DATATYPE.UINT16)
+        output_voltage = v['output_voltage']
+        soc = v['soc']
+        soh = v['soh']
+        current = v['current']
+        warnings1 = v['warnings1']
+        warnings2 = v['warnings2']
+        warnings3 = v['warnings3']
         # 31-47 ?
         if regs[31:42] != [6659, 7683, 256, 20528, 13104, 21552, 12848, 23090, 12848, 14129, 12593]:
             _LOGGER.debug(f'bms {bms_id} reg 31-42: {regs[31:42]} [6659, 7683, 256, 20528, 13104, 21552, 12848, 23090, 12848, 14129, 12593, 13619, 12920, 30840, 30840, 270, 270]')
@@ -479,32 +636,15 @@ class BydBoxClient(ExtModbusClient):
         if regs[44:48] != [30840, 30840, 270, 270]:
             _LOGGER.debug(f'bms {bms_id} reg 44-48: {regs[44:48]} [30840, 30840, 270, 270]')                           
 
-        errors = self._client.convert_from_registers(regs[48:49], data_type = self._client.DATATYPE.UINT16)
-        all_cell_voltages = []
-        cell_voltages= [] # list of dict
-
-        regs_voltages = regs[49:65] + regs[66:130] + regs[131:180]
-        regs_temps = regs[180:195] + regs[196:213] 
-
-        all_cell_temps = []
-        cell_temps = [] # list of dict
+        errors = v['errors']
 
         temp_parts = 0
         if self._temps > 0:
             temp_parts = round(self._temps/2)
 
-        for m in range(self._modules):
-            values = []
-            for i in range(self._cells):
-                 voltage = self._client.convert_from_registers(regs_voltages[i+m*16:i+m*16+1], data_type = self._client.DATATYPE.INT16)
-                 values.append(voltage)
-            all_cell_voltages += values
-            cell_voltages.append({'m':m+1, 'v':values})
-            values = []
-            for i in range(temp_parts):
-                values += self.convert_from_registers_int8(regs_temps[i+m*4:i+m*4+1])
-            all_cell_temps += values
-            cell_temps.append({'m':m+1, 't':values})
+        # values per module, modules overlap when a module has more cells than the stride of 16 registers
+        cell_voltages = decode_cell_voltages(regs, self._modules, self._cells)
+        cell_temps = decode_cell_temps(regs, self._modules, temp_parts)
 
         # calculate quantity cells balancing
         #balancing_cells = 0
@@ -514,8 +654,8 @@ class BydBoxClient(ExtModbusClient):
 
         efficiency = round((discharge_lfte / charge_lfte) * 100.0, 1)
 
-        avg_cell_voltage = round(sum(all_cell_voltages) / len(all_cell_voltages) * 0.001, 3)
-        avg_cell_temp = round(sum(all_cell_temps) / len(all_cell_temps),1)
+        avg_cell_voltage = cell_average(cell_voltages, 0.001, 3)
+        avg_cell_temp = cell_average(cell_temps, 1, 1)
 
         warnings_list = self.bitmask_to_strings(warnings1, BMS_WARNINGS) + self.bitmask_to_strings(warnings2, BMS_WARNINGS) + self.bitmask_to_strings(warnings3, BMS_WARNINGS3)
         warnings = self.strings_to_string(strings=warnings_list, default='Normal', max_length=255)
@@ -542,47 +682,156 @@ class BydBoxClient(ExtModbusClient):
 
         self.data[f'bms{bms_id}_warnings'] = warnings
         self.data[f'bms{bms_id}_errors'] = self.bitmask_to_string(errors, BMS_ERRORS, 'Normal')    
-        self.data[f'bms{bms_id}_cell_balancing'] = cell_balancing
-        self.data[f'bms{bms_id}_cell_voltages'] = cell_voltages
+        self.data[f'bms{bms_id}_cell_balancing'] = self._cell_array_attribute(bms_id, 'cell_balancing', cell_balancing)
+        self.data[f'bms{bms_id}_cell_voltages'] = self._cell_array_attribute(bms_id, 'cell_voltages', cell_voltages)
         self.data[f'bms{bms_id}_avg_c_v'] = avg_cell_voltage
 
-        self.data[f'bms{bms_id}_cell_temps'] = cell_temps
+        self.data[f'bms{bms_id}_cell_temps'] = self._cell_array_attribute(bms_id, 'cell_temps', cell_temps)
         self.data[f'bms{bms_id}_avg_c_t'] = avg_cell_temp
 
         self.data[f'bms{bms_id}_updated'] = updated
+        self.timings.record('decode_bms_status', start)
 
         return True
     
     async def update_log_data(self, unit_id, log_depth = 1) -> bool:
         entries = 0
+        new_entries = 0
         if log_depth == 1: 
             update_last = True 
         else: 
             update_last = False
         
-        for i in range(log_depth):
-            new = await self._read_log_data_unit(unit_id, update_last=update_last)
+        priority = Priority.LOG_POLL if update_last else Priority.LOG_HISTORY
+        page = 0
+        restarts = 0
+        while page < log_depth:
+            try:
+                new = await self._scheduler.submit(functools.partial(self._read_log_data_unit, unit_id, update_last=update_last, page=page), priority=priority)
+            except RequestExpired:
+                return False
             if new is None: 
                 return False
+            if self.log_page_restarted:
+                # BMU started paging from the newest entry again
+                restarts += 1
+                if restarts > self._log_max_restarts:
+                    _LOGGER.error(f'{self._get_device_name(unit_id)} log paging restarted {restarts} times, stopped')
+                    return False
+                page = 1
+            else:
+                page += 1
             entries += new
+            new_entries += self.log_page_new
             if log_depth > 1:
                 if new < 20:
                     break
+                if self.log_sync_covers(unit_id, log_depth):
+                    _LOGGER.debug(f'{self._get_device_name(unit_id)} log already synced up to {log_depth*20} entries')
+                    break
                 _LOGGER.warning(f'...updating {self._get_device_name(unit_id)} log {entries} entries.')
         if log_depth > 1:                
-            _LOGGER.warning(f'Finished updating {self._get_device_name(unit_id)} log; found {entries} log entries.')
+            _LOGGER.warning(f'Finished updating {self._get_device_name(unit_id)} log; found {entries} log entries, {new_entries} new.')
         return True
    
-    async def _wait_for_response(self, address, ready_response = 0x8801):
+    async def update_log_history_page(self, unit_id, page) -> int:
+        """Read page (0 is newest) of 20 log entries of a unit, returns the number of entries or None on failure."""
+        try:
+            return await self._scheduler.submit(functools.partial(self._read_log_data_unit, unit_id, update_last=False, page=page), priority=Priority.LOG_HISTORY)
+        except RequestExpired:
+            return None
+
+    def log_sync_covers(self, unit_id, log_depth) -> bool:
+        """True when the newest log_depth pages of the unit are known."""
+        sync = self.log_sync.get(unit_id)
+        if sync is None:
+            return False
+        return sync['complete'] or sync['entries'] >= log_depth * 20
+
+    def _update_log_sync(self, unit_id, page) -> None:
+        """Update the sync watermark of a unit with the last page read.
+
+        All entries between the watermark 'oldest' and 'head' are known. The
+        BMU continues paging back on consecutive requests for a unit, so a
+        page continues the previous one when it starts at or before its
+        oldest entry and extends the range. Any other page starts at the
+        newest entry; when it overlaps the range the head moves, otherwise
+        the gap makes the range start over.
+        """
+        keys = self.log_page_keys
+        last = self._log_sync_last.get(unit_id)
+        continued = len(keys) > 0 and not last is None and keys[0][:17] <= last[:17]
+        self.log_page_restarted = page > 0 and len(keys) > 0 and not continued
+        if len(keys) == 0:
+            if not last is None and unit_id in self.log_sync:
+                # paged past the oldest entry of the unit
+                self.log_sync[unit_id]['complete'] = True
+            self._log_sync_last.pop(unit_id, None)
+            return
+        self._log_sync_last[unit_id] = keys[-1]
+
+        sync = self.log_sync.get(unit_id)
+        if continued and not sync is None:
+            sync['oldest'] = min(sync['oldest'], keys[-1])
+        elif sync is None or self.log_page_new == len(keys) or keys[-1] > sync['head']:
+            sync = {'head': keys[0], 'oldest': keys[-1], 'entries': 0, 'complete': False}
+        else:
+            sync['head'] = max(sync['head'], keys[0])
+        if len(keys) < 20:
+            # reached the oldest entry of the unit
+            sync['complete'] = True
+        sync['entries'] = self.log.count_keys(start=sync['oldest'], unit_id=unit_id)
+        self.log_sync[unit_id] = sync
+
+    def load_log_sync(self) -> dict:
+        """Load the log sync watermarks per unit."""
+        if not os.path.isfile(self._log_sync_path):
+            return {}
+        try:
+            with open(self._log_sync_path, 'r') as openfile:
+                return {int(unit_id): sync for unit_id, sync in json.load(openfile).items()}
+        except Exception as e:
+            _LOGGER.error(f"Failed loading log sync watermarks {e}")
+            return {}
+
+    def save_log_sync_file(self) -> None:
+        with open(self._log_sync_path, "w") as outfile:
+            json.dump(self.log_sync, outfile, indent=1)
+
+    def load_log_history_job(self) -> dict:
+        """Load the cursor of an unfinished log history update."""
+        if not os.path.isfile(self._log_history_path):
+            return None
+        try:
+            with open(self._log_history_path, 'r') as openfile:
+                return json.load(openfile)
+        except Exception as e:
+            _LOGGER.error(f"Failed loading log history cursor {e}")
+            return None
+
+    def save_log_history_job(self, job: dict) -> None:
+        """Save the cursor of a log history update, None removes it."""
+        if job is None:
+            if os.path.isfile(self._log_history_path):
+                os.remove(self._log_history_path)
+            return
+        with open(self._log_history_path, "w") as outfile:
+            json.dump(job, outfile)
+
+    async def _wait_for_response(self, address, ready_response = 0x8801, unit_id = None):
+        """Wait until the mailbox at address is ready, the delay is learned per mailbox and unit."""
+        key = (address, unit_id)
         response_reg = 0
-        timeout = 5
+        start = time.monotonic()
+        timing_start = self.timings.start()
+        probe = 0
+        probes = 0
         dt = 0
-        #j = 0
-        #start = datetime.now()
-        await asyncio.sleep(self._min_response_delay)
-        while response_reg != ready_response and dt < timeout: # wait for the response
-            await asyncio.sleep(self._retry_delay)
-            dt += self._retry_delay
+        retry_delays = self._response_delay.retry_delays()
+        await asyncio.sleep(self._response_delay.first_delay(key))
+        while True:
+            probe = time.monotonic() - start
+            probes += 1
             try:
                 data = await self.read_holding_registers(unit_id=self._unit_id, address=address, count=1)
                 if not data is None:
@@ -592,18 +841,124 @@ class BydBoxClient(ExtModbusClient):
                         _LOGGER.debug(f"error while waiting for response {address} {data}", exc_info=True)
             except Exception as e:
                 _LOGGER.debug(f"error while waiting for response {address}", exc_info=True)
-            #j += 1
+            dt = time.monotonic() - start
+            if response_reg == ready_response or dt >= self._response_timeout:
+                break
+            await asyncio.sleep(next(retry_delays))
+        self.timings.record('wait_for_response', timing_start, response_reg != ready_response, probes - 1)
         if response_reg == ready_response:
-            #_LOGGER.debug(f'waiting for ready response took {j} pings and {(datetime.now() - start).total_seconds()}s {dt}')
+            self._response_delay.update(key, probe)
             return True
-        elif dt < timeout:
+        elif dt < self._response_timeout:
             _LOGGER.error(f"unexpected wait response {response_reg}", exc_info=True)
             return False
         else:
             _LOGGER.error(f"wait for response timeout. {address}", exc_info=True)
             return False
- 
-    async def _read_log_data_unit(self, unit_id, update_last = True) -> int:
+
+    @property
+    def mailbox_read_size(self) -> dict:
+        """Registers per mailbox read and whether the size is confirmed, see _read_mailbox."""
+        return {'size': self._mailbox_read_size, 'confirmed': self._mailbox_read_size_confirmed}
+
+    @property
+    def response_latencies(self) -> dict:
+        """Learned mailbox ready latencies in s, e.g. {'BMS 1 status': 0.31, 'BMU log': 0.28}"""
+        latencies = {}
+        for (address, unit_id), latency in self._response_delay.latencies.items():
+            if address == 0x0551:
+                name = f'{self._get_device_name(unit_id)} status'
+            elif address == 0x05A1:
+                name = f'{self._get_device_name(unit_id)} log'
+            else:
+                name = f'{address:#06x} {unit_id}'
+            latencies[name] = round(latency, 3)
+        return latencies
+
+    async def _request_mailbox(self, address, unit_id) -> bool:
+        """Request the data of unit_id from the mailbox at address and wait until it is ready."""
+        await self.write_registers(unit_id=self._unit_id, address=address, payload=[unit_id,0x8100])
+        return await self._wait_for_response(address = address + 1, unit_id = unit_id)
+
+    async def _read_mailbox(self, address, pages, buffer: RegisterBuffer, request = None) -> RegisterBuffer:
+        """Read all pages of a mailbox with as few reads as possible.
+
+        The mailbox returns the next registers of its pages with every read, so
+        the pages (each starting with a length register) can be read in chunks
+        up to the modbus limit of 125 registers. The registers are appended to
+        buffer, pass a buffer holding the first pages already read to read the
+        remaining pages.
+
+        Until a read size is confirmed, mailboxes that can be requested again
+        (request, returns True when the mailbox is ready) probe larger sizes,
+        the others are read a page at a time. A probe is accepted when it
+        returns all registers with the length registers of the pages in their
+        places. A rejected probe may have consumed mailbox data, so the mailbox
+        is requested again and read from the first page. A size rejected
+        repeatedly (by an exception response, misplaced length registers or no
+        response within _mailbox_probe_timeout) is replaced by the next smaller
+        one, down to a page per read.
+        """
+        count = pages * self._mailbox_page_size
+        start = self.timings.start()
+        name = 'mailbox_bms_status' if address == 0x0558 else 'mailbox_log'
+        requests = 1
+        while len(buffer) < count:
+            probing = not self._mailbox_read_size_confirmed and not request is None
+            read_size = self._mailbox_read_size if probing or self._mailbox_read_size_confirmed else self._mailbox_page_size
+            size = min(read_size, count - len(buffer))
+            probing = probing and size > self._mailbox_page_size
+            if probing:
+                new_regs = await self.get_registers(address=address, count=size, retries=0, timeout=self._mailbox_probe_timeout)
+            else:
+                new_regs = await self.get_registers(address=address, count=size)
+            if not probing:
+                if new_regs is None or len(new_regs) != size:
+                    self.timings.record(name, start, True)
+                    return None
+                buffer.append(new_regs)
+                continue
+            if new_regs is None or len(new_regs) != size or not self._mailbox_page_headers_valid(len(buffer), new_regs):
+                # gateways may drop reads they do not support, no response rejects the size as well
+                self._reject_mailbox_read_size(size)
+                if requests >= self._mailbox_max_requests or not await request():
+                    self.timings.record(name, start, True)
+                    return None
+                requests += 1
+                buffer.clear()
+                continue
+            self._mailbox_read_size_confirmed = True
+            _LOGGER.debug(f"mailbox read size {self._mailbox_read_size} registers")
+            buffer.append(new_regs)
+        self.timings.record(name, start)
+        return buffer
+
+    def _mailbox_buffer(self, buffer: RegisterBuffer) -> RegisterBuffer:
+        return buffer if self._mailbox_reuse_buffers else RegisterBuffer(buffer.size)
+
+    def _mailbox_page_headers_valid(self, position: int, regs: list) -> bool:
+        """The registers read at position hold the length register of every page they start."""
+        first = -position % self._mailbox_page_size
+        return all(regs[i] == self._mailbox_page_length for i in range(first, len(regs), self._mailbox_page_size))
+
+    def _reject_mailbox_read_size(self, size: int) -> None:
+        self._mailbox_read_size_rejections += 1
+        _LOGGER.debug(f"mailbox read of {size} registers rejected {self._mailbox_read_size_rejections} times")
+        if self._mailbox_read_size_rejections < self._mailbox_size_rejections:
+            return
+        self._mailbox_read_size_rejections = 0
+        smaller_sizes = [s for s in self._mailbox_read_sizes if s < self._mailbox_read_size]
+        self._mailbox_read_size = max(smaller_sizes) if len(smaller_sizes) > 0 else self._mailbox_page_size
+        _LOGGER.debug(f"mailbox read size {self._mailbox_read_size} registers to probe")
+
+    async def _read_log_data_unit(self, unit_id, update_last = True, page = 0) -> int:
+        """Read a log page of a unit, timed as log_poll or log_history_page."""
+        start = self.timings.start()
+        entries = await self._read_log_page(unit_id, update_last, page)
+        self.timings.record('log_poll' if update_last else 'log_history_page', start, entries is None)
+        return entries
+
+    async def _read_log_page(self, unit_id, update_last = True, page = 0) -> int:
         """start reading log data"""
         #_LOGGER.debug(f'start updating log data {self._get_device_name(unit_id)} update_last: {update_last}')
         try:
@@ -612,18 +967,33 @@ class BydBoxClient(ExtModbusClient):
             _LOGGER.error(f"read {self._get_device_name(unit_id)} log data error when requesting data", exc_info=True)
             return None
 
-        response_reg = await self._wait_for_response(address = 0x05A1)
+        response_reg = await self._wait_for_response(address = 0x05A1, unit_id = unit_id)
         if not response_reg:
             return None
 
-        regs = []
-        for i in range(5):
-            new_regs = await self.get_registers(address=0x05A8, count=65)
-            if new_regs is None:
-                _LOGGER.error(f"Failed reading {self._get_device_name(unit_id)} log part: {i}", exc_info=True)
+        regs = self._mailbox_buffer(self._log_buffer)
+        regs.clear()
+        if update_last:
+            # log poll: read the first page and stop when the newest entry did not change
+            self.counters['log_polls'] += 1
+            if await self._read_mailbox(address=0x05A8, pages=1, buffer=regs) is None:
+                _LOGGER.error(f"Failed reading {self._get_device_name(unit_id)} log", exc_info=True)
                 return None
-            else:
-                regs += new_regs[1:] # skip first byte 
+            head = regs[1:5] # code, timestamp and first data byte of the newest entry
+            if head == self._log_heads.get(unit_id):
+                self.counters['log_polls_unchanged'] += 1
+                self.log_page_keys = []
+                self.log_page_new = 0
+                return 0
+
+        if await self._read_mailbox(address=0x05A8, pages=self._log_pages, buffer=regs) is None:
+            _LOGGER.error(f"Failed reading {self._get_device_name(unit_id)} log", exc_info=True)
+            return None
+        if update_last:
+            self._log_heads[unit_id] = head
+
+        start = self.timings.start()
+        regs.strip_page_headers(self._mailbox_page_size) # skip first register with length of each page
 
         if len(regs) == 0 or not len(regs) == 320:
             _LOGGER.error(f"Unexpected number of {self._get_device_name(unit_id)}  log regs: {len(regs)}")
@@ -631,19 +1001,14 @@ class BydBoxClient(ExtModbusClient):
         
         entries = 0
         ts:datetime = None
+        self.log_page_keys = []
+        self.log_page_new = 0
         for i in range(0,20):
-            sub_regs=regs[i*15:i*15+15]
+            entry = regs.view(i*self._log_entry_size, (i+1)*self._log_entry_size)
 
-            data = bytearray()
-            data.append(sub_regs[3] & 0xFF)
-            for reg in sub_regs[4:]:
-                data.append(reg >> 8 & 0xFF)
-                data.append(reg & 0xFF)
-
-            code, year = self.convert_from_registers_int8(sub_regs[0:1])
-            month, day = self.convert_from_registers_int8(sub_regs[1:2])                 
-            hour, minute = self.convert_from_registers_int8(sub_regs[2:3])              
-            second, dummy = self.convert_from_registers_int8(sub_regs[3:4])
+            # code, year, month, day, hour, minute, second then 23 bytes of data
+            code, year, month, day, hour, minute, second = entry[0:7]
+            data = entry[7:]
 
             if year == 0 and month == 0 and day == 0 and code == 0:
                 _LOGGER.debug(f'Reached end: {i} {year}-{month}-{day} {hour}:{minute}:{second} code: {code}')
@@ -668,13 +1033,19 @@ class BydBoxClient(ExtModbusClient):
             
             k = f'{ts.strftime("%Y%m%d %H:%M:%S")}-{code}-{unit_id}' 
             entries += 1
+            self.log_page_keys.append(k)
             #_LOGGER.debug(f'log {i} {k}')
 
             if not k in self.log.keys():
                 hexdata = binascii.hexlify(data).decode('ascii')
                 entry = {'ts': ts.timestamp(), 'u': unit_id, 'c': code, 'data': hexdata}
                 self._new_logs[k] = entry
+                self._unsaved_logs[k] = entry
+                self._unexported_logs[k] = entry
+                if code == 17 and unit_id > 0:
+                    self._count_log_balancing(unit_id, data)
                 self.log[k] = entry
+                self.log_page_new += 1
 
             if update_last and i==0:
                 last_log_id = self._get_unit_log_sensor_id(unit_id)                
@@ -682,6 +1053,8 @@ class BydBoxClient(ExtModbusClient):
                 self.data[last_log_id] = f'{ts.strftime("%m/%d/%Y, %H:%M:%S")} {code} {code_desc}'
 
         self.data['log_count'] = len(self.log)        
+        self._update_log_sync(unit_id, page)
+        self.timings.record('decode_log_page', start)
 
         return entries
 
@@ -706,45 +1079,89 @@ class BydBoxClient(ExtModbusClient):
             code_desc = self.get_value_from_dict(BMS_LOG_CODES, code, 'Not available')
         return code_desc
 
-    def save_log_entries(self, append=True) -> None:
-        # if append:
-        #     self.save_log_txt_file(self._new_logs, append=True)
-        # else:
-        #     self.save_log_txt_file(self.log)
-        self.log = dict(sorted(self.log.items()))
-        self.save_log_csv_file()
-        self.save_log_json_file()
-
-        _LOGGER.debug(f'Saved {len(self._new_logs)} new log entries. Total: {len(self.log)}')
+    def save_log_entries(self, append=True, export=True) -> None:
+        """Save the new log entries.
+
+        append=False rebuilds the export files from the whole log, export=False
+        defers the export of the new entries to a later save, e.g. while a log
+        history update is running.
+        """
+        entries = self._log_store.add(self._unsaved_logs)
+        self._unsaved_logs = {}
+        if export:
+            self.save_log_export_files(self._unexported_logs, rebuild=not append)
+            self._unexported_logs = {}
+        self.save_log_sync_file()
+        self.save_log_balancing_file()
+        if self.log_loaded:
+            self.save_log_summary_file()
+
+        _LOGGER.debug(f'Saved {entries} new log entries. Total: {len(self.log)}')
         return True
 
-    def save_log_json_file(self) -> None:
-        #log_s = dict(sorted(log.items()))
-        with open(self._log_json_path, "w") as outfile:
-            json.dump(self.log, outfile, indent=1, sort_keys=False, default=str)
+    def save_log_export_files(self, new_logs:dict, rebuild=False) -> None:
+        """Append new log entries to the CSV and text files.
+
+        The files are sorted by time, they are rebuilt from the whole log when
+        asked to, when they do not match the log on startup or when a new entry
+        is older than the newest entry exported, e.g. from a log history update.
+        """
+        keys = sorted(new_logs)
+        if not rebuild and self._log_export_last is None:
+            rebuild = not self._log_export_files_match(len(self.log) - len(new_logs))
+            if not rebuild:
+                self._log_export_last = next((k for k in self.log.sorted_keys(reverse=True) if not k in new_logs), '')
+        if not rebuild and len(keys) > 0 and keys[0] <= self._log_export_last:
+            _LOGGER.debug(f'Log entry {keys[0]} older than last exported entry {self._log_export_last}, rebuilding log files')
+            rebuild = True
+
+        if rebuild:
+            keys = list(self.log.sorted_keys())
+            self._log_export_last = ''
+        entries = [(k, self.log[k]) for k in keys]
+        self.save_log_csv_file(entries, append=not rebuild)
+        self.save_log_txt_file(entries, append=not rebuild)
+        if len(keys) > 0:
+            self._log_export_last = keys[-1]
+        if rebuild:
+            _LOGGER.debug(f'Rebuilt log files with {len(keys)} log entries')
+
+    def _log_export_files_match(self, entries) -> bool:
+        """True when the CSV and text files hold a row per log entry."""
+        try:
+            return self._count_lines(self._log_csv_path) == entries + 1 and self._count_lines(self._log_txt_path) == entries
+        except OSError:
+            return False
+
+    def _count_lines(self, path) -> int:
+        lines = 0
+        with open(path, 'rb') as infile:
+            while chunk := infile.read(1 << 20):
+                lines += chunk.count(b'\n')
+        return lines
+
+    def _log_export_rows(self, entries:list):
+        for k, entry in entries:
+            unit_id, unit_name, ts, code, data, code_desc, decoded = self.decode_log_entry(k, entry)
+            yield ts, unit_name, code, code_desc, decoded['desc'], data
 
-    def save_log_txt_file(self, log:dict, append=True) -> None:
+    def save_log_txt_file(self, entries:list, append=True) -> None:
         if append:
             write_type = 'a'
         else:
             write_type = 'w'
         with open(self._log_txt_path, write_type) as myfile:
-            for k, entry in self.log.items():
-                unit_id, unit_name, ts, code, data  = self.split_log_entry(entry)
-                code_desc, decoded = self.decode_log_data(unit_id, ts, code, data)
-                detail = decoded['desc']
+            for ts, unit_name, code, code_desc, detail, data in self._log_export_rows(entries):
                 line = f'{ts.strftime("%Y%m%d %H:%M:%S")} {unit_name} {code} {code_desc} {detail}\n' 
                 myfile.write(line)
 
-    def save_log_csv_file(self) -> None:
-        with open(self._log_csv_path, 'w', newline='') as file:
+    def save_log_csv_file(self, entries:list, append=True) -> None:
+        with open(self._log_csv_path, 'a' if append else 'w', newline='') as file:
             writer = csv.writer(file)
-            writer.writerow(['ts', 'unit','code','description','detail','data'])
+            if not append:
+                writer.writerow(['ts', 'unit','code','description','detail','data'])
             
-            for k, entry in self.log.items():
-                unit_id, unit_name, ts, code, data  = self.split_log_entry(entry)
-                code_desc, decoded = self.decode_log_data(unit_id, ts, code, data)
-                detail = decoded['desc']
+            for ts, unit_name, code, code_desc, detail, data in self._log_export_rows(entries):
                 log_list = [ts.strftime("%Y%m%d %H:%M:%S"), unit_name, code, code_desc, detail, binascii.hexlify(data).decode('ascii')]
                 writer.writerow(log_list)
 
@@ -758,301 +1175,39 @@ class BydBoxClient(ExtModbusClient):
         return unit_id, unit_name, ts, code, data 
 
     def get_log_list(self, max_length) -> list:
-        logs = sorted(self.log.items(), reverse=True)
         log_list = []
-        for k, log in logs[:max_length]:
-            unit_id, unit_name, ts, code, data = self.split_log_entry(log)
-            code_desc, decoded = self.decode_log_data(unit_id, ts, code, data)
+        for k, log in self.log.latest(max_length):
+            unit_id, unit_name, ts, code, data, code_desc, decoded = self.decode_log_entry(k, log)
             detail = decoded.get('desc')
             hexdata = log['data']
-            decoded.pop('desc')
-            log_list.append({'ts': ts, 'u': unit_name, 'c': code, 'd': code_desc, 'data': decoded, 'detail': detail, 'data': hexdata})
+            log_list.append({'ts': ts, 'u': unit_name, 'c': code, 'd': code_desc, 'detail': detail, 'data': hexdata})
 
         return log_list
 
-    def decode_log_data(self, unit_id:int, ts:datetime, code:int, data:bytearray):
-        decoded = {}
-        if unit_id == 0:
-            code_desc = self.get_value_from_dict(BMU_LOG_CODES, code, 'Not available')
-            decoded = self.decode_bmu_log_data(ts, code, data)
-        else:
-            code_desc = self.get_value_from_dict(BMS_LOG_CODES, code, 'Not available')
-            decoded = self.decode_bms_log_data(ts, code, data)
-
-        if len(decoded)>0:
-            decoded['desc'] = self.log_data_to_str(decoded)
-        else:
-            decoded['desc'] = f'Not decoded: {binascii.hexlify(data).decode('ascii')}'
-
-        return code_desc, decoded
+    def decode_log_entry(self, k:str, log:dict) -> tuple:
+        """Split and decode a log entry, the result is cached by log key and must not be modified.
+
+        Returns unit_id, unit_name, ts, code, data, code_desc, decoded.
+        """
+        with self._log_decoded_lock:
+            result = self._log_decoded.get(k)
+            if not result is None:
+                self._log_decoded.move_to_end(k)
+                self.counters['log_decode_hits'] += 1
+                return result
+        start = self.timings.start()
+        unit_id, unit_name, ts, code, data = self.split_log_entry(log)
+        code_desc, decoded = self.decode_log_data(unit_id, ts, code, data)
+        result = (unit_id, unit_name, ts, code, bytes(data), code_desc, decoded)
+        with self._log_decoded_lock:
+            # the log is also decoded by the executor saving the log
+            self.timings.record('decode_log_entry', start)
+            self.counters['log_decode_misses'] += 1
+            self._log_decoded[k] = result
+            if len(self._log_decoded) > self._log_decoded_size:
+                self._log_decoded.popitem(last=False)
+                self.counters['log_decode_evictions'] += 1
+        return result
 
-    def decode_bmu_log_data(self, ts:datetime, code:int, data:bytearray) -> dict:
-        datapoints = {}
-
-        if code == 0:
-            datapoints['bootl'] = data[0]
-            if data[1] == 0:
-                datapoints['exec'] = 'A'
-            elif data[1] == 1:
-                datapoints['exec'] = 'B'
-            else:
-                datapoints['exec'] = data[1]
-            datapoints['firmware_v'] = f"{data[2]:d}" + "." + f"{data[3]:d}" 
-        elif code == 1:
-            if data[0] == 0:
-                datapoints['switchoff'] = '0' 
-            elif data[0] == 1:
-                datapoints['switchoff'] = 'LED button' 
-            else:
-                datapoints['switchoff'] = data[0] 
-        elif code == 2:
-            if data[0] == 0:
-                event = 'Error/Warning cleared'
-            else:            
-                error_code = data[1]
-                if error_code != 23:
-                    error = self.get_value_from_dict(BMU_LOG_ERRORS, error_code, 'Undefined')
-                    event = f'Error; {error.lower()}'
-                else:
-                    warnings = int(data[2] * 0x100 + data[3])
-                    warnings_list = self.bitmask_to_strings(warnings, BMU_LOG_WARNINGS)
-                    event = f'Warning; {self.strings_to_string(warnings_list).lower()}'
-
-            datapoints['event'] = event
-            datapoints['c_max_v'] = self.convert_from_byte_uint16(data,4)
-            datapoints['c_min_v'] = self.convert_from_byte_uint16(data,6)
-            datapoints['bat_max_t'] = data[8]
-            datapoints['bat_min_t'] = data[9]
-            datapoints['bat_v'] =  self.calculate_value(self.convert_from_byte_uint16(data,10), -1, 1) 
-            datapoints['soc'] = data[12]                
-            datapoints['soh'] = data[13]  
-        elif code == 32:
-            datapoints['p_status'] = self.get_value_from_dict(BMU_STATUS, data[1], 'NA')
-            datapoints['n_status'] = self.get_value_from_dict(BMU_STATUS, data[0], 'Undefined')
-        elif code == 34:
-            datapoints['firmware_v'] = f"{data[1]:d}" + "." + f"{data[2]:d}" 
-            datapoints['mcu'] = data[4]
-        elif code == 35:
-            datapoints['firmware_v'] = f"{data[1]:d}" + "." + f"{data[2]:d}" 
-            datapoints['mcu'] = data[4]
-        elif code == 36:
-            running_time = data[0] * 0x01000000 + data[1] * 0x00010000 + data[2] * 0x00000100 + data[3]
-            datapoints['rtime'] = running_time
-            datapoints['bmu_qty_c'] = data[4]
-            datapoints['bmu_qty_t'] = data[5]
-            datapoints['c_max_v'] = self.convert_from_byte_uint16(data,6)
-            datapoints['c_min_v'] = self.convert_from_byte_uint16(data,8)
-            datapoints['c_max_t'] = data[10]
-            datapoints['c_min_t'] = data[11]
-            datapoints['out_a'] = self.calculate_value(self.convert_from_byte_int16(data,12), -1, 1)
-            datapoints['out_v'] = self.calculate_value(self.convert_from_byte_uint16(data,14), -1, 1)
-            datapoints['acc_v'] = self.calculate_value(self.convert_from_byte_uint16(data,16), -1, 1)
-            datapoints['bms_addr'] = data[18]
-            datapoints['m_type'] = self.get_value_from_dict(MODULE_TYPE, data[19], 'Undefined')
-            datapoints['m_qty'] = data[20]
-        elif code == 38:
-            datapoints['max_charge_a'] = self.calculate_value(self.convert_from_byte_int16(data,0), -1, 1)
-            datapoints['max_discharge_a'] = self.calculate_value(self.convert_from_byte_int16(data,2), -1, 1)
-            datapoints['max_charge_v'] = self.calculate_value(self.convert_from_byte_int16(data,4), -1, 1)
-            datapoints['max_discharge_v'] = self.calculate_value(self.convert_from_byte_int16(data,6), -1, 1)
-            datapoints['status'] = [self.get_value_from_dict(BMU_STATUS, data[8], 'Undefined')]
-            datapoints['bat_t'] = data[9]
-            datapoints['inverter'] = INVERTER_LIST[data[10]]
-            datapoints['bms_qty'] = data[11]
-        elif code == 40:
-            datapoints['firmware_n1']  = data[0]    
-            datapoints['firmware_v1']  = f"{data[1]:d}" + "." + f"{data[2]:d}"
-            datapoints['firmware_n2']  = data[3]    
-            datapoints['firmware_v2']  = f"{data[4]:d}" + "." + f"{data[5]:d}"
-            if data[6] != 0xFF:
-                datapoints['firmware_n3']  = data[6]    
-                datapoints['firmware_v3']  = f"{data[7]:d}" + "." + f"{data[8]:d}"
-        elif code == 41:
-            # ?
-            pass
-        elif code == 45:
-            #status = self.get_value_from_dict(BMU_STATUS, data[0], 'Undefined')
-            datapoints['status'] = f'{data[0]}'
-            # 0: 0-1
-            # 1: 0
-            # 2: 0-1
-            # 3: x02
-            datapoints['out_v'] =  self.calculate_value(self.convert_from_byte_uint16(data,4), -1, 1) 
-            datapoints['bat_v'] =  self.calculate_value(self.convert_from_byte_uint16(data,6), -1, 1) 
-            # 8: 00
-            # 9: 00
-            datapoints['soc_a'] = self.calculate_value(self.convert_from_byte_uint16(data,10), -1, 1)
-            datapoints['soc_b'] = self.calculate_value(self.convert_from_byte_uint16(data,12), -1, 1)
-        elif code == 101:
-            if data[0] == 0:
-                datapoints['bms_updt'] = 'A'
-            else:
-                datapoints['bms_updt'] = 'A'
-            datapoints['firmware_v'] = f"{data[1]:d}" + "." + f"{data[2]:d}" 
-        elif code == 102:
-            if data[0] == 0:
-                datapoints['bms_updt'] = 'A'
-            else:
-                datapoints['bms_updt'] = 'A'
-            datapoints['firmware_v'] = f"{data[1]:d}" + "." + f"{data[2]:d}" 
-        elif code == 103:
-            datapoints['firmware_n1']  = data[0]    
-            datapoints['firmware_v1']  = f"{data[1]:d}" + "." + f"{data[2]:d}"
-            datapoints['firmware_n2']  = data[3]    
-            datapoints['firmware_v2']  = f"{data[4]:d}" + "." + f"{data[5]:d}"
-        elif code == 105:
-            if (data[0] == 0) or (data[0] == 1) or (data[0] == 2):
-               # BMU Parameters table update
-                #datapoints['pt_u'] = ''
-                pass
-            else:
-                # ?
-                pass
-            datapoints['pt_v'] = f"{data[1]:d}" + "." + f"{data[2]:d}"
-        elif code == 111:            
-            datapoints['dt_cal'] = self.get_value_from_dict(BMU_CALIBRATION, data[0], 'Undefined')
-        elif code == 118:
-            status = self.get_value_from_dict(BMU_STATUS, data[0], 'Undefined')
-            datapoints['status'] = [status]
-            if status != 'Undefined':
-                datapoints['env_min_t'] = data[1]                
-                datapoints['env_max_t'] = data[2]                
-                datapoints['soc'] = data[3]                
-                datapoints['soh'] = data[4]                
-                datapoints['bat_t'] = data[5]
-                datapoints['bat_v'] = self.calculate_value(self.convert_from_byte_uint16(data,6), -1, 1) 
-                datapoints['c_max_v'] = self.convert_from_byte_uint16(data,8)
-                datapoints['c_min_v'] = self.convert_from_byte_uint16(data,10)
-                datapoints['bat_max_t'] = data[13]
-                datapoints['bat_min_t'] = data[15]
- 
-        return datapoints
-
-    def decode_bms_log_data(self, ts:datetime, code:int, data:bytearray) -> dict:
-        datapoints = {}
-
-        if code == 0:
-            datapoints['bootl'] = data[0]
-            if data[1] == 0:
-                datapoints['exec'] = 'A'
-            elif data[1] == 2:
-                datapoints['exec'] = 'B'
-            else:
-                datapoints['exec'] = data[1]
-            datapoints['firmware_v'] = f"{data[3]:d}" + "." + f"{data[4]:d}" 
-        elif code == 1:
-            datapoints['power_off'] =self.get_value_from_dict(BMS_POWER_OFF, data[1], default='NA')
-
-            if data[2] == 0:
-                datapoints['section'] = 'A'
-            elif data[2] == 1:
-                datapoints['section'] = 'B'
-            else:
-                datapoints['section'] = data[2]
-
-            datapoints['firmware_v']  = f"{data[3]:d}" + "." + f"{data[4]:d}"
-        elif code in [2,3,4,5,6,7,9,10,11,13,14,16,19,20,21]:            
-            warnings1 = int(data[1] * 0x100 + data[0])
-            warnings2 = int(data[3] * 0x100 + data[2])
-            warnings3 = int(data[5] * 0x100 + data[4])
-            warnings_list = self.bitmask_to_strings(warnings1, BMS_WARNINGS) + self.bitmask_to_strings(warnings2, BMS_WARNINGS) + self.bitmask_to_strings(warnings3, BMS_WARNINGS3)
-            datapoints['warnings'] = warnings_list
-
-            errors = int(data[7] * 0x100 + data[6])
-            errors_list = self.bitmask_to_strings(errors, BMS_ERRORS)
-            datapoints['errors'] = errors_list
-
-            status = int(data[8])
-            if (status % 2) == 1:
-                status_list = self.bitmask_to_strings(status, BMS_STATUS_OFF)            
-            else:
-                status_list = self.bitmask_to_strings(status, BMS_STATUS_ON)
-            datapoints['status'] = status_list
-
-            if code == 9:
-                datapoints['bat_idle'] = data[9]
-                datapoints['target_soc'] = data[10]
-            elif code == 20:
-                datapoints['bmu_serial_v1'] = data[9]
-                datapoints['bmu_serial_v2'] = data[10]
-            else:
-                datapoints['soc'] = data[9]
-                datapoints['soh'] = data[10]
-                datapoints['bat_v'] = self.calculate_value(self.convert_from_byte_uint16(data,11,'LE'), -1, 1)
-                datapoints['out_v'] = self.calculate_value(self.convert_from_byte_uint16(data,13,'LE'), -1, 1)
-                datapoints['out_a'] = self.calculate_value(self.convert_from_byte_int16(data,15,'LE'), -1, 1)
-
-            if code == 21:
-                datapoints['c_max_v_n'] = data[17]
-                datapoints['c_min_v_n'] = data[18]
-                datapoints['c_max_t_n'] = data[20]
-                datapoints['c_min_t_n'] = data[21]
-            else:
-                datapoints['c_max_v'] = self.convert_from_byte_uint16(data,17,'LE')
-                datapoints['c_min_v'] = self.convert_from_byte_uint16(data,19,'LE')
-                datapoints['c_max_t'] = data[21]
-                datapoints['c_min_t'] = data[22]
-        elif code in [17,18]:
-            if code == 17:
-                bc = []
-                i = 0
-                for j in range(20):  
-                    b = int(data[j])
-                    for bit in range(8):
-                        if b >> bit & 1:
-                            bc.append(str(i))
-                        i += 1
-                datapoints['b_cells'] = bc
-
-            c_min_v = self.convert_from_byte_uint16(data,21,'LE')
-            datapoints['c_min_v'] = c_min_v
-        elif code in [101,102]:
-            if data[0] == 0:
-                datapoints['area'] = 'A'
-            else:
-                datapoints['area'] = 'B'
-            datapoints['firmware_p']  = f"{data[2]:d}" + "." + f"{data[1]:d}"
-            datapoints['firmware_n']  = f"{data[4]:d}" + "." + f"{data[3]:d}"
-        elif code == 105:
-            x = self.convert_from_byte_uint16(data, 0, type='LE')
-            y = self.convert_from_byte_uint16(data, 2, type='LE')
-#            datapoints['threshold']  = f"{x:d}" + "." + f"{y:d}"
-            datapoints['pt_v']  = f"{x:d}" + "." + f"{y:d}"
-        elif code == 106:
-            datapoints['sn_change'] = 1
-        elif code == 111:
-            try:
-                nt = datetime(year=data[0]+2000, month=data[1], day=data[2], hour=data[3], minute=data[4], second=data[5])
-                datapoints['nt'] = nt
-            except Exception as e:
-                _LOGGER.error(f'Failed to convert to datetime {data[0]} {data[1]} {data[2]} {data[3]} {data[4]} {data[5]} {e}')
-            #datapoints['dt'] = (ts - nt).total_seconds()
-
-        return datapoints
-
-    def log_data_to_str(self, data) -> str:
-        strings = []
-        for dp, v in data.items():
-            dp_config = DATA_POINTS.get(dp)
-            if not dp_config is None:
-                s = f"{dp_config['label']}: "
-                t = dp_config.get('type')
-                if t in ['nlist','slist']:
-                    if len(v) > 0:
-                        if t == 'slist':
-                            s += ', '.join(v)
-                        else:
-                            s += ','.join(v)                        
-                    else:
-                        s += '-'
-                elif t == 's': # string
-                    s = dp_config['label'].replace('{v}', f'{v}')
-                else: # 'n' numeric
-                    s += f"{v}"
-                    unit = dp_config.get('unit')
-                    if len(unit) > 0:
-                        s += f" {unit}"
-                strings.append(s)
-            else:
-                _LOGGER.error(f'Datapoint {dp} not defined')
-        return f"{'. '.join(strings)}."
\ No newline at end of file
+    def decode_log_data(self, unit_id:int, ts:datetime, code:int, data:bytearray):
+        return decode_log_data(unit_id, code, data)
\ No newline at end of file
@@ -0,0 +1,62 @@
+"""Compact state attributes of per cell values"""
+
+def pack_hex(digits: int):
+    """Packer of the values of a module into a string of digits hex digits per value.
+
+    Values are masked to the digits, so each value keeps its position in the string.
+    """
+    template = f'{{:0{digits}x}}'
+    mask = (1 << 4 * digits) - 1
+    def pack(values: list) -> str:
+        return ''.join([template.format(v & mask) for v in values])
+    return pack
+
+def pack_bits(values: list) -> int:
+    """Flags of a module as bitmask, bit 0 for cell 1."""
+    mask = 0
+    for i, flag in enumerate(values):
+        if flag:
+            mask |= 1 << i
+    return mask
+
+def pack_list(values) -> list:
+    return list(values)
+
+class CellArray:
+    """Versioned state attribute of the per cell values of a BMS, one item per module.
+
+    {'ver': version, name: [packed values of module 1, module 2, ...]}
+
+    The attribute is rebuilt and its version increased only when the values
+    changed. Otherwise update returns the same attribute, so the state of
+    the sensor is not written again.
+    """
+
+    def __init__(self, name: str, pack) -> None:
+        """Init Class"""
+        self._name = name
+        self._pack = pack
+        self._values = None
+        self.version = 0
+        self.attribute = None
+
+    @property
+    def values(self) -> list | None:
+        """Values per module of the last update."""
+        return self._values
+
+    def update(self, values: list) -> dict:
+        """Attribute of the values per module."""
+        if values != self._values:
+            self._values = values
+            self.version += 1
+            self.attribute = {'ver': self.version, self._name: [self._pack(v) for v in values]}
+        return self.attribute
+
+# attribute item name and packer per data key suffix
+CELL_ARRAYS = {
+    'cell_voltages': ('v', pack_hex(3)), # mV
+    'cell_temps': ('t', pack_hex(2)), # °C
+    'cell_balancing': ('b', pack_bits),
+    'b_cells_total': ('bct', pack_list),
+}
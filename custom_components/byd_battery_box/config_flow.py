@@ -6,7 +6,7 @@ from typing import Any
 import voluptuous as vol
 import asyncio
 from homeassistant import config_entries, exceptions
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 
 from .hub import Hub
 from homeassistant.const import CONF_NAME, CONF_HOST, CONF_PORT, CONF_SCAN_INTERVAL
@@ -21,6 +21,8 @@ from .const import (
     CONF_BMS_SCAN_INTERVAL,
     DEFAULT_LOG_SCAN_INTERVAL,
     CONF_LOG_SCAN_INTERVAL,
+    DEFAULT_CELL_SENSORS,
+    CONF_CELL_SENSORS,
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -47,6 +49,7 @@ DATA_SCHEMA = vol.Schema(
         vol.Optional(CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL): int,
         vol.Optional(CONF_BMS_SCAN_INTERVAL, default=DEFAULT_BMS_SCAN_INTERVAL): int,
         vol.Optional(CONF_LOG_SCAN_INTERVAL, default=DEFAULT_LOG_SCAN_INTERVAL): int,
+        vol.Optional(CONF_CELL_SENSORS, default=DEFAULT_CELL_SENSORS): bool,
     }
 )
 
@@ -98,6 +101,11 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     # changes.
     CONNECTION_CLASS = config_entries.CONN_CLASS_LOCAL_PUSH
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: config_entries.ConfigEntry) -> OptionsFlow:
+        return OptionsFlow()
+
     async def async_step_user(self, user_input=None):
         """Handle the initial step."""
         # This goes through the steps to take the user through the setup process.
@@ -138,6 +146,18 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             step_id="user", data_schema=DATA_SCHEMA, errors=errors
         )
 
+class OptionsFlow(config_entries.OptionsFlow):
+    """Handle the options, the entry is reloaded on change."""
+
+    async def async_step_init(self, user_input=None):
+        if user_input is not None:
+            return self.async_create_entry(data=user_input)
+
+        cell_sensors = self.config_entry.options.get(CONF_CELL_SENSORS, self.config_entry.data.get(CONF_CELL_SENSORS, DEFAULT_CELL_SENSORS))
+        return self.async_show_form(
+            step_id="init", data_schema=vol.Schema({vol.Optional(CONF_CELL_SENSORS, default=cell_sensors): bool})
+        )
+
 class CannotConnect(exceptions.HomeAssistantError):
     """Error to indicate we cannot connect."""
 
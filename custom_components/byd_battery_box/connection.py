@@ -0,0 +1,111 @@
+"""Modbus connections shared by the clients of a gateway"""
+
+import asyncio
+import contextlib
+import logging
+
+from pymodbus.client import AsyncModbusTcpClient
+
+from .scheduler import RequestScheduler
+
+_LOGGER = logging.getLogger(__name__)
+
+class SharedConnection:
+    """Modbus TCP connection to a gateway and the lock of its RS485 bus.
+
+    All clients of the gateway, e.g. boxes with different unit ids, send
+    their requests over this connection. The request scheduler is the bus
+    lock: one operation at a time, by priority and within a priority in
+    order of submission so no client starves the others.
+    """
+
+    def __init__(self, key: str, host: str, port: int, framer: str, timeout: int) -> None:
+        """Init Class"""
+        self.key = key
+        self.client = AsyncModbusTcpClient(host=host, port=port, framer=framer, timeout=timeout)
+        self.scheduler = RequestScheduler()
+        self.timeout = timeout
+        self.refs = 0
+        self._close_handle = None
+
+    def acquire(self, timeout: int) -> None:
+        self.refs += 1
+        if timeout > self.timeout:
+            self.set_timeout(timeout)
+        if not self._close_handle is None:
+            self._close_handle.cancel()
+            self._close_handle = None
+            _LOGGER.debug(f'reuse connection {self.key}')
+
+    def set_timeout(self, timeout: int) -> None:
+        """Set the connect and response timeout, the longest timeout of the clients is used."""
+        self.timeout = timeout
+        # the transaction manager of pymodbus keeps its own copy of the parameters
+        for params in (self.client.comm_params, getattr(getattr(self.client, 'ctx', None), 'comm_params', None)):
+            if not params is None:
+                params.timeout_connect = timeout
+        _LOGGER.debug(f'timeout of connection {self.key} {timeout}')
+
+    @contextlib.contextmanager
+    def limit_requests(self, timeout: float, retries: int = 0):
+        """Shorter response timeout and fewer pymodbus retries for the requests of the block.
+
+        Used by requests that may not be answered, e.g. probes of the mailbox
+        read size, so they do not hold the bus for retries x timeout. The
+        block must hold the bus lock, the limits apply to the connection.
+        """
+        ctx = getattr(self.client, 'ctx', None)
+        if ctx is None:
+            yield
+            return
+        retries_before = ctx.retries
+        ctx.comm_params.timeout_connect = min(timeout, self.timeout)
+        ctx.retries = retries
+        try:
+            yield
+        finally:
+            ctx.comm_params.timeout_connect = self.timeout
+            ctx.retries = retries_before
+
+    def release(self, linger: float) -> None:
+        self.refs -= 1
+        if self.refs > 0:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None or linger <= 0:
+            self.close()
+        else:
+            # keep the connection open for a client created shortly after, e.g. config flow then setup
+            self._close_handle = loop.call_later(linger, self.close)
+
+    def close(self) -> None:
+        self._close_handle = None
+        if self.refs > 0:
+            return
+        if _connections.get(self.key) is self:
+            del _connections[self.key]
+        self.client.close()
+        _LOGGER.debug(f'closed connection {self.key}')
+
+# process wide registry, host:port -> SharedConnection
+_connections = {}
+
+def acquire_connection(host: str, port: int, framer: str, timeout: int) -> SharedConnection:
+    """Return the connection to host:port, opened by another client or new."""
+    key = f'{host}:{port}'
+    connection = _connections.get(key)
+    if connection is None:
+        connection = _connections[key] = SharedConnection(key, host, port, framer, timeout)
+    connection.acquire(timeout)
+    return connection
+
+def release_connection(connection: SharedConnection, linger: float = 0) -> None:
+    """Release a connection, it closes linger s after its last client released it."""
+    connection.release(linger)
+
+def connections() -> dict:
+    """Open connections and their number of clients."""
+    return {key: connection.refs for key, connection in _connections.items()}
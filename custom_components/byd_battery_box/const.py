@@ -17,6 +17,14 @@ DEFAULT_BMS_SCAN_INTERVAL = 600
 DEFAULT_LOG_SCAN_INTERVAL = 600
 CONF_BMS_SCAN_INTERVAL = "bms_scan_interval"
 CONF_LOG_SCAN_INTERVAL = "log_scan_interval"
+CONF_CELL_SENSORS = "cell_sensors"
+DEFAULT_CELL_SENSORS = False
+
+SERVICE_PROFILE_UPDATE_CYCLES = "profile_update_cycles"
+ATTR_CYCLES = "cycles"
+ATTR_UPDATE_ALL = "update_all"
+DEFAULT_PROFILE_CYCLES = 3
+MAX_PROFILE_CYCLES = 20
 
 DEVICE_TYPES = {
     0: "BMU",
@@ -32,6 +40,10 @@ BMU_BUTTON_TYPES = {
     "update_log_history_2000": ["Update last 2000 log entries", "update_log_history_2000", None, None, None, None, None],
 }
 
+BMU_LOG_BUTTON_TYPES = {
+    "rebuild_log_files": ["Rebuild log files", "rebuild_log_files", None, None, None, "mdi:file-refresh", EntityCategory.DIAGNOSTIC],
+}
+
 BMU_SENSOR_TYPES = {
     "inverter": ["Inverter", "inverter", None, None, None, None, EntityCategory.DIAGNOSTIC],
     "bmu_v": ["BMU version", "bmu_v", None, None, None, None, EntityCategory.DIAGNOSTIC],
@@ -65,6 +77,7 @@ BMU_SENSOR_TYPES = {
     "updated": ["Updated", "updated",SensorDeviceClass.TIMESTAMP, None, None, None, EntityCategory.DIAGNOSTIC],
     "bmu_last_log": ["BMU last log", "bmu_last_log",None, None, None, None, EntityCategory.DIAGNOSTIC],
     "log_entries": ["Log entries", "log_entries",None, None, None, None, EntityCategory.DIAGNOSTIC],
+    "log_history_progress": ["Log history progress", "log_history_progress",None, None, "%", "mdi:progress-download", EntityCategory.DIAGNOSTIC],
 }
 
 BMS_SENSOR_TYPES = {
@@ -92,4 +105,27 @@ BMS_SENSOR_TYPES = {
     "updated": ["Updated", "updated",SensorDeviceClass.TIMESTAMP, None, None, None, EntityCategory.DIAGNOSTIC],
     "last_log": ["Last log", "last_log",None, None, None, None, EntityCategory.DIAGNOSTIC],
     "b_total": ["Balancing total", "b_total",None, None, None, None, None],
-}
\ No newline at end of file
+}
+
+# sensors of the per cell values with the cell sensors option, {m} module and {i} value of the module (1 based)
+BMS_CELL_SENSOR_TYPES = {
+    "cell_voltages": ["Module {m} cell {i} voltage", "m{m}_c{i}_v", SensorDeviceClass.VOLTAGE, SensorStateClass.MEASUREMENT, "mV", "mdi:lightning-bolt", None],
+    "cell_temps": ["Module {m} temperature {i}", "m{m}_t{i}", SensorDeviceClass.TEMPERATURE, SensorStateClass.MEASUREMENT, "°C", "mdi:thermometer", None],
+}
+
+# diagnostic sensors of the p95 duration of the operations (timing.py), disabled by default
+BMU_TIMING_SENSOR_TYPES = {
+    "update_cycle": ["Timing update cycle", "timing_update_cycle", SensorDeviceClass.DURATION, SensorStateClass.MEASUREMENT, "ms", "mdi:timer-outline", EntityCategory.DIAGNOSTIC],
+    "read_holding_registers": ["Timing read registers", "timing_read_holding_registers", SensorDeviceClass.DURATION, SensorStateClass.MEASUREMENT, "ms", "mdi:timer-outline", EntityCategory.DIAGNOSTIC],
+    "write_registers": ["Timing write registers", "timing_write_registers", SensorDeviceClass.DURATION, SensorStateClass.MEASUREMENT, "ms", "mdi:timer-outline", EntityCategory.DIAGNOSTIC],
+    "wait_for_response": ["Timing wait for mailbox", "timing_wait_for_response", SensorDeviceClass.DURATION, SensorStateClass.MEASUREMENT, "ms", "mdi:timer-outline", EntityCategory.DIAGNOSTIC],
+    "mailbox_bms_status": ["Timing BMS status mailbox read", "timing_mailbox_bms_status", SensorDeviceClass.DURATION, SensorStateClass.MEASUREMENT, "ms", "mdi:timer-outline", EntityCategory.DIAGNOSTIC],
+    "mailbox_log": ["Timing log mailbox read", "timing_mailbox_log", SensorDeviceClass.DURATION, SensorStateClass.MEASUREMENT, "ms", "mdi:timer-outline", EntityCategory.DIAGNOSTIC],
+    "bms_status": ["Timing BMS status", "timing_bms_status", SensorDeviceClass.DURATION, SensorStateClass.MEASUREMENT, "ms", "mdi:timer-outline", EntityCategory.DIAGNOSTIC],
+    "log_poll": ["Timing log poll", "timing_log_poll", SensorDeviceClass.DURATION, SensorStateClass.MEASUREMENT, "ms", "mdi:timer-outline", EntityCategory.DIAGNOSTIC],
+    "log_history_page": ["Timing log history page", "timing_log_history_page", SensorDeviceClass.DURATION, SensorStateClass.MEASUREMENT, "ms", "mdi:timer-outline", EntityCategory.DIAGNOSTIC],
+    "decode_bmu_status": ["Timing decode BMU status", "timing_decode_bmu_status", SensorDeviceClass.DURATION, SensorStateClass.MEASUREMENT, "ms", "mdi:timer-outline", EntityCategory.DIAGNOSTIC],
+    "decode_bms_status": ["Timing decode BMS status", "timing_decode_bms_status", SensorDeviceClass.DURATION, SensorStateClass.MEASUREMENT, "ms", "mdi:timer-outline", EntityCategory.DIAGNOSTIC],
+    "decode_log_page": ["Timing decode log page", "timing_decode_log_page", SensorDeviceClass.DURATION, SensorStateClass.MEASUREMENT, "ms", "mdi:timer-outline", EntityCategory.DIAGNOSTIC],
+    "decode_log_entry": ["Timing decode log entry", "timing_decode_log_entry", SensorDeviceClass.DURATION, SensorStateClass.MEASUREMENT, "ms", "mdi:timer-outline", EntityCategory.DIAGNOSTIC],
+}
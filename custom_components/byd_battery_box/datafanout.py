@@ -0,0 +1,70 @@
+"""Notification of entities about changed data"""
+
+_MISSING = object()
+
+class DataFanout:
+    """Entity callbacks by the data keys they show.
+
+    publish compares the data with the values of the previous publish and
+    calls each callback of a changed key once, so entities whose data did
+    not change do not write their state again. Callbacks subscribed without
+    keys are called on every publish. Data values have to be replaced, a
+    list or dict modified in place is not seen as changed.
+    """
+
+    def __init__(self) -> None:
+        """Init Class"""
+        self._published = {} # key -> value at the previous publish
+        self._callbacks = {} # callback -> subscribed keys, None for all keys
+        self._key_callbacks = {} # key -> callbacks
+        self._all_callbacks = {} # callbacks of all keys
+        self.counters = {'publishes': 0, 'state_writes': 0, 'state_writes_avoided': 0}
+
+    def __len__(self) -> int:
+        return len(self._callbacks)
+
+    def subscribe(self, callback, keys: list | None = None) -> None:
+        """Call callback when one of keys changed, or on every publish without keys."""
+        self.unsubscribe(callback)
+        self._callbacks[callback] = None if keys is None else tuple(keys)
+        if keys is None:
+            self._all_callbacks[callback] = None
+        for k in self._callbacks[callback] or ():
+            self._key_callbacks.setdefault(k, {})[callback] = None
+
+    def unsubscribe(self, callback) -> None:
+        keys = self._callbacks.pop(callback, None)
+        self._all_callbacks.pop(callback, None)
+        for k in keys or ():
+            callbacks = self._key_callbacks[k]
+            callbacks.pop(callback, None)
+            if len(callbacks) == 0:
+                del self._key_callbacks[k]
+
+    def changed_keys(self, data: dict) -> list:
+        """Keys added, changed or removed since the previous publish, and remember the values."""
+        published = self._published
+        changed = [k for k, v in data.items() if published.get(k, _MISSING) != v]
+        for k in changed:
+            published[k] = data[k]
+        if len(published) > len(data):
+            removed = [k for k in published if not k in data]
+            for k in removed:
+                del published[k]
+            changed += removed
+        return changed
+
+    def publish(self, data: dict) -> int:
+        """Call the callbacks of the keys changed since the previous publish, returns the number of callbacks called."""
+        changed = self.changed_keys(data)
+        callbacks = dict(self._all_callbacks)
+        for k in changed:
+            key_callbacks = self._key_callbacks.get(k)
+            if not key_callbacks is None:
+                callbacks.update(key_callbacks)
+        for callback in callbacks:
+            callback()
+        self.counters['publishes'] += 1
+        self.counters['state_writes'] += len(callbacks)
+        self.counters['state_writes_avoided'] += len(self._callbacks) - len(callbacks)
+        return len(callbacks)
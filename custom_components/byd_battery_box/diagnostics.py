@@ -0,0 +1,23 @@
+"""Diagnostics support for BYD Battery Box."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.const import CONF_HOST
+from homeassistant.core import HomeAssistant
+
+from . import HubConfigEntry
+from .hub import Hub
+
+TO_REDACT = {CONF_HOST, 'serial'}
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, config_entry: HubConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics of a config entry: timings, statistics and data of the hub."""
+    hub:Hub = config_entry.runtime_data
+    return async_redact_data({
+        'entry': {'data': dict(config_entry.data), 'options': dict(config_entry.options)},
+        **hub.get_diagnostics(),
+    }, TO_REDACT)
@@ -2,6 +2,7 @@
 
 """Extended Modbus Class"""
 
+import contextlib
 import logging
 import operator
 import threading
@@ -20,27 +21,54 @@ from pymodbus.exceptions import ModbusIOException, ConnectionException
 from pymodbus import ExceptionResponse
 #from  pymodbus.register_write_message import WriteMultipleRegistersResponse
 from importlib.metadata import version
+from .connection import acquire_connection, release_connection
+from .scheduler import RequestScheduler
+from .timing import Timings
 
 _LOGGER = logging.getLogger(__name__)
 
 class ExtModbusClient:
 
-    busy = False
+    _connection_linger = 60 # s a released connection stays open for the next client
 
     def __init__(self, host: str, port: int, unit_id: int, timeout: int, framer:str) -> None:
         """Init Class"""
         self._host = host
         self._port = port
         self._unit_id = unit_id
-        self._client = AsyncModbusTcpClient(host=host, port=port, framer=framer, timeout=timeout) 
+        self._timeout = timeout
+        self._framer = framer
+        self._connection = None
+        self.timings = Timings() # durations of the modbus operations, decoding and updates
+        self.last_read_rejected = False # the last failed read got an exception response of the device
+        self._acquire_connection()
         _LOGGER.debug(f'client timeout {timeout}')
 
-    def close(self):
-        """Disconnect client."""
-        self._client.close()
+    def _acquire_connection(self) -> None:
+        # clients of the same gateway share connection and bus lock
+        self._connection = acquire_connection(self._host, self._port, self._framer, self._timeout)
+        self._client = self._connection.client
+
+    @property
+    def _scheduler(self) -> RequestScheduler:
+        """Request scheduler of the connection, the connection is acquired again when used after close."""
+        if self._connection is None:
+            self._acquire_connection()
+        return self._connection.scheduler
+
+    def close(self, linger: float | None = None):
+        """Release the connection, it is closed linger s after no other client uses it."""
+        if self._connection is None:
+            return
+        release_connection(self._connection, self._connection_linger if linger is None else linger)
+        self._connection = None
+        self._client = None
 
     async def connect(self, retries = 3):
         """Connect client."""
+        if self._connection is None:
+            # used again after close, the released connection may already be closed
+            self._acquire_connection()
         for attempts in range(retries): 
             if attempts > 0:
                 _LOGGER.debug(f"Connect retry attempt: {attempts}/{retries} connecting to: {self._host}:{self._port} unit id: {self._unit_id}")
@@ -48,6 +76,7 @@ class ExtModbusClient:
             connected = await self._client.connect()
             if connected:
                 break
+            self._raise_if_cancelled()
 
         if not self._client.connected:
             raise Exception(f"Failed to connect to {self._host}:{self._port} unit id: {self._unit_id} retries: {retries}")
@@ -55,14 +84,30 @@ class ExtModbusClient:
         return True
 
     async def _check_and_reconnect(self):
+        if self._connection is None:
+            # used again after close
+            self._acquire_connection()
         if not self._client.connected:
             _LOGGER.warning("Modbus client is not connected, reconnecting...", exc_info=True)
             return await self.connect()
         return self._client.connected
     
+    def _raise_if_cancelled(self) -> None:
+        """Raise the cancel of the task that pymodbus turned into an exception of the request."""
+        task = asyncio.current_task()
+        if not task is None and task.cancelling() > 0:
+            raise asyncio.CancelledError()
+
     @property
     def connected(self) -> bool:
-        return self._client.connected
+        return not self._client is None and self._client.connected
+
+    @property
+    def scheduler_stats(self) -> dict:
+        """Queue depth and wait time statistics of the request scheduler, empty after close."""
+        if self._connection is None:
+            return {}
+        return self._connection.scheduler.stats
 
     def validate(self, value, comparison, against):
         ops = {
@@ -77,43 +122,56 @@ class ExtModbusClient:
             raise ValueError(f"Value {value} failed validation ({comparison}{against})")
         return value
 
-    async def read_holding_registers(self, unit_id, address, count, retries = 3):
-        """Read holding registers."""
+    async def read_holding_registers(self, unit_id, address, count, retries = 3, timeout = None):
+        """Read holding registers, timeout limits the response timeout and disables the pymodbus retries."""
         #_LOGGER.debug(f"read registers a: {address} s: {unit_id} c {count} {self._client.connected}")
-        await self._check_and_reconnect()
-
-        for attempt in range(retries+1):
-            try:
-                data = await self._client.read_holding_registers(address=address, count=count, slave=unit_id)
-            except ModbusIOException as e:
-                _LOGGER.error(f'error reading registers. IO error. connected: {self._client.connected} address: {address} count: {count} unit id: {self._unit_id}')
-                return None
-            except ConnectionException as e:
-                _LOGGER.error(f'error reading registers. connection exception connected: {self._client.connected} address: {address} count: {count} unit id: {self._unit_id} {e} ')
-                return None
-            except Exception as e:
-                _LOGGER.error(f'error reading registers. unknown error. connected {self._client.connected} address: {address} count: {count} unit id: {self._unit_id} type {type(e)} error {e} ')
-                return None
-
-            if not data.isError():
-                break
-            else:
-                if isinstance(data,ModbusIOException):
-                    _LOGGER.debug(f"io error reading register retries: {attempt}/{retries} connected {self._client.connected} address: {address} count: {count} unit id: {self._unit_id}  error: {data} ")
-                elif isinstance(data, ExceptionResponse):
-                    _LOGGER.debug(f"Exception response reading register retries: {attempt}/{retries} connected {self._client.connected} address: {address} count: {count} unit id: {self._unit_id}  {data}")
+        start = self.timings.start()
+        attempt = 0
+        data = None
+        self.last_read_rejected = False
+        try:
+            await self._check_and_reconnect()
+
+            for attempt in range(retries+1):
+                try:
+                    with self._connection.limit_requests(timeout) if not timeout is None else contextlib.nullcontext():
+                        data = await self._client.read_holding_registers(address=address, count=count, device_id=unit_id)
+                except ModbusIOException as e:
+                    self._raise_if_cancelled()
+                    _LOGGER.error(f'error reading registers. IO error. connected: {self._client.connected} address: {address} count: {count} unit id: {self._unit_id}')
+                    return None
+                except ConnectionException as e:
+                    self._raise_if_cancelled()
+                    _LOGGER.error(f'error reading registers. connection exception connected: {self._client.connected} address: {address} count: {count} unit id: {self._unit_id} {e} ')
+                    return None
+                except Exception as e:
+                    self._raise_if_cancelled()
+                    _LOGGER.error(f'error reading registers. unknown error. connected {self._client.connected} address: {address} count: {count} unit id: {self._unit_id} type {type(e)} error {e} ')
+                    return None
+
+                if not data.isError():
+                    break
                 else:
-                    _LOGGER.debug(f"Unknown data response error reading register retries: {attempt}/{retries} connected {self._client.connected} address: {address} count: {count} unit id: {self._unit_id}  {data}")
-                await asyncio.sleep(.2) 
-
-        if data.isError():
-            _LOGGER.error(f"error reading registers. retries: {attempt}/{retries} connected {self._client.connected} register: {address} count: {count} unit id: {self._unit_id} retries {retries} error: {data} ")
-            return None
+                    if isinstance(data,ModbusIOException):
+                        _LOGGER.debug(f"io error reading register retries: {attempt}/{retries} connected {self._client.connected} address: {address} count: {count} unit id: {self._unit_id}  error: {data} ")
+                    elif isinstance(data, ExceptionResponse):
+                        _LOGGER.debug(f"Exception response reading register retries: {attempt}/{retries} connected {self._client.connected} address: {address} count: {count} unit id: {self._unit_id}  {data}")
+                    else:
+                        _LOGGER.debug(f"Unknown data response error reading register retries: {attempt}/{retries} connected {self._client.connected} address: {address} count: {count} unit id: {self._unit_id}  {data}")
+                    await asyncio.sleep(.2) 
+
+            if data.isError():
+                # exception responses of pymodbus versions are of different classes, the function code has bit 7 set
+                self.last_read_rejected = getattr(data, 'function_code', 0) & 0x80 != 0
+                _LOGGER.error(f"error reading registers. retries: {attempt}/{retries} connected {self._client.connected} register: {address} count: {count} unit id: {self._unit_id} retries {retries} error: {data} ")
+                return None
 
-        return data
+            return data
+        finally:
+            self.timings.record('read_holding_registers', start, data is None or data.isError(), attempt)
 
-    async def get_registers(self, address, count):
-        data = await self.read_holding_registers(unit_id=self._unit_id, address=address, count=count)
+    async def get_registers(self, address, count, retries = 3, timeout = None):
+        data = await self.read_holding_registers(unit_id=self._unit_id, address=address, count=count, retries=retries, timeout=timeout)
 
         if not data is None and len(data.registers)>0:
             return data.registers
@@ -127,22 +185,31 @@ class ExtModbusClient:
     async def write_registers(self, unit_id, address, payload):
         """Write registers."""
         #_LOGGER.debug(f"write registers a: {address} p: {payload}")
-        await self._check_and_reconnect()
-
+        start = self.timings.start()
+        failed = True
         try:
-            result = await self._client.write_registers(address=address, values=payload, slave=unit_id)
-        except ModbusIOException as e:
-            raise Exception(f'write_registers: IO error {self._client.connected} {e.fcode} {e}')
-        except ConnectionException as e:
-            raise Exception(f'write_registers: no connection {self._client.connected} {e} ')
-        except Exception as e:
-            raise Exception(f'write_registers: unknown error {self._client.connected} {type(e)} {e} ')
-
-        if result.isError():
-            raise Exception(f'write_registers: data error {self._client.connected} {type(result)} {result} ')
+            await self._check_and_reconnect()
+
+            try:
+                result = await self._client.write_registers(address=address, values=payload, device_id=unit_id)
+            except ModbusIOException as e:
+                self._raise_if_cancelled()
+                raise Exception(f'write_registers: IO error {self._client.connected} {e.fcode} {e}')
+            except ConnectionException as e:
+                self._raise_if_cancelled()
+                raise Exception(f'write_registers: no connection {self._client.connected} {e} ')
+            except Exception as e:
+                self._raise_if_cancelled()
+                raise Exception(f'write_registers: unknown error {self._client.connected} {type(e)} {e} ')
+
+            if result.isError():
+                raise Exception(f'write_registers: data error {self._client.connected} {type(result)} {result} ')
     
-        #_LOGGER.debug(f'write result {type(result)} {result}')
-        return result
+            #_LOGGER.debug(f'write result {type(result)} {result}')
+            failed = False
+            return result
+        finally:
+            self.timings.record('write_registers', start, failed)
 
 
     def calculate_value(self, value, sf, digits=2):
@@ -2,10 +2,14 @@
 from __future__ import annotations
 
 import asyncio
+import functools
 import logging
+import time
 from datetime import timedelta, datetime
 from typing import Optional, Literal
 from .bydboxclient import BydBoxClient
+from .datafanout import DataFanout
+from .profiler import CycleProfiler
 
 from homeassistant.core import callback
 from homeassistant.helpers.event import async_track_time_interval
@@ -25,8 +29,8 @@ class Hub:
 
     PYMODBUS_VERSION = '3.11.1'
 
-    def __init__(self, hass: HomeAssistant, name: str, host: str, port: int, unit_id: int, scan_interval: int, scan_interval_bms: int = 600, scan_interval_log: int = 600) -> None:
-        """Init hub."""
+    def __init__(self, hass: HomeAssistant, name: str, host: str, port: int, unit_id: int, scan_interval: int, scan_interval_bms: int = 600, scan_interval_log: int = 600, entry_id: str | None = None, migrate_log: bool = False) -> None:
+        """Init hub, the log is saved in a folder per config entry (entry_id), migrate_log moves the log of previous versions to it."""
         self._hass = hass
         self._name = name
         self._id = f'{name.lower()}_{host.lower().replace('.','')}'
@@ -35,14 +39,21 @@ class Hub:
         self._last_update = datetime(2000,1,1)
         self._unsub_interval_method = None
         self._entities = []
+        self._fanout = DataFanout() # entity callbacks by data key
         self._min_update_interval = timedelta(seconds=1)
         self._scan_interval = timedelta(seconds=scan_interval)
         self._scan_interval_bms = timedelta(seconds=scan_interval_bms)
         self._scan_interval_log = timedelta(seconds=scan_interval_log)
-        self._bydclient = BydBoxClient(host=host, port=port, unit_id=unit_id, timeout=max(3, (scan_interval - 1)))
+        log_path = None if entry_id is None else f'{BydBoxClient.default_log_path}{entry_id}/'
+        self._bydclient = BydBoxClient(host=host, port=port, unit_id=unit_id, timeout=max(3, (scan_interval - 1)), log_path=log_path)
+        self._migrate_log = migrate_log and not entry_id is None
         self.online = True     
-        self._busy = False
-        self._update_log_history_depth = [0,0]
+        self._jobs = {}
+        self._log_history_job = None # cursor of the log history update, persisted to resume after restart
+        self._log_history_save_pages = 10
+        self._log_history_max_restarts = 3 # restarts of the paging by the BMU, not caused by a BMS status update
+        self._bms_status_updates = 0 # started BMS status updates, a BMS status request restarts the log paging
+        self._profiler = None # CycleProfiler of the next update cycles, started by a service call
 
 
     @property
@@ -70,25 +81,41 @@ class Hub:
             "sw_version": self._bydclient.data.get('bms_v'),
         }
     
+    def get_cell_values(self, id, name) -> list | None:
+        """Per cell values (cell_voltages, cell_temps) of BMS id, a list per module."""
+        return self._bydclient.get_cell_values(id, name)
+
+    @property
+    def cell_layout(self) -> tuple:
+        """Modules per BMS, cells and temperature sensors per module."""
+        return self._bydclient.cell_layout
+
     @property
     def hub_id(self) -> str:
         """ID for hub."""
         return self._id
 
+    @property
+    def counters(self) -> dict:
+        """State writes of the entities and writes avoided as their data did not change."""
+        return self._fanout.counters
+
     @callback
-    def async_add_hub_entity(self, update_callback):
-        """Listen for data updates."""
+    def async_add_hub_entity(self, update_callback, keys = None):
+        """Listen for updates of the data keys, of all data without keys."""
         # This is the first entity, set up interval.
         if not self._entities:
             self._unsub_interval_method = async_track_time_interval(
                 self._hass, self.async_update_data, self._scan_interval
             )
         self._entities.append(update_callback)
+        self._fanout.subscribe(update_callback, keys)
 
     @callback
     def async_remove_hub_entity(self, update_callback):
         """Remove data update."""
         self._entities.remove(update_callback)
+        self._fanout.unsubscribe(update_callback)
 
         if not self._entities:
             """stop the interval timer upon removal of last entity"""
@@ -96,29 +123,23 @@ class Hub:
             self._unsub_interval_method = None
             self.close()
 
-    def toggle_busy(func):
-        async def wrapper(self, *args, **kwargs):
-            if self._busy:
-                #_LOGGER.debug(f"skip {func.__name__} hub busy") 
-                return
-            self._busy = True
-            error = None
-            try:
-                result = await func(self, *args, **kwargs)
-            except Exception as e:
-                _LOGGER.warning(f'Exception in wrapper {e}')
-                error = e
-            self._busy = False
-            if not error is None:
-                raise error
-            return result
-        return wrapper
-
-    @toggle_busy
     async def init_data(self, close = False):
         await self._hass.async_add_executor_job(self.check_pymodbus_version)  
-        await self._hass.async_add_executor_job(self._bydclient.update_log_from_file)  
+        if self._migrate_log:
+            await self._hass.async_add_executor_job(self._bydclient.migrate_log_folder, BydBoxClient.default_log_path)
+        # the hub of the config flow (close) does not use the log
+        entries = None if close else await self._hass.async_add_executor_job(self._bydclient.load_log_summary)
+        if not entries is None:
+            self._bydclient.update_log_entries_data(entries)
         await self._bydclient.init_data(close = close)
+        if not close:
+            job = await self._hass.async_add_executor_job(self._bydclient.load_log_history_job)
+            if not job is None:
+                _LOGGER.warning(f"Resuming {DEVICE_TYPES[job['unit_id']]} log history update, {job['entries']} log entries loaded before restart.")
+                self._log_history_job = job
+                self._update_log_history_progress()
+            # the whole log loads in the background, log updates start once it is loaded
+            self._start_job('log_load', self._load_log())
         self.update_entities()
 
     def check_pymodbus_version(self):
@@ -130,9 +151,31 @@ class Hub:
             _LOGGER.warning(f"newer pymodbus {version('pymodbus')} found")
         _LOGGER.debug(f"pymodbus {version('pymodbus')}")      
 
-    @toggle_busy
     async def async_update_data(self, _now: Optional[int] = None) -> dict:
-        """Time to update."""
+        """Time to update, timed as update_cycle and profiled on request."""
+        profiler = self._profiler
+        if not profiler is None and not profiler.running and not profiler.start():
+            self._profiler = profiler = None
+        timings = self._bydclient.timings
+        start = timings.start()
+        result = await self._async_update_data()
+        if not result is None:
+            # skipped updates return None
+            timings.record('update_cycle', start, not result)
+            if not profiler is None:
+                profiler.done += 1
+                # include the BMS status and log jobs of the profiled cycles
+                if profiler.done >= profiler.cycles and not self._job_running('bms_status') and not self._job_running('log_data'):
+                    self._stop_profile()
+        return result
+
+    async def _async_update_data(self) -> bool | None:
+        """Update the BMU status and start the BMS and log jobs when due.
+
+        Log and BMS updates run as background jobs; the request scheduler of
+        the client runs BMU status reads before queued BMS and log requests so
+        the BMU status keeps its update interval.
+        """
         if not self._bydclient.initialized:
             return
 
@@ -140,52 +183,22 @@ class Hub:
             #_LOGGER.debug(f"Skip update give system a break ;-)")
             return
 
-        # update log history
-        unit_id = self._update_log_history_depth[0]
-        log_depth = self._update_log_history_depth[1]
-        if self._update_log_history_depth[1] > 0:
-            prev_len_log = len(self._bydclient.log)
-            _LOGGER.warning(f"Started loading {DEVICE_TYPES[unit_id]} log history; all other data updates will be suspended!")
-            try:
-                await self._bydclient.update_log_data(unit_id, log_depth=log_depth)
-                self._last_log_update = datetime.now()
-                self._last_update = datetime.now()
-            except Exception as e:
-                _LOGGER.error(f'Failed updating {DEVICE_TYPES[unit_id]} log history {self._update_log_history_depth} {e}', exc_info=True)
-                return False
-            self._update_log_history_depth[1] = 0
-            if prev_len_log != len(self._bydclient.log):
-                result : bool = await self._hass.async_add_executor_job(self._bydclient.save_log_entries)
-            return True
+        log_loaded = self._bydclient.log_loaded
+        if not self._log_history_job is None:
+            # update log history page by page, log updates are suspended until finished
+            # as the BMU pages through the log with consecutive log requests
+            if log_loaded and not self._job_running():
+                self._start_job('log_history', self._update_log_history())
+        elif log_loaded and ((datetime.now()-self._last_log_update) > self._scan_interval_log) and not self._job_running('log_data'):
+            # update last log data
+            self._start_job('log_data', self._update_log_data())
 
-        # update last log data
-        if ((datetime.now()-self._last_log_update) > self._scan_interval_log):
-            #_LOGGER.debug(f"start update log data")
-            prev_len_log = len(self._bydclient.log)
-            result = await self._bydclient.update_all_log_data()
-            self._last_log_update = datetime.now()
-            self._last_update = datetime.now()
-            if result:
-                self.update_entities()
-                if prev_len_log != len(self._bydclient.log):
-                    result : bool = await self._hass.async_add_executor_job(self._bydclient.save_log_entries)
-                _LOGGER.debug(f"updated log data")
-            else:
-                _LOGGER.error(f"update log data failed")
-                await asyncio.sleep(5)
-
-        # update bms data
-        if ((datetime.now()-self._last_full_update) > self._scan_interval_bms):
-            #_LOGGER.debug(f"start update BMS status")
-            result = await self._bydclient.update_all_bms_status_data()
-            if result:
-                self._last_full_update = datetime.now()
-                self._last_update = datetime.now()
-                self.update_entities()
-                _LOGGER.debug(f"updated BMS status")
-            else:
-                _LOGGER.error(f"update BMS status data failed")
-                await asyncio.sleep(5)
+        # update bms data, also during a log history update; its pages are read between the BMS updates and
+        # as the BMU pages from the newest entry again after one, the history first gets past the pages read before
+        history = self._log_history_job
+        if ((datetime.now()-self._last_full_update) > self._scan_interval_bms) and not self._job_running('bms_status') \
+                and (history is None or history['pages'] > history.get('bms_restart_pages', 0)):
+            self._start_job('bms_status', self._update_bms_status_data())
 
         # update bmu
         try:
@@ -196,6 +209,7 @@ class Hub:
             return False
         if result:
             self._last_update = datetime.now()
+            self._bydclient.update_timing_data()
             self.update_entities()
             _LOGGER.debug(f"updated BMU status")
         else:
@@ -204,12 +218,202 @@ class Hub:
 
         return True
 
+    def _start_job(self, name, coro) -> None:
+        self._jobs[name] = self._hass.async_create_background_task(coro, f'{self._id}_{name}')
+
+    def _job_running(self, name = None) -> bool:
+        if name is None:
+            return any(not job.done() for job in self._jobs.values())
+        job = self._jobs.get(name)
+        return not job is None and not job.done()
+
+    async def _load_log(self) -> bool:
+        """Load the whole log, check the balancing counters and rebuild the log files when needed."""
+        start = time.perf_counter()
+        try:
+            entries = await self._hass.async_add_executor_job(self._bydclient.load_log)
+        except Exception as e:
+            _LOGGER.error(f"Error loading log {e}", exc_info=True)
+            entries = None
+        # self.data is updated here on the event loop, not in the executor
+        if not entries is None:
+            self._bydclient.update_log_entries_data()
+        # log updates also start when loading failed, as before without a log
+        self._bydclient.log_loaded = True
+        self.update_entities()
+        _LOGGER.debug(f"loaded {len(self._bydclient.log)} log entries in {time.perf_counter() - start:.1f} s")
+        return not entries is None
+
+    async def _update_log_history(self) -> bool:
+        """Load the log history one page of 20 entries at a time.
+
+        BMU status reads run between the pages, BMS status updates between
+        the pages as well; a BMS status request makes the BMU page from the
+        newest entry again, so the pages are only read while no BMS status
+        update runs. The cursor is saved with the log every few pages so the
+        update resumes after a restart; as the BMU always pages from the
+        newest entry the pages are read again.
+        """
+        job = self._log_history_job
+        unit_id = job['unit_id']
+        log_depth = job['log_depth']
+        job['pages'] = 0
+        restarts = 0
+        result = True
+        _LOGGER.warning(f"Started loading {DEVICE_TYPES[unit_id]} log history; log data updates will be suspended!")
+        bms_status_updates = self._bms_status_updates # when the previous page was requested
+        while job['pages'] < log_depth:
+            bms_status = self._jobs.get('bms_status')
+            if not bms_status is None and not bms_status.done():
+                await asyncio.wait([bms_status])
+            requested = self._bms_status_updates
+            try:
+                entries = await self._bydclient.update_log_history_page(unit_id, job['pages'])
+            except Exception as e:
+                _LOGGER.error(f'Failed updating {DEVICE_TYPES[unit_id]} log history {job} {e}', exc_info=True)
+                entries = None
+            if entries is None:
+                result = False
+                break
+
+            if self._bydclient.log_page_restarted and bms_status_updates != self._bms_status_updates:
+                # a BMS status update since the previous page made the BMU page from the newest entry again
+                _LOGGER.debug(f'{DEVICE_TYPES[unit_id]} log history paging restarted after BMS status update')
+                job['bms_restart_pages'] = job['pages']
+                job['pages'] = 0
+            elif self._bydclient.log_page_restarted:
+                # BMU started paging from the newest entry again
+                restarts += 1
+                if restarts > self._log_history_max_restarts:
+                    _LOGGER.error(f'{DEVICE_TYPES[unit_id]} log history paging restarted {restarts} times, stopped')
+                    result = False
+                    break
+                _LOGGER.warning(f'{DEVICE_TYPES[unit_id]} log history paging restarted from newest entry')
+                job['pages'] = 0
+            bms_status_updates = requested
+            job['pages'] += 1
+            job['entries'] += self._bydclient.log_page_new
+            keys = self._bydclient.log_page_keys
+            if len(keys) > 0 and (job.get('oldest') is None or keys[-1] < job['oldest']):
+                job['oldest'] = keys[-1]
+            self._update_log_history_progress()
+            self.update_entities()
+            if entries < 20:
+                # reached the oldest log entry
+                break
+            if self._bydclient.log_sync_covers(unit_id, log_depth):
+                # older entries up to the requested depth are already known
+                break
+            _LOGGER.warning(f'...updating {DEVICE_TYPES[unit_id]} log {job["entries"]} new entries.')
+            if job['pages'] % self._log_history_save_pages == 0:
+                await self._hass.async_add_executor_job(self._save_log_history, job)
+
+        self._last_log_update = datetime.now()
+        self._last_update = datetime.now()
+        await self._hass.async_add_executor_job(self._save_log_history, None)
+        self._log_history_job = None
+        self._update_log_history_progress(job, done=True)
+        self.update_entities()
+        _LOGGER.warning(f'Finished updating {DEVICE_TYPES[unit_id]} log; found {job["entries"]} new log entries.')
+        return result
+
+    def _save_log_history(self, job) -> None:
+        # export files are updated once the job finished, history entries are older than the exported ones
+        self._bydclient.save_log_entries(export=job is None)
+        self._bydclient.save_log_history_job(job)
+
+    def _update_log_history_progress(self, job = None, done = False) -> None:
+        if job is None:
+            job = self._log_history_job
+        if job is None:
+            return
+        progress = 100 if done else min(100, round(job['pages'] / job['log_depth'] * 100))
+        self.data['log_history_progress'] = progress
+        self.data['log_history'] = {'unit': DEVICE_TYPES[job['unit_id']], 'pages': job['pages'], 'log_depth': job['log_depth'], 'entries': job['entries']}
+
+    async def _update_log_data(self) -> bool:
+        #_LOGGER.debug(f"start update log data")
+        try:
+            result = await self._bydclient.update_all_log_data()
+        except Exception as e:
+            _LOGGER.error(f"Error updating log data {e}", exc_info=True)
+            result = False
+        self._last_log_update = datetime.now()
+        self._last_update = datetime.now()
+        if result:
+            self.update_entities()
+            if self._bydclient.data.get('log_new_entries', 0) > 0:
+                result : bool = await self._hass.async_add_executor_job(self._bydclient.save_log_entries)
+            _LOGGER.debug(f"updated log data")
+        else:
+            _LOGGER.error(f"update log data failed")
+        return result
+
+    async def _update_bms_status_data(self) -> bool:
+        #_LOGGER.debug(f"start update BMS status")
+        self._bms_status_updates += 1
+        try:
+            result = await self._bydclient.update_all_bms_status_data()
+        except Exception as e:
+            _LOGGER.error(f"Error updating BMS status data {e}", exc_info=True)
+            result = False
+        if result:
+            self._last_full_update = datetime.now()
+            self._last_update = datetime.now()
+            self.update_entities()
+            _LOGGER.debug(f"updated BMS status")
+        else:
+            _LOGGER.error(f"update BMS status data failed")
+        return result
+
+    def start_profile(self, cycles: int, update_all: bool = True) -> None:
+        """Profile the next update cycles, with update_all including a BMS status and log update."""
+        if not self._profiler is None:
+            _LOGGER.warning(f"Profile of {self._name} still running, request ignored.")
+            return
+        self._profiler = CycleProfiler(cycles, self._bydclient.log_path, self._name)
+        if update_all:
+            # start the BMS status and log jobs in the first profiled cycle
+            self._last_full_update = datetime(2000,1,1)
+            self._last_log_update = datetime(2000,1,1)
+        _LOGGER.info(f"Profiling the next {cycles} update cycles of {self._name}.")
+
+    def _stop_profile(self) -> None:
+        profiler = self._profiler
+        self._profiler = None
+        if profiler is None or not profiler.running:
+            return
+        profiler.stop()
+        self._hass.async_create_background_task(self._save_profile(profiler), f'{self._id}_save_profile')
+
+    async def _save_profile(self, profiler: CycleProfiler) -> None:
+        path = await self._hass.async_add_executor_job(profiler.save)
+        if not path is None:
+            _LOGGER.warning(f"Saved profile of {profiler.done} update cycles of {self._name} to {path}")
+
+    def get_diagnostics(self) -> dict:
+        """Timings, statistics and data for the diagnostics download."""
+        client = self._bydclient
+        return {
+            'timings': client.timings.summary(),
+            'scheduler': client.scheduler_stats,
+            'response_latencies': client.response_latencies,
+            'mailbox_read_size': client.mailbox_read_size,
+            'counters': {**client.counters, **self.counters},
+            'data': {k: v for k, v in self.data.items() if not k.startswith('timing_')},
+        }
+
     def update_entities(self):
-        for update_callback in self._entities:
-            update_callback()
+        """Update the entities of the data changed since the last update."""
+        self._fanout.publish(self.data)
 
     def close(self):
         """Disconnect client."""
+        for job in self._jobs.values():
+            job.cancel()
+        if not self._profiler is None and self._profiler.running:
+            self._profiler.stop()
+        self._profiler = None
         self._bydclient.close()
         _LOGGER.debug(f"close hub")
     
@@ -222,6 +426,19 @@ class Hub:
             _LOGGER.exception("Error connecting to the device")
             return False
 
+    async def rebuild_log_files(self) -> None:
+        """Rebuild the CSV and text log files from the whole log."""
+        if not self._bydclient.log_loaded:
+            _LOGGER.warning(f"Log is still loading, log files not rebuilt.")
+            return
+        await self._hass.async_add_executor_job(functools.partial(self._bydclient.save_log_entries, append=False))
+        _LOGGER.info(f"Rebuilt log files with {len(self._bydclient.log)} log entries.")
+
     def start_update_log_history(self, unit_id, log_depth):
-         _LOGGER.info(f"Scheduled {DEVICE_TYPES[unit_id]} log update for up to {log_depth*20} log entries.")
-         self._update_log_history_depth = [unit_id, log_depth]
+        if not self._log_history_job is None:
+            _LOGGER.warning(f"{DEVICE_TYPES[self._log_history_job['unit_id']]} log history update still running, {DEVICE_TYPES[unit_id]} update ignored.")
+            return
+        _LOGGER.info(f"Scheduled {DEVICE_TYPES[unit_id]} log update for up to {log_depth*20} log entries.")
+        self._log_history_job = {'unit_id': unit_id, 'log_depth': log_depth, 'pages': 0, 'entries': 0, 'oldest': None}
+        self._update_log_history_progress()
+        self.update_entities()
@@ -0,0 +1,465 @@
+"""Table-driven decoder of the data of the BMU and BMS log entries"""
+
+import logging
+import struct
+from datetime import datetime
+from operator import itemgetter
+
+from .bydbox_const import (
+    INVERTER_LIST,
+    MODULE_TYPE,
+
+    BMU_CALIBRATION,
+    BMU_LOG_CODES,
+    BMU_LOG_ERRORS,
+    BMU_LOG_WARNINGS,
+    BMU_STATUS,
+
+    BMS_ERRORS,
+    BMS_LOG_CODES,
+    BMS_POWER_OFF,
+    BMS_STATUS_ON,
+    BMS_STATUS_OFF,
+    BMS_WARNINGS,
+    BMS_WARNINGS3,
+
+    DATA_POINTS,
+)
+from .registermap import BYTE_SET_BITS
+
+_LOGGER = logging.getLogger(__name__)
+
+LOG_DATA_SIZE = 23 # bytes of data of a log entry
+
+BMU = 'bmu'
+BMS = 'bms'
+
+class BitmaskTable:
+    """Strings of the set bits of a 16 bit mask, precomputed per byte.
+
+    Gives the same strings as ExtModbusClient.bitmask_to_strings, bit 0
+    first, without testing the 16 bits of each mask.
+    """
+
+    def __init__(self, names: dict) -> None:
+        """Init Class"""
+        self.lo = self._byte_strings(names, 0)
+        self.hi = self._byte_strings(names, 8)
+
+    @staticmethod
+    def _byte_strings(names: dict, first_bit: int) -> tuple:
+        result = []
+        for b in range(256):
+            strings = []
+            for bit in BYTE_SET_BITS[b]:
+                name = names.get(first_bit + bit)
+                strings.append(f'bit {first_bit + bit} undefined' if name is None else name)
+            result.append(tuple(strings))
+        return tuple(result)
+
+    def strings(self, lo: int, hi: int) -> tuple:
+        return self.lo[lo] + self.hi[hi]
+
+def _data_point_format(config: dict):
+    label = config['label']
+    t = config.get('type')
+    if t in ['nlist', 'slist']:
+        separator = ', ' if t == 'slist' else ','
+        def format_list(v):
+            return f'{label}: {separator.join(v) if len(v) > 0 else "-"}'
+        return format_list
+    if t == 's': # string
+        def format_string(v):
+            return label.replace('{v}', f'{v}')
+        return format_string
+    # 'n' numeric
+    unit = config.get('unit')
+    suffix = f' {unit}' if len(unit) > 0 else ''
+    def format_numeric(v):
+        return f'{label}: {v}{suffix}'
+    return format_numeric
+
+DATA_POINT_FORMATS = {dp: _data_point_format(config) for dp, config in DATA_POINTS.items()}
+
+def log_data_to_str(decoded: dict) -> str:
+    """Data points as text, 'Label: value unit. ...'."""
+    try:
+        strings = [DATA_POINT_FORMATS[dp](v) for dp, v in decoded.items()]
+    except KeyError:
+        strings = []
+        for dp, v in decoded.items():
+            format_data_point = DATA_POINT_FORMATS.get(dp)
+            if not format_data_point is None:
+                strings.append(format_data_point(v))
+            else:
+                _LOGGER.error(f'Datapoint {dp} not defined')
+    return f"{'. '.join(strings)}."
+
+class Layout:
+    """Fields of the data of a log code, unpacked by one precompiled struct.
+
+    fields is a list of (name, offset, format, convert) in the order of the
+    decoded dict, format a struct format of one or more values ('B', 'H',
+    '6B', ...) and convert None or a function of the value, or of the tuple
+    of values of a format with more values. The text of the data points is
+    formatted by a template precompiled from DATA_POINTS.
+    """
+
+    def __init__(self, byte_order: str, fields: list) -> None:
+        """Init Class, byte_order '>' for big endian or '<' for little endian fields."""
+        fmt = byte_order
+        pos = 0
+        index = 0
+        converts = []
+        position = {}
+        for offset, i, field_fmt in sorted((field[1], i, field[2]) for i, field in enumerate(fields)):
+            if offset < pos:
+                raise ValueError(f'field {fields[i][0]} at {offset} overlaps the previous field')
+            size = struct.calcsize(byte_order + field_fmt)
+            count = len(struct.unpack(byte_order + field_fmt, bytes(size)))
+            convert = fields[i][3]
+            if count > 1 and convert is None:
+                raise ValueError(f'field {fields[i][0]} of {count} values has no convert')
+            if not convert is None:
+                converts.append((index, count, convert))
+            fmt += f'{offset - pos}x{field_fmt}'
+            position[i] = len(position)
+            pos = offset + size
+            index += count
+        if pos > LOG_DATA_SIZE:
+            raise ValueError(f'layout of {pos} bytes exceeds the log data')
+        self._struct = struct.Struct(fmt)
+        # from the last field to the first, so the indexes of the values not converted yet stay valid
+        self._converts = tuple(reversed(converts))
+        order = [position[i] for i in range(len(fields))]
+        self._order = None if order == sorted(order) else itemgetter(*order)
+        self._names = tuple(field[0] for field in fields)
+
+        template = []
+        self._text_formats = []
+        for i, name in enumerate(self._names):
+            config = DATA_POINTS.get(name)
+            if config is None:
+                raise ValueError(f'Datapoint {name} not defined')
+            if config.get('type') == 'n':
+                unit = config.get('unit')
+                template.append(f"{config['label']}: {{}}{' ' + unit if len(unit) > 0 else ''}".replace('{}', '\0').replace('{', '{{').replace('}', '}}').replace('\0', '{}'))
+            else:
+                template.append('{}')
+                self._text_formats.append((i, DATA_POINT_FORMATS[name]))
+        self._template = f"{'. '.join(template)}."
+
+    def __call__(self, data) -> dict:
+        """Data points of the data and 'desc', their text."""
+        values = list(self._struct.unpack_from(data))
+        for index, count, convert in self._converts:
+            if count == 1:
+                values[index] = convert(values[index])
+            else:
+                values[index:index + count] = [convert(tuple(values[index:index + count]))]
+        if not self._order is None:
+            values = list(self._order(values))
+        decoded = dict(zip(self._names, values))
+        for i, format_data_point in self._text_formats:
+            values[i] = format_data_point(values[i])
+        decoded['desc'] = self._template.format(*values)
+        return decoded
+
+def _lookup(names: dict, default: str):
+    """Name of a value, default when not defined (ExtModbusClient.get_value_from_dict)."""
+    def convert(v):
+        name = names.get(v)
+        return default if name is None else name
+    return convert
+
+def _lookup_or_value(names: dict):
+    """Name of a value, the value itself when not defined."""
+    def convert(v):
+        return names.get(v, v)
+    return convert
+
+def _listed(convert):
+    def listed(v):
+        return [convert(v)]
+    return listed
+
+def _constant(value):
+    def convert(v):
+        return value
+    return convert
+
+def _int16(v: int) -> int:
+    # as ExtModbusClient.convert_from_byte_int16, 0x8000 stays positive
+    return v - 65536 if v > 32768 else v
+
+def _tenth(v: int) -> float:
+    return round(v * 10**-1, 1)
+
+def _tenth_int16(v: int) -> float:
+    return round((v - 65536 if v > 32768 else v) * 10**-1, 1)
+
+def _version(v: tuple) -> str:
+    return f'{v[0]}.{v[1]}'
+
+def _version_reversed(v: tuple) -> str:
+    return f'{v[1]}.{v[0]}'
+
+_CELL_NAMES = [str(i) for i in range(8 * LOG_DATA_SIZE)]
+
+def _balancing_cells(v: tuple) -> list:
+    return [_CELL_NAMES[j * 8 + bit] for j, b in enumerate(v) if b for bit in BYTE_SET_BITS[b]]
+
+# BMU log data, big endian
+
+_BMU_LOG_WARNINGS = BitmaskTable(BMU_LOG_WARNINGS)
+_bmu_log_error = _lookup(BMU_LOG_ERRORS, 'Undefined')
+_bmu_status = _lookup(BMU_STATUS, 'Undefined')
+
+def _bmu_event(v: tuple) -> str:
+    active, error_code, hi, lo = v
+    if active == 0:
+        return 'Error/Warning cleared'
+    if error_code != 23:
+        return f'Error; {_bmu_log_error(error_code).lower()}'
+    warnings = _BMU_LOG_WARNINGS.strings(lo, hi)
+    return f'Warning; {(",".join(warnings)[:255] if len(warnings) else "NA").lower()}'
+
+_BMU_FIRMWARE = Layout('>', [
+    ('firmware_v', 1, 'BB', _version),
+    ('mcu', 4, 'B', None),
+])
+
+_BMU_UPDATE = Layout('>', [
+    # both areas are reported as A
+    ('bms_updt', 0, 'B', _constant('A')),
+    ('firmware_v', 1, 'BB', _version),
+])
+
+_BMU_FIRMWARES = Layout('>', [
+    ('firmware_n1', 0, 'B', None),
+    ('firmware_v1', 1, 'BB', _version),
+    ('firmware_n2', 3, 'B', None),
+    ('firmware_v2', 4, 'BB', _version),
+])
+
+_BMU_FIRMWARES_3 = Layout('>', [
+    ('firmware_n1', 0, 'B', None),
+    ('firmware_v1', 1, 'BB', _version),
+    ('firmware_n2', 3, 'B', None),
+    ('firmware_v2', 4, 'BB', _version),
+    ('firmware_n3', 6, 'B', None),
+    ('firmware_v3', 7, 'BB', _version),
+])
+
+def _bmu_firmwares(data) -> dict:
+    # a third firmware is reported unless its number is 0xFF
+    return _BMU_FIRMWARES(data) if data[6] == 0xFF else _BMU_FIRMWARES_3(data)
+
+_BMU_STATUS_UNDEFINED = Layout('>', [
+    ('status', 0, 'B', _listed(_bmu_status)),
+])
+
+_BMU_STATUS_REPORT = Layout('>', [
+    ('status', 0, 'B', _listed(_bmu_status)),
+    ('env_min_t', 1, 'B', None),
+    ('env_max_t', 2, 'B', None),
+    ('soc', 3, 'B', None),
+    ('soh', 4, 'B', None),
+    ('bat_t', 5, 'B', None),
+    ('bat_v', 6, 'H', _tenth),
+    ('c_max_v', 8, 'H', None),
+    ('c_min_v', 10, 'H', None),
+    ('bat_max_t', 13, 'B', None),
+    ('bat_min_t', 15, 'B', None),
+])
+
+def _bmu_status_report(data) -> dict:
+    # the values are only reported with a defined status
+    return _BMU_STATUS_UNDEFINED(data) if _bmu_status(data[0]) == 'Undefined' else _BMU_STATUS_REPORT(data)
+
+# BMS log data, little endian
+
+_BMS_WARNINGS = BitmaskTable(BMS_WARNINGS)
+_BMS_WARNINGS3 = BitmaskTable(BMS_WARNINGS3)
+_BMS_ERRORS = BitmaskTable(BMS_ERRORS)
+# the status byte is a bitmask of switches on, or off when bit 0 is set
+_BMS_STATUS = tuple(off if b % 2 == 1 else on for b, on, off in zip(range(256), BitmaskTable(BMS_STATUS_ON).lo, BitmaskTable(BMS_STATUS_OFF).lo))
+
+def _bms_warnings(v: tuple) -> list:
+    return list(_BMS_WARNINGS.strings(v[0], v[1]) + _BMS_WARNINGS.strings(v[2], v[3]) + _BMS_WARNINGS3.strings(v[4], v[5]))
+
+def _bms_errors(v: tuple) -> list:
+    return list(_BMS_ERRORS.strings(v[0], v[1]))
+
+def _bms_status(v: int) -> list:
+    return list(_BMS_STATUS[v])
+
+def _bms_state(code: int) -> Layout:
+    """Layout of the warning, error and state codes, with the fields that differ per code."""
+    fields = [
+        ('warnings', 0, '6B', _bms_warnings),
+        ('errors', 6, 'BB', _bms_errors),
+        ('status', 8, 'B', _bms_status),
+    ]
+    if code == 9:
+        fields += [('bat_idle', 9, 'B', None), ('target_soc', 10, 'B', None)]
+    elif code == 20:
+        fields += [('bmu_serial_v1', 9, 'B', None), ('bmu_serial_v2', 10, 'B', None)]
+    else:
+        fields += [
+            ('soc', 9, 'B', None),
+            ('soh', 10, 'B', None),
+            ('bat_v', 11, 'H', _tenth),
+            ('out_v', 13, 'H', _tenth),
+            ('out_a', 15, 'H', _tenth_int16),
+        ]
+    if code == 21:
+        fields += [
+            ('c_max_v_n', 17, 'B', None),
+            ('c_min_v_n', 18, 'B', None),
+            ('c_max_t_n', 20, 'B', None),
+            ('c_min_t_n', 21, 'B', None),
+        ]
+    else:
+        fields += [
+            ('c_max_v', 17, 'H', None),
+            ('c_min_v', 19, 'H', None),
+            ('c_max_t', 21, 'B', None),
+            ('c_min_t', 22, 'B', None),
+        ]
+    return Layout('<', fields)
+
+_BMS_FIRMWARE_UPDATE = Layout('<', [
+    ('area', 0, 'B', lambda v: 'A' if v == 0 else 'B'),
+    ('firmware_p', 1, 'BB', _version_reversed),
+    ('firmware_n', 3, 'BB', _version_reversed),
+])
+
+def _described(decoded: dict) -> dict:
+    decoded['desc'] = log_data_to_str(decoded)
+    return decoded
+
+def _bms_serial_change(data) -> dict:
+    return _described({'sn_change': 1})
+
+def _bms_time_set(data) -> dict:
+    try:
+        return _described({'nt': datetime(year=data[0]+2000, month=data[1], day=data[2], hour=data[3], minute=data[4], second=data[5])})
+    except Exception as e:
+        _LOGGER.error(f'Failed to convert to datetime {data[0]} {data[1]} {data[2]} {data[3]} {data[4]} {data[5]} {e}')
+        return {}
+
+# decoders of the data of each log code, functions of the data returning the
+# data points and 'desc' or an empty dict when the data can not be decoded
+LOG_DECODERS = {
+    (BMU, 0): Layout('>', [
+        ('bootl', 0, 'B', None),
+        ('exec', 1, 'B', _lookup_or_value({0: 'A', 1: 'B'})),
+        ('firmware_v', 2, 'BB', _version),
+    ]),
+    (BMU, 1): Layout('>', [
+        ('switchoff', 0, 'B', _lookup_or_value({0: '0', 1: 'LED button'})),
+    ]),
+    (BMU, 2): Layout('>', [
+        ('event', 0, '4B', _bmu_event),
+        ('c_max_v', 4, 'H', None),
+        ('c_min_v', 6, 'H', None),
+        ('bat_max_t', 8, 'B', None),
+        ('bat_min_t', 9, 'B', None),
+        ('bat_v', 10, 'H', _tenth),
+        ('soc', 12, 'B', None),
+        ('soh', 13, 'B', None),
+    ]),
+    (BMU, 32): Layout('>', [
+        ('p_status', 1, 'B', _lookup(BMU_STATUS, 'NA')),
+        ('n_status', 0, 'B', _bmu_status),
+    ]),
+    (BMU, 34): _BMU_FIRMWARE,
+    (BMU, 35): _BMU_FIRMWARE,
+    (BMU, 36): Layout('>', [
+        ('rtime', 0, 'I', None),
+        ('bmu_qty_c', 4, 'B', None),
+        ('bmu_qty_t', 5, 'B', None),
+        ('c_max_v', 6, 'H', None),
+        ('c_min_v', 8, 'H', None),
+        ('c_max_t', 10, 'B', None),
+        ('c_min_t', 11, 'B', None),
+        ('out_a', 12, 'H', _tenth_int16),
+        ('out_v', 14, 'H', _tenth),
+        ('acc_v', 16, 'H', _tenth),
+        ('bms_addr', 18, 'B', None),
+        ('m_type', 19, 'B', _lookup(MODULE_TYPE, 'Undefined')),
+        ('m_qty', 20, 'B', None),
+    ]),
+    (BMU, 38): Layout('>', [
+        ('max_charge_a', 0, 'H', _tenth_int16),
+        ('max_discharge_a', 2, 'H', _tenth_int16),
+        ('max_charge_v', 4, 'H', _tenth_int16),
+        ('max_discharge_v', 6, 'H', _tenth_int16),
+        ('status', 8, 'B', _listed(_bmu_status)),
+        ('bat_t', 9, 'B', None),
+        ('inverter', 10, 'B', INVERTER_LIST.__getitem__),
+        ('bms_qty', 11, 'B', None),
+    ]),
+    (BMU, 40): _bmu_firmwares,
+    (BMU, 45): Layout('>', [
+        ('status', 0, 'B', str),
+        ('out_v', 4, 'H', _tenth),
+        ('bat_v', 6, 'H', _tenth),
+        ('soc_a', 10, 'H', _tenth),
+        ('soc_b', 12, 'H', _tenth),
+    ]),
+    (BMU, 101): _BMU_UPDATE,
+    (BMU, 102): _BMU_UPDATE,
+    (BMU, 103): _BMU_FIRMWARES,
+    (BMU, 105): Layout('>', [
+        ('pt_v', 1, 'BB', _version),
+    ]),
+    (BMU, 111): Layout('>', [
+        ('dt_cal', 0, 'B', _lookup(BMU_CALIBRATION, 'Undefined')),
+    ]),
+    (BMU, 118): _bmu_status_report,
+
+    (BMS, 0): Layout('<', [
+        ('bootl', 0, 'B', None),
+        ('exec', 1, 'B', _lookup_or_value({0: 'A', 2: 'B'})),
+        ('firmware_v', 3, 'BB', _version),
+    ]),
+    (BMS, 1): Layout('<', [
+        ('power_off', 1, 'B', _lookup(BMS_POWER_OFF, 'NA')),
+        ('section', 2, 'B', _lookup_or_value({0: 'A', 1: 'B'})),
+        ('firmware_v', 3, 'BB', _version),
+    ]),
+    **{(BMS, code): _bms_state(code) for code in [2,3,4,5,6,7,9,10,11,13,14,16,19,20,21]},
+    (BMS, 17): Layout('<', [
+        ('b_cells', 0, '20B', _balancing_cells),
+        ('c_min_v', 21, 'H', None),
+    ]),
+    (BMS, 18): Layout('<', [
+        ('c_min_v', 21, 'H', None),
+    ]),
+    (BMS, 101): _BMS_FIRMWARE_UPDATE,
+    (BMS, 102): _BMS_FIRMWARE_UPDATE,
+    (BMS, 105): Layout('<', [
+        ('pt_v', 0, 'HH', _version),
+    ]),
+    (BMS, 106): _bms_serial_change,
+    (BMS, 111): _bms_time_set,
+}
+
+def decode_log_data(unit_id: int, code: int, data) -> tuple:
+    """Description of the code and the decoded data of a log entry, data holds LOG_DATA_SIZE bytes.
+
+    Returns code_desc, decoded with the data points and 'desc', the data as text.
+    """
+    if unit_id == 0:
+        code_desc = BMU_LOG_CODES.get(code, 'Not available')
+        decoder = LOG_DECODERS.get((BMU, code))
+    else:
+        code_desc = BMS_LOG_CODES.get(code, 'Not available')
+        decoder = LOG_DECODERS.get((BMS, code))
+
+    decoded = None if decoder is None else decoder(data)
+    if not decoded:
+        decoded = {'desc': f'Not decoded: {bytes(data).hex()}'}
+    return code_desc, decoded
@@ -0,0 +1,210 @@
+"""Log entries with a sorted time index"""
+
+from bisect import bisect_left, insort
+from datetime import datetime
+from itertools import chain, islice
+
+def log_key_time(ts: float) -> str:
+    """Time prefix of the log keys of entries at timestamp ts."""
+    return datetime.fromtimestamp(ts).strftime("%Y%m%d %H:%M:%S")
+
+class SortedKeys:
+    """Sorted list of unique keys split into chunks of up to 2 * load keys.
+
+    An insert bisects the chunk maxima and inserts into one chunk, so it
+    moves at most 2 * load keys instead of all keys after it; chunks that
+    grow too large are split. Range iteration bisects to the first key and
+    walks the chunks from there.
+    """
+
+    load = 1000
+
+    def __init__(self, keys: list | None = None) -> None:
+        """Init Class, keys must be sorted and unique."""
+        keys = [] if keys is None else keys
+        self._chunks = [keys[i:i + self.load] for i in range(0, len(keys), self.load)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+        self._len = len(keys)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self):
+        return chain.from_iterable(self._chunks)
+
+    def __reversed__(self):
+        return chain.from_iterable(reversed(chunk) for chunk in reversed(self._chunks))
+
+    def last(self) -> str | None:
+        return self._maxes[-1] if self._len > 0 else None
+
+    def add(self, k: str) -> None:
+        """Insert a key that is not in the list."""
+        if self._len == 0:
+            self._chunks.append([k])
+            self._maxes.append(k)
+        else:
+            i = bisect_left(self._maxes, k)
+            if i == len(self._maxes):
+                # newest key, append to the last chunk
+                i -= 1
+                self._chunks[i].append(k)
+                self._maxes[i] = k
+            else:
+                insort(self._chunks[i], k)
+            chunk = self._chunks[i]
+            if len(chunk) > 2 * self.load:
+                self._chunks[i:i + 1] = [chunk[:self.load], chunk[self.load:]]
+                self._maxes[i:i + 1] = [chunk[self.load - 1], chunk[-1]]
+        self._len += 1
+
+    def remove(self, k: str) -> None:
+        """Remove a key that is in the list."""
+        i = bisect_left(self._maxes, k)
+        chunk = self._chunks[i]
+        del chunk[bisect_left(chunk, k)]
+        if len(chunk) == 0:
+            del self._chunks[i]
+            del self._maxes[i]
+        else:
+            self._maxes[i] = chunk[-1]
+        self._len -= 1
+
+    def irange(self, start: str | None = None, end: str | None = None):
+        """Iterator over the keys with start <= key < end, oldest first."""
+        i = 0 if start is None else bisect_left(self._maxes, start)
+        if i == len(self._chunks):
+            return
+        j = 0 if start is None else bisect_left(self._chunks[i], start)
+        for chunk in self._chunks[i:]:
+            if end is None or chunk[-1] < end:
+                yield from chunk[j:] if j > 0 else chunk
+            else:
+                yield from chunk[j:bisect_left(chunk, end, j)]
+                return
+            j = 0
+
+    def count(self, start: str | None = None, end: str | None = None) -> int:
+        """Number of keys with start <= key < end."""
+        i = 0 if start is None else bisect_left(self._maxes, start)
+        k = len(self._chunks) if end is None else min(len(self._chunks) - 1, bisect_left(self._maxes, end))
+        if i > k or i == len(self._chunks):
+            return 0
+        lo = 0 if start is None else bisect_left(self._chunks[i], start)
+        if i == k:
+            hi = len(self._chunks[i]) if end is None else bisect_left(self._chunks[i], end)
+            return max(0, hi - lo)
+        count = len(self._chunks[i]) - lo + sum(len(chunk) for chunk in self._chunks[i + 1:k])
+        if k < len(self._chunks):
+            count += bisect_left(self._chunks[k], end) if not end is None else len(self._chunks[k])
+        return count
+
+class LogIndex(dict):
+    """Log entries by key, "YYYYmmdd HH:MM:SS-code-unit", with the keys kept sorted.
+
+    A dict of the log entries that also keeps the sorted keys of all entries
+    and of each unit. The keys start with the time of the entry, so key order
+    is time order. Queries bisect to the first key and return the k entries
+    found, instead of sorting the whole log.
+
+    Entries are only inserted; an entry replaced under the same key must
+    belong to the same unit.
+    """
+
+    def __init__(self, entries: dict | None = None) -> None:
+        """Init Class"""
+        super().__init__()
+        self._keys = SortedKeys()
+        self._unit_keys = {} # unit_id -> SortedKeys of the unit
+        if not entries is None:
+            self.update(entries)
+
+    def __setitem__(self, k: str, entry: dict) -> None:
+        if not k in self:
+            self._keys.add(k)
+            unit_keys = self._unit_keys.get(entry['u'])
+            if unit_keys is None:
+                unit_keys = self._unit_keys[entry['u']] = SortedKeys()
+            unit_keys.add(k)
+        super().__setitem__(k, entry)
+
+    def update(self, entries: dict = (), **kwargs) -> None:
+        entries = dict(entries, **kwargs)
+        if len(entries) < len(self):
+            for k, entry in entries.items():
+                self[k] = entry
+            return
+        # bulk load, sort once
+        super().update(entries)
+        keys = sorted(super().keys())
+        unit_keys = {}
+        for k in keys:
+            unit_keys.setdefault(super().__getitem__(k)['u'], []).append(k)
+        self._keys = SortedKeys(keys)
+        self._unit_keys = {unit_id: SortedKeys(keys) for unit_id, keys in unit_keys.items()}
+
+    def __delitem__(self, k: str) -> None:
+        entry = super().__getitem__(k)
+        super().__delitem__(k)
+        self._keys.remove(k)
+        self._unit_keys[entry['u']].remove(k)
+
+    def pop(self, k: str, *default):
+        if not k in self:
+            if len(default) > 0:
+                return default[0]
+            raise KeyError(k)
+        entry = self[k]
+        del self[k]
+        return entry
+
+    def clear(self) -> None:
+        super().clear()
+        self._keys = SortedKeys()
+        self._unit_keys = {}
+
+    def setdefault(self, k: str, default: dict) -> dict:
+        if not k in self:
+            self[k] = default
+        return self[k]
+
+    def popitem(self):
+        raise NotImplementedError('LogIndex does not support popitem')
+
+    def __ior__(self, entries):
+        self.update(entries)
+        return self
+
+    def copy(self) -> 'LogIndex':
+        return LogIndex(self)
+
+    def _keys_of(self, unit_id: int | None) -> SortedKeys:
+        if unit_id is None:
+            return self._keys
+        return self._unit_keys.get(unit_id, _NO_KEYS)
+
+    def sorted_keys(self, reverse: bool = False):
+        """Iterator over all keys, oldest first or newest first with reverse."""
+        return reversed(self._keys) if reverse else iter(self._keys)
+
+    def newest_key(self, unit_id: int | None = None) -> str | None:
+        return self._keys_of(unit_id).last()
+
+    def latest(self, n: int, unit_id: int | None = None) -> list:
+        """Newest n entries as (key, entry), newest first."""
+        return [(k, self[k]) for k in islice(reversed(self._keys_of(unit_id)), max(0, n))]
+
+    def range(self, start: float | None = None, end: float | None = None, unit_id: int | None = None) -> list:
+        """Entries with start <= ts < end as (key, entry), oldest first, of one unit or all."""
+        keys = self._keys_of(unit_id).irange(None if start is None else log_key_time(start), None if end is None else log_key_time(end))
+        return [(k, self[k]) for k in keys]
+
+    def since(self, ts: float, unit_id: int | None = None) -> list:
+        """Entries at or after ts as (key, entry), oldest first."""
+        return self.range(start=ts, unit_id=unit_id)
+
+    def count_keys(self, start: str | None = None, end: str | None = None, unit_id: int | None = None) -> int:
+        """Number of keys with start <= key < end, of one unit or all."""
+        return self._keys_of(unit_id).count(start, end)
+
+_NO_KEYS = SortedKeys()
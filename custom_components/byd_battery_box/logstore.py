@@ -0,0 +1,136 @@
+"""Persistent store of the BMU and BMS log entries"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+_LOGGER = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS log (key TEXT PRIMARY KEY, ts REAL NOT NULL, unit INTEGER NOT NULL, code INTEGER NOT NULL, data TEXT NOT NULL) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS log_unit_ts ON log (unit, ts)',
+    'CREATE INDEX IF NOT EXISTS log_code_ts ON log (code, ts)',
+]
+
+class LogStore:
+    """Log entries in a SQLite database, indexed by (unit, ts) and (code, ts).
+
+    Entries use the format of BydBoxClient.log, key "YYYYmmdd HH:MM:SS-code-unit"
+    -> {'ts': timestamp, 'u': unit id, 'c': code, 'data': hex string}. Entries
+    are only ever inserted, a key already stored is ignored, so saving costs
+    the number of new entries instead of rewriting the whole log.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Init Class"""
+        self._path = path
+        self._lock = threading.Lock() # the store is used from executor threads
+        self._db = None
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            if self._db is None:
+                self._db = self._open()
+            with self._db:
+                yield self._db
+
+    def _open(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self._path, check_same_thread=False)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        version = db.execute('PRAGMA user_version').fetchone()[0]
+        if version > SCHEMA_VERSION:
+            db.close()
+            raise ValueError(f'log store {self._path} has schema version {version}, expected up to {SCHEMA_VERSION}')
+        with db:
+            for statement in SCHEMA:
+                db.execute(statement)
+            db.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+        return db
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._db is None:
+                self._db.close()
+                self._db = None
+
+    def exists(self) -> bool:
+        return os.path.isfile(self._path)
+
+    def add(self, entries: dict) -> int:
+        """Insert entries not stored yet, returns the number of inserted entries."""
+        if len(entries) == 0:
+            return 0
+        rows = [(k, e['ts'], int(e['u']), int(e['c']), e['data']) for k, e in entries.items()]
+        with self._transaction() as db:
+            before = db.total_changes
+            db.executemany('INSERT OR IGNORE INTO log (key, ts, unit, code, data) VALUES (?, ?, ?, ?, ?)', rows)
+            return db.total_changes - before
+
+    def count(self) -> int:
+        with self._transaction() as db:
+            return db.execute('SELECT COUNT(*) FROM log').fetchone()[0]
+
+    def newest_key(self) -> str | None:
+        with self._transaction() as db:
+            return db.execute('SELECT MAX(key) FROM log').fetchone()[0]
+
+    def count_by_unit(self, code: int | None = None) -> dict:
+        """Number of entries per unit, of one code or all codes."""
+        sql = 'SELECT unit, COUNT(*) FROM log'
+        params = []
+        if not code is None:
+            sql += ' WHERE code = ?'
+            params.append(code)
+        with self._transaction() as db:
+            return dict(db.execute(sql + ' GROUP BY unit', params).fetchall())
+
+    def load(self) -> dict:
+        """All entries, sorted by key."""
+        with self._transaction() as db:
+            rows = db.execute('SELECT key, ts, unit, code, data FROM log ORDER BY key').fetchall()
+        return {k: {'ts': ts, 'u': unit, 'c': code, 'data': data} for k, ts, unit, code, data in rows}
+
+    def query(self, unit: int | None = None, code: int | None = None, start: float | None = None, end: float | None = None,
+              limit: int | None = None, newest_first: bool = False) -> dict:
+        """Entries of a unit and/or code with start <= ts < end, sorted by ts."""
+        where = []
+        params = []
+        for column, value in [('unit', unit), ('code', code)]:
+            if not value is None:
+                where.append(f'{column} = ?')
+                params.append(value)
+        if not start is None:
+            where.append('ts >= ?')
+            params.append(start)
+        if not end is None:
+            where.append('ts < ?')
+            params.append(end)
+        sql = 'SELECT key, ts, unit, code, data FROM log'
+        if len(where) > 0:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += f' ORDER BY ts {"DESC" if newest_first else "ASC"}, key {"DESC" if newest_first else "ASC"}'
+        if not limit is None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        with self._transaction() as db:
+            rows = db.execute(sql, params).fetchall()
+        return {k: {'ts': ts, 'u': unit, 'c': code, 'data': data} for k, ts, unit, code, data in rows}
+
+    def import_json(self, path: str) -> int:
+        """Insert the entries of a JSON log file (byd_log.json format), returns the number of inserted entries."""
+        with open(path, 'r') as infile:
+            log = json.load(infile)
+        entries = self.add(log)
+        _LOGGER.info(f'Imported {entries} of {len(log)} log entries from {path}')
+        return entries
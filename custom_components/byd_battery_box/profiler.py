@@ -0,0 +1,78 @@
+"""On demand profile of the update cycles"""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import time
+from datetime import datetime
+
+_LOGGER = logging.getLogger(__name__)
+
+class CycleProfiler:
+    """cProfile of the next update cycles of the hub.
+
+    The profile runs from the start of the first cycle to the end of the
+    last one, so the BMS status and log jobs started by the cycles and the
+    other tasks of the event loop in between are included. From Python 3.12
+    cProfile profiles all threads, which includes the executor jobs such as
+    save_log_entries; the cumulative times of the event loop functions then
+    may include time of these threads, the own times are not affected.
+    """
+
+    def __init__(self, cycles: int, path: str, name: str) -> None:
+        """Init Class"""
+        self.cycles = cycles
+        self.done = 0
+        self._path = path
+        self._name = name
+        self._profile = None
+        self._started = None
+        self._duration = None
+
+    @property
+    def running(self) -> bool:
+        return not self._profile is None and self._duration is None
+
+    def start(self) -> bool:
+        """Start profiling, fails when another profiler is active."""
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            _LOGGER.error(f"Failed to start profile of {self._name}: {e}")
+            return False
+        self._profile = profile
+        self._started = time.perf_counter()
+        return True
+
+    def stop(self) -> None:
+        self._profile.disable()
+        self._duration = time.perf_counter() - self._started
+
+    def save(self, top: int = 25) -> str | None:
+        """Write the profile and a summary of the top functions to the log folder, returns the summary file."""
+        name = f"{self._path}profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        try:
+            if not os.path.exists(self._path):
+                os.mkdir(self._path)
+            self._profile.dump_stats(name + '.prof')
+            with open(name + '.txt', 'w') as outfile:
+                outfile.write(self.summary(top))
+        except Exception as e:
+            _LOGGER.error(f"Failed to save profile {name}: {e}", exc_info=True)
+            return None
+        return name + '.txt'
+
+    def summary(self, top: int = 25) -> str:
+        """Top functions by own time, and the functions of the integration by cumulative time."""
+        out = io.StringIO()
+        out.write(f"Profile of {self.done} update cycles of {self._name} in {self._duration:.1f} s\n\n")
+        stats = pstats.Stats(self._profile, stream=out)
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(top)
+        out.write(f"Functions of the integration\n")
+        # restrict to the files of this package
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(re.escape(os.path.dirname(__file__)), top)
+        return out.getvalue()
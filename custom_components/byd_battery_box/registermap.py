@@ -0,0 +1,255 @@
+"""Register maps of the BYD Battery Box status blocks"""
+
+import struct
+
+# type -> struct format, registers
+FIELD_TYPES = {
+    'uint16': ('H', 1),
+    'int16': ('h', 1),
+    'uint8_hi': ('B', 0),   # high byte of the register
+    'uint8_lo': ('B', 0),   # low byte of the register, must follow uint8_hi of the same register
+    'uint32_lw': ('HH', 2), # low word first
+}
+
+# BMU status, read from 0x0500 (21 registers)
+# [key, offset, type, scale, digits]
+BMU_STATUS_MAP = [
+    ['soc', 0, 'uint16', 1, None],
+    ['max_cell_v', 1, 'uint16', 0.01, 2],
+    ['min_cell_v', 2, 'uint16', 0.01, 2],
+    ['soh', 3, 'uint16', 1, None],
+    ['current', 4, 'int16', 0.1, 1],
+    ['bat_voltage', 5, 'uint16', 0.01, 2],
+    ['max_cell_temp', 6, 'int16', 1, None],
+    ['min_cell_temp', 7, 'int16', 1, None],
+    ['bmu_temp', 8, 'int16', 1, None],
+    # 9-12 unknown, usually [0, 792, 0, 0]
+    ['errors', 13, 'uint16', 1, None],
+    ['param_t_v1', 14, 'uint8_hi', 1, None],
+    ['param_t_v2', 14, 'uint8_lo', 1, None],
+    # 15 unknown
+    ['output_voltage', 16, 'uint16', 0.01, 2],
+    ['charge_lfte', 17, 'uint32_lw', 0.1, None],
+    ['discharge_lfte', 19, 'uint32_lw', 0.1, None],
+]
+
+# BMS status, read from mailbox 0x0558 (4 pages of 65 registers, each page starts with a length register)
+# offsets include the length registers at 0, 65, 130 and 195
+# [key, offset, type, scale, digits]
+BMS_STATUS_MAP = [
+    ['max_c_v', 1, 'int16', 0.001, 3],
+    ['min_c_v', 2, 'int16', 0.001, 3],
+    ['max_c_v_id', 3, 'uint8_hi', 1, None],
+    ['min_c_v_id', 3, 'uint8_lo', 1, None],
+    ['max_c_t', 4, 'int16', 1, None],
+    ['min_c_t', 5, 'int16', 1, None],
+    ['max_c_t_id', 6, 'uint8_hi', 1, None],
+    ['min_c_t_id', 6, 'uint8_lo', 1, None],
+    # 7-14 cell balancing flags of module 1-8, one bit per cell
+    ['charge_lfte', 15, 'uint32_lw', 0.001, None],
+    ['discharge_lfte', 17, 'uint32_lw', 0.001, None],
+    ['reg20', 20, 'uint16', 1, None],
+    ['bat_voltage', 21, 'int16', 0.1, 2],
+    # 22 unknown, usually 0
+    # 23 unknown, usually 1560, switch state?
+    ['output_voltage', 24, 'int16', 0.1, 2],
+    ['soc', 25, 'int16', 0.1, 2],
+    ['soh', 26, 'int16', 1, None],
+    ['current', 27, 'int16', 0.1, 2],
+    ['warnings1', 28, 'uint16', 1, None],
+    ['warnings2', 29, 'uint16', 1, None],
+    ['warnings3', 30, 'uint16', 1, None],
+    # 31-47 unknown, constant
+    ['errors', 48, 'uint16', 1, None],
+    # 49-212 cell voltages and temperatures, see below
+]
+
+# BMS status cell blocks, [start, end[ of the register ranges without the page length registers
+BMS_BALANCING_OFFSET = 7            # one register with a bit per cell for each module
+BMS_CELL_VOLTAGE_RANGES = [[49, 65], [66, 130], [131, 180]] # int16 mV
+BMS_CELL_TEMP_RANGES = [[180, 195], [196, 213]]             # uint8 °C, two per register
+BMS_CELL_VOLTAGE_STRIDE = 16        # registers per module
+BMS_CELL_TEMP_STRIDE = 4            # registers per module
+
+# bits of a byte, least significant first
+BYTE_BITS = [[b >> bit & 1 for bit in range(8)] for b in range(256)]
+# positions of the set bits of a byte, least significant first
+BYTE_SET_BITS = [[bit for bit in range(8) if b >> bit & 1] for b in range(256)]
+
+# registers -> struct.Struct of that many big endian registers
+_register_structs = {}
+
+def _registers_struct(count: int, code: str = 'H') -> struct.Struct:
+    s = _register_structs.get((count, code))
+    if s is None:
+        s = _register_structs[(count, code)] = struct.Struct(f'>{count}{code}')
+    return s
+
+class RegisterBuffer:
+    """Preallocated registers of a mailbox, filled in place by the paged reads.
+
+    The registers are kept as bytes in modbus order (high byte first), so
+    decoders unpack fields, cells and log entries straight from views into
+    the buffer. A buffer is reused for every read of its mailbox; values
+    taken from it must not be views that outlive the next read.
+    """
+
+    def __init__(self, size: int) -> None:
+        """Init Class"""
+        self.size = size
+        self.buffer = bytearray(size * 2)
+        self.bytes = memoryview(self.buffer)
+        self.length = 0
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, key):
+        """Register at index or list of registers of a slice."""
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.length)
+            if step != 1:
+                raise ValueError('register slices with a step are not supported')
+            if stop <= start:
+                return []
+            return list(_registers_struct(stop - start).unpack_from(self.buffer, start * 2))
+        if key < 0:
+            key += self.length
+        if not 0 <= key < self.length:
+            raise IndexError(f'register {key} out of range')
+        return self.buffer[key * 2] << 8 | self.buffer[key * 2 + 1]
+
+    def clear(self) -> None:
+        self.length = 0
+
+    def append(self, registers: list) -> None:
+        """Copy registers of a read to the end of the buffer."""
+        count = len(registers)
+        if self.length + count > self.size:
+            raise ValueError(f'{self.length + count} registers exceed buffer of {self.size}')
+        _registers_struct(count).pack_into(self.buffer, self.length * 2, *registers)
+        self.length += count
+
+    def view(self, start: int, end: int) -> memoryview:
+        """Bytes of the registers [start, end[ without copying."""
+        return self.bytes[start * 2:min(end, self.length) * 2]
+
+    def strip_page_headers(self, page_size: int) -> None:
+        """Remove the length register at the start of every page, in place."""
+        pages = (self.length + page_size - 1) // page_size
+        length = 0
+        for p in range(pages):
+            start = p * page_size + 1
+            end = min((p + 1) * page_size, self.length)
+            if end > start:
+                self.bytes[length * 2:(length + end - start) * 2] = self.bytes[start * 2:end * 2]
+                length += end - start
+        self.length = length
+
+def _range_slices(ranges: list, start: int, end: int) -> list:
+    """Register slices [a, b[ of the items [start, end[ of the concatenated ranges."""
+    slices = []
+    pos = 0
+    for a, b in ranges:
+        lo, hi = max(start, pos), min(end, pos + b - a)
+        if hi > lo:
+            slices.append((a + lo - pos, a + hi - pos))
+        pos += b - a
+    return slices
+
+class RegisterMap:
+    """Decoder of a register block compiled from a register map.
+
+    The fields are compiled once into a single struct.Struct over the block,
+    unused registers become pad bytes. decode() converts the registers to
+    bytes and unpacks all fields in one pass.
+    """
+
+    def __init__(self, fields: list, size: int | None = None) -> None:
+        """Init Class"""
+        fields = sorted(fields, key=lambda f: (f[1], f[2] == 'uint8_lo'))
+        fmt = '>'
+        pos = 0 # byte position in the block
+        index = 0 # index in the unpacked tuple
+        self._fields = []
+        for key, offset, type, scale, digits in fields:
+            code, registers = FIELD_TYPES[type]
+            start = offset * 2 + (1 if type == 'uint8_lo' else 0)
+            if start < pos:
+                raise ValueError(f'field {key} at register {offset} overlaps previous field')
+            fmt += 'x' * (start - pos) + code
+            pos = start + struct.calcsize('>' + code)
+            self._fields.append((key, index, type == 'uint32_lw', scale, digits))
+            index += len(code)
+        self.size = (pos + 1) // 2 if size is None else size
+        if self.size * 2 < pos:
+            raise ValueError(f'fields exceed block of {self.size} registers')
+        self._registers = struct.Struct(f'>{self.size}H')
+        self._struct = struct.Struct(fmt)
+
+    def decode(self, registers: list | RegisterBuffer) -> dict:
+        """Decode the fields from the registers of the block."""
+        if isinstance(registers, RegisterBuffer):
+            if registers.length < self.size:
+                raise ValueError(f'{registers.length} registers, expected {self.size}')
+            values = self._struct.unpack_from(registers.buffer)
+        else:
+            values = self._struct.unpack_from(self._registers.pack(*registers[:self.size]))
+        result = {}
+        for key, index, uint32_lw, scale, digits in self._fields:
+            value = values[index]
+            if uint32_lw:
+                value |= values[index + 1] << 16
+            if scale != 1:
+                value = value * scale
+                if not digits is None:
+                    value = round(value, digits)
+            result[key] = value
+        return result
+
+def decode_cell_voltages(regs: RegisterBuffer, modules: int, cells: int) -> list:
+    """Cell voltages in mV per module from the BMS status registers."""
+    result = []
+    for m in range(modules):
+        values = []
+        start = m * BMS_CELL_VOLTAGE_STRIDE
+        for a, b in _range_slices(BMS_CELL_VOLTAGE_RANGES, start, start + cells):
+            values += _registers_struct(b - a, 'h').unpack_from(regs.buffer, a * 2)
+        result.append(values)
+    return result
+
+def decode_cell_temps(regs: RegisterBuffer, modules: int, parts: int) -> list:
+    """Cell temperatures in °C per module from the BMS status registers, parts registers per module."""
+    result = []
+    for m in range(modules):
+        values = []
+        start = m * BMS_CELL_TEMP_STRIDE
+        for a, b in _range_slices(BMS_CELL_TEMP_RANGES, start, start + parts):
+            values += regs.view(a, b) # two bytes per register, high byte first
+        result.append(values)
+    return result
+
+def decode_cell_balancing(regs: RegisterBuffer, modules: int) -> list:
+    """Balancing flag per cell (16 per module) from the BMS status registers."""
+    result = []
+    for m in range(min(modules, regs.length - BMS_BALANCING_OFFSET)):
+        hi, lo = regs.view(BMS_BALANCING_OFFSET + m, BMS_BALANCING_OFFSET + m + 1)
+        result.append(BYTE_BITS[lo] + BYTE_BITS[hi])
+    return result
+
+def count_cell_balancing(regs: RegisterBuffer, modules: int) -> int:
+    """Number of balancing cells, the flags of decode_cell_balancing counted in one pass."""
+    modules = min(modules, regs.length - BMS_BALANCING_OFFSET)
+    if modules <= 0:
+        return 0
+    return int.from_bytes(regs.view(BMS_BALANCING_OFFSET, BMS_BALANCING_OFFSET + modules), 'big').bit_count()
+
+def cell_average(values: list, scale: float = 1, digits: int = 1) -> float | None:
+    """Average of the values per module of decode_cell_voltages or decode_cell_temps, None without values."""
+    count = sum(map(len, values))
+    if count == 0:
+        return None
+    return round(sum(map(sum, values)) / count * scale, digits)
+
+BMU_STATUS_REGISTERS = RegisterMap(BMU_STATUS_MAP, 21)
+BMS_STATUS_REGISTERS = RegisterMap(BMS_STATUS_MAP, 260)
@@ -0,0 +1,63 @@
+"""Adaptive mailbox response delay"""
+
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+class AdaptiveResponseDelay:
+    """Learn how long the BMU needs before a mailbox is ready.
+
+    The latency is tracked per mailbox and unit as exponentially weighted
+    moving average (EWMA) of past waits. The first ready probe is scheduled
+    slightly before the expected ready time, after that the probes back off
+    geometrically. As a ready first probe lowers the average and a late one
+    raises it, the first probe settles just around the real latency.
+    """
+
+    def __init__(self, initial_delay: float = 0.2, min_delay: float = 0.05, max_delay: float = 2.0,
+                 retry_delay: float = 0.05, max_retry_delay: float = 0.5, backoff: float = 1.5,
+                 alpha: float = 0.3, lead: float = 0.9) -> None:
+        """Init Class"""
+        self._initial_delay = initial_delay     # first probe without history
+        self._min_delay = min_delay
+        self._max_delay = max_delay
+        self._retry_delay = retry_delay         # first retry after a probe that was not ready
+        self._max_retry_delay = max_retry_delay
+        self._backoff = backoff                 # growth factor of the retry delay
+        self._alpha = alpha                     # weight of the latest wait in the average
+        self._lead = lead                       # share of the expected latency before first probe
+        self._latencies = {}
+        self._waits = {}
+
+    def first_delay(self, key) -> float:
+        """Delay in s before the first ready probe."""
+        latency = self._latencies.get(key)
+        if latency is None:
+            return self._initial_delay
+        return min(self._max_delay, max(self._min_delay, latency * self._lead))
+
+    def retry_delays(self):
+        """Generate the delays between subsequent ready probes."""
+        delay = self._retry_delay
+        while True:
+            yield delay
+            delay = min(self._max_retry_delay, delay * self._backoff)
+
+    def update(self, key, latency: float) -> None:
+        """Add the observed time in s until the mailbox was ready."""
+        previous = self._latencies.get(key)
+        if previous is None:
+            self._latencies[key] = latency
+        else:
+            self._latencies[key] = previous + self._alpha * (latency - previous)
+        self._waits[key] = self._waits.get(key, 0) + 1
+
+    @property
+    def latencies(self) -> dict:
+        """Learned latency in s per mailbox and unit."""
+        return dict(self._latencies)
+
+    @property
+    def waits(self) -> dict:
+        """Number of observed waits per mailbox and unit."""
+        return dict(self._waits)
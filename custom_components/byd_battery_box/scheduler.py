@@ -0,0 +1,168 @@
+"""Modbus request scheduler"""
+
+import asyncio
+import contextvars
+import functools
+import heapq
+import itertools
+import logging
+from enum import IntEnum
+
+_LOGGER = logging.getLogger(__name__)
+
+class Priority(IntEnum):
+    """Request priorities, lower values run first."""
+    BMU_STATUS = 0
+    BMS_STATUS = 1
+    LOG_POLL = 2
+    LOG_HISTORY = 3
+
+class RequestExpired(Exception):
+    """Error to indicate a request was not started before its deadline."""
+
+# scheduler running the current operation, nested requests of an operation run directly
+_running_scheduler = contextvars.ContextVar('byd_running_scheduler', default=None)
+
+class RequestScheduler:
+    """Run modbus operations one at a time on the bus, ordered by priority.
+
+    Operations wait in a priority queue until the bus is free; within a
+    priority they run in order of submission. An operation that has not
+    started before its timeout raises RequestExpired. Submitting an operation
+    with the key of a queued operation joins that operation instead of
+    queueing it twice. With concurrency > 1 up to that many operations run
+    at the same time.
+    """
+
+    def __init__(self, concurrency: int = 1) -> None:
+        """Init Class"""
+        self._concurrency = concurrency
+        self._active = 0
+        self._waiters = [] # heap of [priority, seq, future]
+        self._seq = itertools.count()
+        self._queued = {} # key -> future with the result of the queued operation
+        self._max_queue_depth = 0
+        self._stats = {p: {'submitted': 0, 'completed': 0, 'failed': 0, 'expired': 0, 'coalesced': 0, 'wait_total': 0.0, 'wait_max': 0.0} for p in Priority}
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of operations waiting for the bus."""
+        return sum(1 for w in self._waiters if not w[2].done())
+
+    @property
+    def busy(self) -> bool:
+        return self._active >= self._concurrency
+
+    @property
+    def stats(self) -> dict:
+        """Queue depth and wait time statistics per priority."""
+        priorities = {}
+        for p, s in self._stats.items():
+            started = s['completed'] + s['failed']
+            priorities[p.name.lower()] = dict(s, wait_avg=s['wait_total'] / started if started > 0 else 0.0)
+        return {'queue_depth': self.queue_depth, 'max_queue_depth': self._max_queue_depth, 'priorities': priorities}
+
+    async def submit(self, func, priority: Priority = Priority.BMU_STATUS, timeout: float | None = None, key = None):
+        """Run coroutine function func when the bus is free and return its result."""
+        if _running_scheduler.get() is self:
+            return await func()
+
+        stats = self._stats[priority]
+        stats['submitted'] += 1
+        if key is not None and key in self._queued:
+            stats['coalesced'] += 1
+            return await asyncio.shield(self._queued[key])
+
+        loop = asyncio.get_running_loop()
+        result = None
+        if key is not None:
+            result = loop.create_future()
+            result.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._queued[key] = result
+
+        start = loop.time()
+        try:
+            await self._acquire(priority, timeout)
+        except BaseException as e:
+            if isinstance(e, asyncio.TimeoutError):
+                stats['expired'] += 1
+                e = RequestExpired(f'{priority.name.lower()} request not started within {timeout}s')
+            if not result is None:
+                self._queued.pop(key, None)
+                if isinstance(e, asyncio.CancelledError):
+                    result.cancel()
+                else:
+                    result.set_exception(e)
+            if isinstance(e, RequestExpired):
+                raise e from None
+            raise
+
+        if not result is None:
+            self._queued.pop(key, None)
+        wait = loop.time() - start
+        stats['wait_total'] += wait
+        stats['wait_max'] = max(stats['wait_max'], wait)
+
+        token = _running_scheduler.set(self)
+        try:
+            value = await func()
+        except BaseException as e:
+            stats['failed'] += 1
+            if not result is None:
+                if isinstance(e, asyncio.CancelledError):
+                    result.cancel()
+                else:
+                    result.set_exception(e)
+            raise
+        finally:
+            _running_scheduler.reset(token)
+            self._release()
+
+        stats['completed'] += 1
+        if not result is None:
+            result.set_result(value)
+        return value
+
+    async def _acquire(self, priority: Priority, timeout: float | None) -> None:
+        if self._active < self._concurrency and self.queue_depth == 0:
+            self._active += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [priority, next(self._seq), future])
+        self._max_queue_depth = max(self._max_queue_depth, self.queue_depth)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except BaseException:
+            if future.done() and not future.cancelled():
+                # the bus was handed over while giving up, pass it on
+                self._release()
+            else:
+                future.cancel()
+            raise
+
+    def _release(self) -> None:
+        while self._waiters:
+            future = heapq.heappop(self._waiters)[2]
+            if not future.done():
+                future.set_result(True)
+                return
+        self._active -= 1
+
+def scheduled(priority: Priority, timeout_attr: str | None = None):
+    """Run the decorated client operation through the client request scheduler.
+
+    Returns False when the operation expired before it could start. The
+    timeout is read from the client attribute timeout_attr.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            timeout = None if timeout_attr is None else getattr(self, timeout_attr)
+            try:
+                return await self._scheduler.submit(functools.partial(func, self, *args, **kwargs), priority=priority, timeout=timeout, key=(self, func.__name__, args))
+            except RequestExpired as e:
+                _LOGGER.debug(f'skip {func.__name__} {e}')
+                return False
+        return wrapper
+    return decorator
@@ -17,7 +17,11 @@ from homeassistant.core import callback
 from . import HubConfigEntry
 from .const import (
     BMU_SENSOR_TYPES,
+    BMU_TIMING_SENSOR_TYPES,
     BMS_SENSOR_TYPES,
+    BMS_CELL_SENSOR_TYPES,
+    CONF_CELL_SENSORS,
+    DEFAULT_CELL_SENSORS,
     ENTITY_PREFIX,
 )
 from .hub import Hub
@@ -50,6 +54,22 @@ async def async_setup_entry(
         )
         entities.append(sensor)
 
+    for sensor_info in BMU_TIMING_SENSOR_TYPES.values():
+        sensor = BydBoxSensor(
+            platform_name = ENTITY_PREFIX,
+            hub = hub,
+            device_info = hub.device_info_bmu,
+            name = sensor_info[0],
+            key = sensor_info[1],
+            device_class = sensor_info[2],
+            state_class = sensor_info[3],
+            unit = sensor_info[4],
+            icon = sensor_info[5],
+            entity_category = sensor_info[6],
+            enabled_default = False,
+        )
+        entities.append(sensor)
+
     towers = hub.data.get('towers')
     if not towers is None and towers > 0:
         for id in range(1,towers +1):
@@ -68,13 +88,39 @@ async def async_setup_entry(
                 )
                 entities.append(sensor)
 
+    cell_sensors = config_entry.options.get(CONF_CELL_SENSORS, config_entry.data.get(CONF_CELL_SENSORS, DEFAULT_CELL_SENSORS))
+    if cell_sensors and not towers is None and towers > 0:
+        modules, cells, temps = hub.cell_layout
+        counts = {'cell_voltages': cells, 'cell_temps': temps}
+        for id in range(1,towers +1):
+            for name, sensor_info in BMS_CELL_SENSOR_TYPES.items():
+                # the sensors of a value array are updated together by their group
+                group = BydBoxCellSensorGroup(hub, id, name)
+                for m in range(modules):
+                    for i in range(counts[name]):
+                        sensor = BydBoxCellSensor(
+                            platform_name = ENTITY_PREFIX,
+                            group = group,
+                            device_info = hub.get_device_info_bms(id),
+                            name = f'BMS {id} ' + sensor_info[0].format(m=m+1, i=i+1),
+                            key = f'bms{id}_' + sensor_info[1].format(m=m+1, i=i+1),
+                            position = (m, i),
+                            device_class = sensor_info[2],
+                            state_class = sensor_info[3],
+                            unit = sensor_info[4],
+                            icon = sensor_info[5],
+                            entity_category = sensor_info[6],
+                        )
+                        entities.append(sensor)
+
+    # all entities are added at once
     async_add_entities(entities)
     return True
 
 class BydBoxSensor(SensorEntity):
     """Representation of an BYD Battery Box Modbus sensor."""
 
-    def __init__(self, platform_name, hub, device_info, name, key, device_class, state_class, unit, icon, entity_category):
+    def __init__(self, platform_name, hub, device_info, name, key, device_class, state_class, unit, icon, entity_category, enabled_default = True):
         """Initialize the sensor."""
         self._platform_name = platform_name
         self._hub:Hub = hub
@@ -88,10 +134,32 @@ class BydBoxSensor(SensorEntity):
         if not state_class is None:
             self._attr_state_class = state_class
         self._attr_entity_category = entity_category
+        self._attr_entity_registry_enabled_default = enabled_default
+        self._attribute_keys = self._get_attribute_keys(key)
+
+    @staticmethod
+    def _get_attribute_keys(key) -> dict:
+        """Extra state attributes of a sensor, attribute name -> data key."""
+        if 'balancing_qty' in key:
+            return {'cell_balancing': f'{key[:4]}_cell_balancing'}
+        elif 'avg_c_v' in key:
+            return {'cell_voltages': f'{key[:4]}_cell_voltages'}
+        elif 'avg_c_t' in key:
+            return {'cell_temps': f'{key[:4]}_cell_temps'}
+        elif 'log_entries' in key:
+            return {'log': 'log'}
+        elif 'log_history_progress' in key:
+            return {'log_history': 'log_history'}
+        elif 'b_total' in key:
+            return {'total_cells': f'{key[:4]}_b_cells_total'}
+        elif key.startswith('timing_'):
+            return {'timing': f'{key}_stats'}
+        return {}
 
     async def async_added_to_hass(self):
         """Register callbacks."""
-        self._hub.async_add_hub_entity(self._modbus_data_updated)
+        # the state is written when the value or an attribute changed
+        self._hub.async_add_hub_entity(self._modbus_data_updated, [self._key] + list(self._attribute_keys.values()))
 
     async def async_will_remove_from_hass(self) -> None:
         self._hub.async_remove_hub_entity(self._modbus_data_updated)
@@ -136,18 +204,9 @@ class BydBoxSensor(SensorEntity):
 
     @property
     def extra_state_attributes(self):
-        if 'balancing_qty' in self._key:
-            return {'cell_balancing': self._hub.data.get(f'{self._key[:4]}_cell_balancing')}
-        elif 'avg_c_v' in self._key:
-            return {'cell_voltages': self._hub.data.get(f'{self._key[:4]}_cell_voltages')}
-        elif 'avg_c_t' in self._key:
-            return {'cell_temps': self._hub.data.get(f'{self._key[:4]}_cell_temps')}
-        elif 'log_entries' in self._key:
-            return {'log': self._hub.data.get('log')}
-        elif 'b_total' in self._key:
-            return {'total_cells': self._hub.data.get(f'{self._key[:4]}_b_cells_total')}
-
-        return None
+        if len(self._attribute_keys) == 0:
+            return None
+        return {name: self._hub.data.get(k) for name, k in self._attribute_keys.items()}
 
     @property
     def should_poll(self) -> bool:
@@ -158,6 +217,70 @@ class BydBoxSensor(SensorEntity):
     def device_info(self) -> Optional[Dict[str, Any]]:
         return self._device_info
 
+class BydBoxCellSensorGroup:
+    """Cell sensors of a per cell value array of a BMS (cell_voltages, cell_temps).
 
+    The group listens to the hub for the array, on a change it writes the
+    state of the sensors whose value changed in one batch.
+    """
 
+    def __init__(self, hub, bms_id, name):
+        """Init Class"""
+        self._hub:Hub = hub
+        self._bms_id = bms_id
+        self._name = name
+        self._sensors = {} # (module, index) -> sensor added to hass
+
+    def value(self, position):
+        values = self._hub.get_cell_values(self._bms_id, self._name)
+        m, i = position
+        if values is None or m >= len(values) or i >= len(values[m]):
+            return None
+        return values[m][i]
+
+    def add(self, sensor) -> None:
+        if len(self._sensors) == 0:
+            self._hub.async_add_hub_entity(self._modbus_data_updated, [f'bms{self._bms_id}_{self._name}'])
+        self._sensors[sensor.position] = sensor
+
+    def remove(self, sensor) -> None:
+        self._sensors.pop(sensor.position, None)
+        if len(self._sensors) == 0:
+            self._hub.async_remove_hub_entity(self._modbus_data_updated)
+
+    @callback
+    def _modbus_data_updated(self):
+        values = self._hub.get_cell_values(self._bms_id, self._name)
+        if values is None:
+            return
+        for (m, i), sensor in self._sensors.items():
+            value = values[m][i] if m < len(values) and i < len(values[m]) else None
+            if value != sensor.native_value:
+                sensor._attr_native_value = value
+                sensor.async_write_ha_state()
 
+class BydBoxCellSensor(SensorEntity):
+    """Sensor of one value of a BMS cell array, updated by its BydBoxCellSensorGroup."""
+
+    _attr_should_poll = False
+
+    def __init__(self, platform_name, group, device_info, name, key, position, device_class, state_class, unit, icon, entity_category):
+        """Initialize the sensor."""
+        self._group:BydBoxCellSensorGroup = group
+        self.position = position
+        self._attr_name = name
+        self._attr_unique_id = f"{platform_name}_{key}"
+        self._attr_device_info = device_info
+        self._attr_device_class = device_class
+        self._attr_state_class = state_class
+        self._attr_native_unit_of_measurement = unit
+        self._attr_icon = icon
+        self._attr_entity_category = entity_category
+
+    async def async_added_to_hass(self):
+        """Register with the group."""
+        self._attr_native_value = self._group.value(self.position)
+        self._group.add(self)
+
+    async def async_will_remove_from_hass(self) -> None:
+        self._group.remove(self)
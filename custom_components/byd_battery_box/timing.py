@@ -0,0 +1,103 @@
+"""Timing of the modbus operations, decoding and update cycles"""
+
+import math
+import time
+from bisect import bisect_left
+from itertools import accumulate
+
+class Histogram:
+    """Streaming histogram of durations in s.
+
+    Durations are counted in buckets growing by a quarter octave (2**0.25,
+    about 19%) from 10 us up to about 2 minutes; longer durations go into
+    the last bucket. A percentile is the upper bound of its bucket, limited
+    to the maximum, so it is accurate within 19%. Recording is O(1) and the
+    memory is fixed.
+    """
+
+    _min = 1e-5 # s, upper bound of the first bucket
+    _steps = 4 # buckets per octave
+    _size = 96
+
+    def __init__(self) -> None:
+        """Init Class"""
+        self.buckets = [0] * self._size
+        self.count = 0
+        self.failures = 0
+        self.retries = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float, failed: bool = False, retries: int = 0) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if failed:
+            self.failures += 1
+        self.retries += retries
+        if seconds <= self._min:
+            self.buckets[0] += 1
+            return
+        # seconds = mantissa * 2**exponent with 0.5 <= mantissa < 1
+        mantissa, exponent = math.frexp(seconds / self._min)
+        i = (exponent - 1) * self._steps + int(math.log2(mantissa * 2) * self._steps) + 1
+        self.buckets[min(i, self._size - 1)] += 1
+
+    def upper_bound(self, i: int) -> float:
+        return self._min * 2 ** (i / self._steps)
+
+    def percentiles(self, *qs: float) -> list:
+        """Durations in s below which the shares qs of the durations are."""
+        if self.count == 0:
+            return [None] * len(qs)
+        cumulative = list(accumulate(self.buckets))
+        result = []
+        for q in qs:
+            i = min(bisect_left(cumulative, q * self.count), self._size - 1)
+            result.append(self.max if i == self._size - 1 else min(self.upper_bound(i), self.max))
+        return result
+
+    def percentile(self, q: float) -> float | None:
+        """Duration in s below which the share q of the durations is."""
+        return self.percentiles(q)[0]
+
+    def summary(self) -> dict:
+        """Count, failures, retries and p50, p95, max and average in ms."""
+        ms = lambda s: None if s is None else round(s * 1000, 2)
+        p50, p95 = self.percentiles(0.5, 0.95)
+        return {
+            'count': self.count,
+            'failures': self.failures,
+            'retries': self.retries,
+            'p50': ms(p50),
+            'p95': ms(p95),
+            'max': ms(self.max if self.count > 0 else None),
+            'avg': ms(self.total / self.count if self.count > 0 else None),
+        }
+
+class Timings:
+    """Histograms of the operations by name.
+
+    start = timings.start()
+    ...
+    timings.record('read_holding_registers', start, failed, retries)
+    """
+
+    def __init__(self) -> None:
+        """Init Class"""
+        self._histograms = {}
+
+    start = staticmethod(time.perf_counter)
+
+    def record(self, name: str, start: float, failed: bool = False, retries: int = 0) -> None:
+        """Record the duration since start (from Timings.start) of operation name."""
+        seconds = time.perf_counter() - start
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms[name] = Histogram()
+        histogram.record(seconds, failed, retries)
+
+    def summary(self) -> dict:
+        """Summary of each operation, see Histogram.summary."""
+        return {name: h.summary() for name, h in self._histograms.items()}
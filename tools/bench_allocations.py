@@ -0,0 +1,183 @@
+"""Memory allocation benchmark of the BMS status and log mailbox reads.
+
+Runs BydBoxClient against an in-process simulated box (no network, no
+pymodbus transport) and measures with tracemalloc the peak of memory
+allocated during each cycle on top of the memory in use before it:
+
+    bms_status      update_bms_status_data of BMS 1, 4 mailbox pages
+    log_page        update_log_history_page of BMS 1, 5 mailbox pages of
+                    known entries, i.e. reading and parsing without new entries
+
+The simulated box serves the same register streams in every cycle, so only
+the allocations of reading and decoding are measured.
+
+Each read is measured with the register buffers of the client (reused) and
+with a new buffer per read (new_buffer, _mailbox_reuse_buffers False).
+The benchmark exits with status 1 when the minimum peak of the reused
+buffers is not at least MIN_DROP lower, e.g. when the mailbox reads no longer
+reuse the buffers. The check compares the two paths of the same run instead
+of fixed numbers, which change with the Python version and allocator. The
+minimum is used as the peaks of the first log page reads are higher, the
+check needs at least MIN_CHECK_CYCLES cycles for the log page reads to settle.
+
+Usage:
+    python tools/bench_allocations.py --cycles 50
+    python tools/bench_allocations.py --no-check
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+
+from benchmark import git_revision
+from component import import_module
+from simulator import SimulatedBox
+
+BydBoxClient = import_module('bydboxclient').BydBoxClient
+
+# share of the peak saved by reusing the buffers, ~9% (BMS status) and ~15% (log page) on CPython 3.13
+MIN_DROP = 0.05
+MIN_CHECK_CYCLES = 20
+
+
+class Response:
+    """Read holding registers response of the in-process transport."""
+
+    def __init__(self, registers: list) -> None:
+        self.registers = registers
+
+    def isError(self) -> bool:
+        return False
+
+def connect_in_process(client: BydBoxClient, box: SimulatedBox) -> None:
+    """Route the register reads and writes of the client to the simulated box."""
+
+    async def read_holding_registers(unit_id, address, count, retries = 3, timeout = None):
+        result = box.read(address, count)
+        return None if isinstance(result, int) else Response(result)
+
+    async def write_registers(unit_id, address, payload):
+        if box.write(address, payload) is not None:
+            raise Exception(f'write_registers: rejected {address}')
+        return True
+
+    async def wait_for_response(address, ready_response = 0x8801, unit_id = None):
+        return True
+
+    client.read_holding_registers = read_holding_registers
+    client.write_registers = write_registers
+    client._wait_for_response = wait_for_response
+
+def freeze_streams(box: SimulatedBox) -> None:
+    """Serve the same BMS status and log page in every cycle."""
+    def frozen(stream):
+        streams = {}
+        def first_stream(unit_id):
+            if not unit_id in streams:
+                streams[unit_id] = stream(unit_id)
+            return streams[unit_id]
+        return first_stream
+
+    box.bms_status_stream = frozen(box.bms_status_stream)
+    box.log_stream = frozen(box.log_stream)
+
+async def measure(cycles: int, run) -> dict:
+    # the first traced cycle allocates the trace of the lazily created objects
+    await run()
+    peaks = []
+    for _ in range(cycles):
+        current, _peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        await run()
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    peaks.sort()
+    return {'cycles': cycles, 'peak_bytes': {'min': peaks[0], 'median': peaks[len(peaks) // 2], 'max': peaks[-1]}}
+
+async def measure_both(cycles: int, client: BydBoxClient, run) -> dict:
+    reused = await measure(cycles, run)
+    client._mailbox_reuse_buffers = False
+    try:
+        new_buffer = await measure(cycles, run)
+    finally:
+        client._mailbox_reuse_buffers = True
+    drop = 1 - reused['peak_bytes']['min'] / new_buffer['peak_bytes']['min']
+    return {'reused': reused, 'new_buffer': new_buffer, 'drop': round(drop, 3)}
+
+async def run_benchmark(args) -> dict:
+    box = SimulatedBox(model=args.model, towers=1, modules=args.modules, ready_delay=0)
+    freeze_streams(box)
+    with tempfile.TemporaryDirectory(prefix='byd_alloc_') as log_path:
+        client = BydBoxClient(host='127.0.0.1', port=0, unit_id=1, timeout=3, log_path=log_path + '/')
+        connect_in_process(client, box)
+        await client.init_data()
+
+        # warm up: learn the mailbox read size, fill the log with the entries of the page
+        await client.update_bms_status_data(1)
+        await client.update_log_history_page(1, 0)
+
+        tracemalloc.start()
+        try:
+            result = {
+                'bms_status': await measure_both(args.cycles, client, lambda: client.update_bms_status_data(1)),
+                'log_page': await measure_both(args.cycles, client, lambda: client.update_log_history_page(1, 0)),
+            }
+        finally:
+            tracemalloc.stop()
+            client.close(linger=0)
+            client._log_store.close()
+
+    return {
+        'meta': {
+            'benchmark': 'allocations',
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'config': vars(args),
+        },
+        **result,
+    }
+
+def check_drop(result: dict) -> list:
+    """Returns the reads whose peak does not drop by MIN_DROP with the reused buffers."""
+    failed = []
+    for name in ['bms_status', 'log_page']:
+        read = result[name]
+        if read['drop'] < MIN_DROP:
+            failed.append(f"{name}: peak {read['reused']['peak_bytes']['min']} bytes with the reused buffers, "
+                          f"{read['new_buffer']['peak_bytes']['min']} bytes with new buffers, drop {read['drop']:.1%} < {MIN_DROP:.0%}")
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(description='BYD Battery Box mailbox read allocation benchmark')
+    parser.add_argument('--model', default='HVS')
+    parser.add_argument('--modules', type=int, default=None)
+    parser.add_argument('--cycles', type=int, default=50)
+    parser.add_argument('--output', default=None, help='write JSON result to file instead of stdout')
+    parser.add_argument('--no-check', action='store_true', help='do not check the drop of the allocations with the reused buffers')
+    args = parser.parse_args()
+    if not args.no_check and args.cycles < MIN_CHECK_CYCLES:
+        parser.error(f"the check needs at least {MIN_CHECK_CYCLES} cycles, use --no-check for less")
+
+    result = asyncio.run(run_benchmark(args))
+    failed = [] if args.no_check else check_drop(result)
+    output = json.dumps(result, indent=1)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, 'w') as outfile:
+            outfile.write(output)
+    for message in failed:
+        print(message, file=sys.stderr)
+    if len(failed) > 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
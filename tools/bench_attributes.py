@@ -0,0 +1,150 @@
+"""Benchmark of the serialized state attribute bytes of the sensors.
+
+Sets up the sensors as tools/bench_fanout.py does and runs the update
+schedule of the hub at the default scan intervals against an in-process
+simulated box. For every state write the extra state attributes are
+serialized with the JSON encoder of Home Assistant, as for the state
+machine and the recorder, in the compact per cell attributes
+(cellarrays.py) and in the previous format, a list of dicts per module:
+
+    cell_voltages   [{'m': 1, 'v': [mV, ...]}, ...]
+    cell_temps      [{'m': 1, 't': [°C, ...]}, ...]
+    cell_balancing  [{'m': 1, 'b': [0/1 per cell]}, ...]
+    total_cells     [{'m': 0, 'bct': [balancing entries per cell]}, ...]
+
+The previous format is expanded from the compact attributes, which checks
+the packing. Reports per attribute the writes and bytes per write and the
+attribute bytes per cycle of both formats.
+
+The simulated box draws new cell voltages, temperatures and balancing
+flags on every BMS status read, so every BMS update changes all cell
+attributes; a real box changes temperatures and balancing less often.
+
+The sensor platform imports Home Assistant, so it has to be installed.
+
+Usage:
+    python tools/bench_attributes.py --cycles 200 --towers 3
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+
+from bench_fanout import BydBoxClient, StubHub, setup_sensors
+from benchmark import git_revision
+from bench_allocations import connect_in_process
+from simulator import SimulatedBox
+
+from homeassistant.helpers.json import json_bytes
+
+def unpack_hex(packed: str, digits: int) -> list:
+    return [int(packed[i:i + digits], 16) for i in range(0, len(packed), digits)]
+
+def legacy_attribute(name: str, value):
+    """Attribute in the previous format."""
+    if value is None:
+        return None
+    if name == 'cell_voltages':
+        return [{'m': m + 1, 'v': unpack_hex(v, 3)} for m, v in enumerate(value['v'])]
+    if name == 'cell_temps':
+        return [{'m': m + 1, 't': unpack_hex(t, 2)} for m, t in enumerate(value['t'])]
+    if name == 'cell_balancing':
+        return [{'m': m + 1, 'b': [b >> i & 1 for i in range(16)]} for m, b in enumerate(value['b'])]
+    if name == 'total_cells':
+        return [{'m': m, 'bct': bct} for m, bct in enumerate(value['bct'])]
+    return value
+
+def serialized_size(attributes: dict) -> int:
+    return len(json_bytes(attributes))
+
+def check_packing(client: BydBoxClient) -> None:
+    """The unpacked voltages and temperatures give the averages of the client."""
+    for bms_id in range(1, client.data['towers'] + 1):
+        voltages = [v for m in legacy_attribute('cell_voltages', client.data[f'bms{bms_id}_cell_voltages']) for v in m['v']]
+        temps = [t for m in legacy_attribute('cell_temps', client.data[f'bms{bms_id}_cell_temps']) for t in m['t']]
+        assert round(sum(voltages) / len(voltages) * 0.001, 3) == client.data[f'bms{bms_id}_avg_c_v'], 'cell voltages'
+        assert round(sum(temps) / len(temps), 1) == client.data[f'bms{bms_id}_avg_c_t'], 'cell temps'
+
+async def run_benchmark(args) -> dict:
+    box = SimulatedBox(model=args.model, towers=args.towers, modules=args.modules, ready_delay=0)
+    client = BydBoxClient(host='127.0.0.1', port=0, unit_id=1, timeout=3, log_path=tempfile.mkdtemp(prefix='byd_attributes_') + '/')
+    connect_in_process(client, box)
+    await client.init_data()
+    await client.update_bmu_status_data()
+    await client.update_all_bms_status_data()
+    await client.update_all_log_data()
+
+    attributes = {}
+    def write(entity) -> None:
+        for name, value in (entity.extra_state_attributes or {}).items():
+            stats = attributes.setdefault(name, {'writes': 0, 'bytes': 0, 'bytes_before': 0})
+            stats['writes'] += 1
+            stats['bytes'] += serialized_size({name: value})
+            stats['bytes_before'] += serialized_size({name: legacy_attribute(name, value)})
+
+    hub = StubHub(client)
+    await setup_sensors(hub, write)
+    hub.fanout.publish(client.data)
+    attributes.clear()
+
+    bms_updates = 0
+    try:
+        for cycle in range(args.cycles):
+            run = [client.update_bmu_status_data]
+            if cycle % args.bms_every == 0:
+                bms_updates += 1
+                run += [client.update_all_bms_status_data, client.update_all_log_data]
+            for update in run:
+                assert await update(), 'update failed'
+                hub.fanout.publish(client.data)
+            check_packing(client)
+    finally:
+        client.close(linger=0)
+
+    for stats in attributes.values():
+        n = max(1, stats['writes'])
+        stats['bytes_per_write'] = round(stats['bytes'] / n)
+        stats['bytes_before_per_write'] = round(stats['bytes_before'] / n)
+    return {
+        'meta': {
+            'benchmark': 'attributes',
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'config': vars(args),
+        },
+        'attributes': attributes,
+        'bms_updates': bms_updates,
+        'cell_array_versions': {k: a.version for k, a in client._cell_arrays.items()},
+        'bytes_per_cycle': round(sum(s['bytes'] for s in attributes.values()) / args.cycles),
+        'bytes_before_per_cycle': round(sum(s['bytes_before'] for s in attributes.values()) / args.cycles),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='BYD Battery Box state attribute size benchmark')
+    parser.add_argument('--model', default='HVS')
+    parser.add_argument('--towers', type=int, default=1)
+    parser.add_argument('--modules', type=int, default=None)
+    parser.add_argument('--cycles', type=int, default=200, help='BMU status update cycles')
+    parser.add_argument('--bms-every', type=int, default=20, help='cycles per BMS status and log update, 600 s / 30 s by default')
+    parser.add_argument('--output', default=None, help='write JSON result to file instead of stdout')
+    args = parser.parse_args()
+
+    # the client is created on a running event loop
+    result = asyncio.run(run_benchmark(args))
+    output = json.dumps(result, indent=1)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, 'w') as outfile:
+            outfile.write(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Benchmark of the sensors per cell at full scale.
+
+Sets up the sensor platform with and without the cell sensors option (a
+sensor per cell voltage and per temperature sensor) on the stub hub of
+tools/bench_fanout.py, against an in-process simulated box, by default a
+HVS of 3 towers with 5 modules, and reports for both:
+
+    setup           time in ms to create the sensors and register them
+                    with the hub
+    bmu_status      per BMU status update, the publish time in us (change
+                    detection, cell sensor groups and callbacks) and the
+                    state writes of the cell sensors and of the other sensors
+    bms_status      the same per BMS status update of all towers
+
+State writes are counted instead of written to Home Assistant, so the
+times do not include them. The simulated box draws new cell voltages and
+temperatures on every BMS status read, so most cell sensors are written on
+every BMS update; on a real box fewer values change.
+
+The sensor platform imports Home Assistant, so it has to be installed.
+
+Usage:
+    python tools/bench_cells.py --towers 3 --modules 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+
+from bench_fanout import BydBoxClient, StubHub, sensor, setup_sensors
+from benchmark import git_revision
+from bench_allocations import connect_in_process
+from simulator import SimulatedBox
+
+CONF_CELL_SENSORS = sensor.CONF_CELL_SENSORS
+
+class Setup:
+    """Sensors of one configuration on their own stub hub."""
+
+    def __init__(self, client: BydBoxClient, cell_sensors: bool) -> None:
+        self.client = client
+        self.data = {CONF_CELL_SENSORS: cell_sensors}
+        self.entities = []
+        self.setup_ms = None
+        self.updates = {name: {'updates': 0, 'publish_us': 0.0, 'cell_writes': 0, 'writes': 0} for name in ['bmu_status', 'bms_status']}
+        self._update = None
+
+    def write(self, entity) -> None:
+        if not self._update is None:
+            self._update['cell_writes' if isinstance(entity, sensor.BydBoxCellSensor) else 'writes'] += 1
+
+    async def setup(self, repeat: int) -> None:
+        times = []
+        for _ in range(repeat):
+            self.hub = StubHub(self.client)
+            start = time.perf_counter()
+            self.entities = await setup_sensors(self.hub, self.write, self.data)
+            times.append(time.perf_counter() - start)
+        self.setup_ms = round(min(times) * 1000, 1)
+        self.hub.fanout.publish(self.client.data)
+
+    def publish(self, name: str) -> None:
+        self._update = self.updates[name]
+        start = time.perf_counter()
+        self.hub.fanout.publish(self.client.data)
+        self._update['publish_us'] += (time.perf_counter() - start) * 1e6
+        self._update['updates'] += 1
+        self._update = None
+
+    def result(self) -> dict:
+        for stats in self.updates.values():
+            n = max(1, stats['updates'])
+            stats['publish_us'] = round(stats['publish_us'] / n, 1)
+            stats['cell_writes'] = round(stats['cell_writes'] / n, 1)
+            stats['writes'] = round(stats['writes'] / n, 1)
+        return {
+            'entities': len(self.entities),
+            'cell_entities': sum(1 for e in self.entities if isinstance(e, sensor.BydBoxCellSensor)),
+            'setup_ms': self.setup_ms,
+            **self.updates,
+        }
+
+async def run_benchmark(args) -> dict:
+    box = SimulatedBox(model=args.model, towers=args.towers, modules=args.modules, ready_delay=0)
+    client = BydBoxClient(host='127.0.0.1', port=0, unit_id=1, timeout=3, log_path=tempfile.mkdtemp(prefix='byd_cells_') + '/')
+    connect_in_process(client, box)
+    await client.init_data()
+    await client.update_bmu_status_data()
+    await client.update_all_bms_status_data()
+
+    setups = {'without_cell_sensors': Setup(client, False), 'with_cell_sensors': Setup(client, True)}
+    try:
+        for setup in setups.values():
+            await setup.setup(args.repeat)
+        for cycle in range(args.cycles):
+            run = [('bmu_status', client.update_bmu_status_data)]
+            if cycle % args.bms_every == 0:
+                run.append(('bms_status', client.update_all_bms_status_data))
+            for name, update in run:
+                assert await update(), f'{name} update failed'
+                for setup in setups.values():
+                    setup.publish(name)
+    finally:
+        client.close(linger=0)
+
+    return {
+        'meta': {
+            'benchmark': 'cells',
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'config': vars(args),
+        },
+        **{name: setup.result() for name, setup in setups.items()},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='BYD Battery Box cell sensors benchmark')
+    parser.add_argument('--model', default='HVS')
+    parser.add_argument('--towers', type=int, default=3)
+    parser.add_argument('--modules', type=int, default=5)
+    parser.add_argument('--cycles', type=int, default=200, help='BMU status update cycles')
+    parser.add_argument('--bms-every', type=int, default=20, help='cycles per BMS status update, 600 s / 30 s by default')
+    parser.add_argument('--repeat', type=int, default=5, help='setups, the fastest is reported')
+    parser.add_argument('--output', default=None, help='write JSON result to file instead of stdout')
+    args = parser.parse_args()
+
+    # the client is created on a running event loop
+    result = asyncio.run(run_benchmark(args))
+    output = json.dumps(result, indent=1)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, 'w') as outfile:
+            outfile.write(output)
+
+if __name__ == "__main__":
+    main()
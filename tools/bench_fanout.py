@@ -0,0 +1,170 @@
+"""Benchmark of the entity state writes per update cycle.
+
+Sets up the sensors of the integration as the sensor platform does, on a
+stub hub that registers them with DataFanout, and runs BydBoxClient
+against an in-process simulated box (no network, no pymodbus transport)
+with the update schedule of the hub at the default scan intervals: a BMU
+status update every cycle and a BMS status and log update every
+--bms-every cycles. The log of the box gets a new entry every
+--log-entry-every log updates.
+
+Reports per update type the state writes of the previous fan-out, every
+entity on every update, and of the fan-out by changed data keys, with the
+time per publish in us (change detection plus callbacks, the state write
+of Home Assistant itself is not included).
+
+The sensor platform imports Home Assistant, so it has to be installed.
+
+Usage:
+    python tools/bench_fanout.py --cycles 200 --towers 2
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+
+from component import import_integration
+# the sensor platform needs the package with its __init__, before import_module
+sensor = import_integration('sensor')
+DataFanout = import_integration('datafanout').DataFanout
+
+from benchmark import git_revision
+from bench_allocations import connect_in_process
+from simulator import SimulatedBox
+
+BydBoxClient = import_integration('bydboxclient').BydBoxClient
+
+class StubHub:
+    """The parts of Hub used by the sensors."""
+
+    def __init__(self, client: BydBoxClient) -> None:
+        self._client = client
+        self.fanout = DataFanout()
+        self.device_info_bmu = {}
+
+    @property
+    def data(self) -> dict:
+        return self._client.data
+
+    def get_device_info_bms(self, id) -> dict:
+        return {}
+
+    def get_cell_values(self, id, name) -> list | None:
+        return self._client.get_cell_values(id, name)
+
+    @property
+    def cell_layout(self) -> tuple:
+        return self._client.cell_layout
+
+    def async_add_hub_entity(self, update_callback, keys = None) -> None:
+        self.fanout.subscribe(update_callback, keys)
+
+    def async_remove_hub_entity(self, update_callback) -> None:
+        self.fanout.unsubscribe(update_callback)
+
+class ConfigEntry:
+
+    def __init__(self, hub: StubHub, data: dict | None = None) -> None:
+        self.runtime_data = hub
+        self.data = {} if data is None else data
+        self.options = {}
+
+async def setup_sensors(hub: StubHub, write = None, data: dict | None = None) -> list:
+    """Sensors of the sensor platform, write(entity) is called instead of writing the state to Home Assistant."""
+    entities = []
+    await sensor.async_setup_entry(None, ConfigEntry(hub, data), entities.extend)
+    # sensors disabled by default are not added to Home Assistant
+    entities = [entity for entity in entities if entity.entity_registry_enabled_default]
+    for entity in entities:
+        entity.async_write_ha_state = (lambda: None) if write is None else functools.partial(write, entity)
+        await entity.async_added_to_hass()
+    return entities
+
+async def run_benchmark(args) -> dict:
+    box = SimulatedBox(model=args.model, towers=args.towers, modules=args.modules, ready_delay=0)
+    client = BydBoxClient(host='127.0.0.1', port=0, unit_id=1, timeout=3, log_path=tempfile.mkdtemp(prefix='byd_fanout_') + '/')
+    connect_in_process(client, box)
+    await client.init_data()
+    await client.update_bmu_status_data()
+    await client.update_all_bms_status_data()
+    await client.update_all_log_data()
+
+    hub = StubHub(client)
+    entities = await setup_sensors(hub)
+    hub.fanout.publish(client.data)
+
+    updates = {name: {'updates': 0, 'writes_all': 0, 'writes_changed': 0, 'publish_us': 0.0} for name in ['bmu_status', 'bms_status', 'log_data']}
+    log_updates = 0
+    try:
+        for cycle in range(args.cycles):
+            run = [('bmu_status', client.update_bmu_status_data)]
+            if cycle % args.bms_every == 0:
+                log_updates += 1
+                if log_updates % args.log_entry_every == 0:
+                    box.add_log_entry(1, 17, bytes(23))
+                run += [('bms_status', client.update_all_bms_status_data), ('log_data', client.update_all_log_data)]
+            for name, update in run:
+                assert await update(), f'{name} update failed'
+                start = time.perf_counter()
+                writes = hub.fanout.publish(client.data)
+                stats = updates[name]
+                stats['publish_us'] += (time.perf_counter() - start) * 1e6
+                stats['updates'] += 1
+                stats['writes_all'] += len(entities)
+                stats['writes_changed'] += writes
+    finally:
+        client.close(linger=0)
+
+    for stats in updates.values():
+        n = max(1, stats['updates'])
+        stats['writes_all_per_update'] = round(stats['writes_all'] / n, 1)
+        stats['writes_changed_per_update'] = round(stats['writes_changed'] / n, 1)
+        stats['publish_us'] = round(stats['publish_us'] / n, 1)
+    writes_all = sum(s['writes_all'] for s in updates.values())
+    writes_changed = sum(s['writes_changed'] for s in updates.values())
+    return {
+        'meta': {
+            'benchmark': 'fanout',
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'config': vars(args),
+        },
+        'entities': len(entities),
+        'updates': updates,
+        'writes_all_per_cycle': round(writes_all / args.cycles, 1),
+        'writes_changed_per_cycle': round(writes_changed / args.cycles, 1),
+        'counters': hub.fanout.counters,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='BYD Battery Box entity state write benchmark')
+    parser.add_argument('--model', default='HVS')
+    parser.add_argument('--towers', type=int, default=1)
+    parser.add_argument('--modules', type=int, default=None)
+    parser.add_argument('--cycles', type=int, default=200, help='BMU status update cycles')
+    parser.add_argument('--bms-every', type=int, default=20, help='cycles per BMS status and log update, 600 s / 30 s by default')
+    parser.add_argument('--log-entry-every', type=int, default=3, help='log updates per new log entry')
+    parser.add_argument('--output', default=None, help='write JSON result to file instead of stdout')
+    args = parser.parse_args()
+
+    # the client is created on a running event loop
+    result = asyncio.run(run_benchmark(args))
+    output = json.dumps(result, indent=1)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, 'w') as outfile:
+            outfile.write(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+"""Benchmark of the log entry decoding, if/elif chains versus logdecoder.
+
+Decodes the entries of the bundled log (custom_components/byd_battery_box/
+logs/byd_logs.json) and random data for every BMU and BMS log code with the
+previous decoding, copied below as LegacyLogDecoder, and with the dispatch
+table of logdecoder.py. Checks both give the same code description, data
+points and text, or raise the same exception, and reports the time per
+decoded entry in µs:
+
+    corpus          entries of the bundled log
+    random          random data of every code with a decoder
+
+Usage:
+    python tools/bench_logdecoder.py --number 20
+"""
+
+import argparse
+import binascii
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+
+from benchmark import git_revision
+from component import COMPONENT_PATH, import_module
+
+bydbox_const = import_module('bydbox_const')
+logdecoder = import_module('logdecoder')
+ExtModbusClient = import_module('extmodbusclient').ExtModbusClient
+
+from byd_battery_box.bydbox_const import *
+
+_LOGGER = logging.getLogger(__name__)
+
+class LegacyLogDecoder:
+    """Log decoding of BydBoxClient before logdecoder.py."""
+
+    calculate_value = ExtModbusClient.calculate_value
+    get_value_from_dict = ExtModbusClient.get_value_from_dict
+    convert_from_byte_uint16 = ExtModbusClient.convert_from_byte_uint16
+    convert_from_byte_int16 = ExtModbusClient.convert_from_byte_int16
+    bitmask_to_strings = ExtModbusClient.bitmask_to_strings
+    strings_to_string = ExtModbusClient.strings_to_string
+
+    def decode_log_data(self, unit_id:int, ts:datetime, code:int, data:bytearray):
+        decoded = {}
+        if unit_id == 0:
+            code_desc = self.get_value_from_dict(BMU_LOG_CODES, code, 'Not available')
+            decoded = self.decode_bmu_log_data(ts, code, data)
+        else:
+            code_desc = self.get_value_from_dict(BMS_LOG_CODES, code, 'Not available')
+            decoded = self.decode_bms_log_data(ts, code, data)
+
+        if len(decoded)>0:
+            decoded['desc'] = self.log_data_to_str(decoded)
+        else:
+            decoded['desc'] = f'Not decoded: {binascii.hexlify(data).decode('ascii')}'
+
+        return code_desc, decoded
+
+    def decode_bmu_log_data(self, ts:datetime, code:int, data:bytearray) -> dict:
+        datapoints = {}
+
+        if code == 0:
+            datapoints['bootl'] = data[0]
+            if data[1] == 0:
+                datapoints['exec'] = 'A'
+            elif data[1] == 1:
+                datapoints['exec'] = 'B'
+            else:
+                datapoints['exec'] = data[1]
+            datapoints['firmware_v'] = f"{data[2]:d}" + "." + f"{data[3]:d}" 
+        elif code == 1:
+            if data[0] == 0:
+                datapoints['switchoff'] = '0' 
+            elif data[0] == 1:
+                datapoints['switchoff'] = 'LED button' 
+            else:
+                datapoints['switchoff'] = data[0] 
+        elif code == 2:
+            if data[0] == 0:
+                event = 'Error/Warning cleared'
+            else:            
+                error_code = data[1]
+                if error_code != 23:
+                    error = self.get_value_from_dict(BMU_LOG_ERRORS, error_code, 'Undefined')
+                    event = f'Error; {error.lower()}'
+                else:
+                    warnings = int(data[2] * 0x100 + data[3])
+                    warnings_list = self.bitmask_to_strings(warnings, BMU_LOG_WARNINGS)
+                    event = f'Warning; {self.strings_to_string(warnings_list).lower()}'
+
+            datapoints['event'] = event
+            datapoints['c_max_v'] = self.convert_from_byte_uint16(data,4)
+            datapoints['c_min_v'] = self.convert_from_byte_uint16(data,6)
+            datapoints['bat_max_t'] = data[8]
+            datapoints['bat_min_t'] = data[9]
+            datapoints['bat_v'] =  self.calculate_value(self.convert_from_byte_uint16(data,10), -1, 1) 
+            datapoints['soc'] = data[12]                
+            datapoints['soh'] = data[13]  
+        elif code == 32:
+            datapoints['p_status'] = self.get_value_from_dict(BMU_STATUS, data[1], 'NA')
+            datapoints['n_status'] = self.get_value_from_dict(BMU_STATUS, data[0], 'Undefined')
+        elif code == 34:
+            datapoints['firmware_v'] = f"{data[1]:d}" + "." + f"{data[2]:d}" 
+            datapoints['mcu'] = data[4]
+        elif code == 35:
+            datapoints['firmware_v'] = f"{data[1]:d}" + "." + f"{data[2]:d}" 
+            datapoints['mcu'] = data[4]
+        elif code == 36:
+            running_time = data[0] * 0x01000000 + data[1] * 0x00010000 + data[2] * 0x00000100 + data[3]
+            datapoints['rtime'] = running_time
+            datapoints['bmu_qty_c'] = data[4]
+            datapoints['bmu_qty_t'] = data[5]
+            datapoints['c_max_v'] = self.convert_from_byte_uint16(data,6)
+            datapoints['c_min_v'] = self.convert_from_byte_uint16(data,8)
+            datapoints['c_max_t'] = data[10]
+            datapoints['c_min_t'] = data[11]
+            datapoints['out_a'] = self.calculate_value(self.convert_from_byte_int16(data,12), -1, 1)
+            datapoints['out_v'] = self.calculate_value(self.convert_from_byte_uint16(data,14), -1, 1)
+            datapoints['acc_v'] = self.calculate_value(self.convert_from_byte_uint16(data,16), -1, 1)
+            datapoints['bms_addr'] = data[18]
+            datapoints['m_type'] = self.get_value_from_dict(MODULE_TYPE, data[19], 'Undefined')
+            datapoints['m_qty'] = data[20]
+        elif code == 38:
+            datapoints['max_charge_a'] = self.calculate_value(self.convert_from_byte_int16(data,0), -1, 1)
+            datapoints['max_discharge_a'] = self.calculate_value(self.convert_from_byte_int16(data,2), -1, 1)
+            datapoints['max_charge_v'] = self.calculate_value(self.convert_from_byte_int16(data,4), -1, 1)
+            datapoints['max_discharge_v'] = self.calculate_value(self.convert_from_byte_int16(data,6), -1, 1)
+            datapoints['status'] = [self.get_value_from_dict(BMU_STATUS, data[8], 'Undefined')]
+            datapoints['bat_t'] = data[9]
+            datapoints['inverter'] = INVERTER_LIST[data[10]]
+            datapoints['bms_qty'] = data[11]
+        elif code == 40:
+            datapoints['firmware_n1']  = data[0]    
+            datapoints['firmware_v1']  = f"{data[1]:d}" + "." + f"{data[2]:d}"
+            datapoints['firmware_n2']  = data[3]    
+            datapoints['firmware_v2']  = f"{data[4]:d}" + "." + f"{data[5]:d}"
+            if data[6] != 0xFF:
+                datapoints['firmware_n3']  = data[6]    
+                datapoints['firmware_v3']  = f"{data[7]:d}" + "." + f"{data[8]:d}"
+        elif code == 41:
+            # ?
+            pass
+        elif code == 45:
+            #status = self.get_value_from_dict(BMU_STATUS, data[0], 'Undefined')
+            datapoints['status'] = f'{data[0]}'
+            # 0: 0-1
+            # 1: 0
+            # 2: 0-1
+            # 3: x02
+            datapoints['out_v'] =  self.calculate_value(self.convert_from_byte_uint16(data,4), -1, 1) 
+            datapoints['bat_v'] =  self.calculate_value(self.convert_from_byte_uint16(data,6), -1, 1) 
+            # 8: 00
+            # 9: 00
+            datapoints['soc_a'] = self.calculate_value(self.convert_from_byte_uint16(data,10), -1, 1)
+            datapoints['soc_b'] = self.calculate_value(self.convert_from_byte_uint16(data,12), -1, 1)
+        elif code == 101:
+            if data[0] == 0:
+                datapoints['bms_updt'] = 'A'
+            else:
+                datapoints['bms_updt'] = 'A'
+            datapoints['firmware_v'] = f"{data[1]:d}" + "." + f"{data[2]:d}" 
+        elif code == 102:
+            if data[0] == 0:
+                datapoints['bms_updt'] = 'A'
+            else:
+                datapoints['bms_updt'] = 'A'
+            datapoints['firmware_v'] = f"{data[1]:d}" + "." + f"{data[2]:d}" 
+        elif code == 103:
+            datapoints['firmware_n1']  = data[0]    
+            datapoints['firmware_v1']  = f"{data[1]:d}" + "." + f"{data[2]:d}"
+            datapoints['firmware_n2']  = data[3]    
+            datapoints['firmware_v2']  = f"{data[4]:d}" + "." + f"{data[5]:d}"
+        elif code == 105:
+            if (data[0] == 0) or (data[0] == 1) or (data[0] == 2):
+               # BMU Parameters table update
+                #datapoints['pt_u'] = ''
+                pass
+            else:
+                # ?
+                pass
+            datapoints['pt_v'] = f"{data[1]:d}" + "." + f"{data[2]:d}"
+        elif code == 111:            
+            datapoints['dt_cal'] = self.get_value_from_dict(BMU_CALIBRATION, data[0], 'Undefined')
+        elif code == 118:
+            status = self.get_value_from_dict(BMU_STATUS, data[0], 'Undefined')
+            datapoints['status'] = [status]
+            if status != 'Undefined':
+                datapoints['env_min_t'] = data[1]                
+                datapoints['env_max_t'] = data[2]                
+                datapoints['soc'] = data[3]                
+                datapoints['soh'] = data[4]                
+                datapoints['bat_t'] = data[5]
+                datapoints['bat_v'] = self.calculate_value(self.convert_from_byte_uint16(data,6), -1, 1) 
+                datapoints['c_max_v'] = self.convert_from_byte_uint16(data,8)
+                datapoints['c_min_v'] = self.convert_from_byte_uint16(data,10)
+                datapoints['bat_max_t'] = data[13]
+                datapoints['bat_min_t'] = data[15]
+ 
+        return datapoints
+
+    def decode_bms_log_data(self, ts:datetime, code:int, data:bytearray) -> dict:
+        datapoints = {}
+
+        if code == 0:
+            datapoints['bootl'] = data[0]
+            if data[1] == 0:
+                datapoints['exec'] = 'A'
+            elif data[1] == 2:
+                datapoints['exec'] = 'B'
+            else:
+                datapoints['exec'] = data[1]
+            datapoints['firmware_v'] = f"{data[3]:d}" + "." + f"{data[4]:d}" 
+        elif code == 1:
+            datapoints['power_off'] =self.get_value_from_dict(BMS_POWER_OFF, data[1], default='NA')
+
+            if data[2] == 0:
+                datapoints['section'] = 'A'
+            elif data[2] == 1:
+                datapoints['section'] = 'B'
+            else:
+                datapoints['section'] = data[2]
+
+            datapoints['firmware_v']  = f"{data[3]:d}" + "." + f"{data[4]:d}"
+        elif code in [2,3,4,5,6,7,9,10,11,13,14,16,19,20,21]:            
+            warnings1 = int(data[1] * 0x100 + data[0])
+            warnings2 = int(data[3] * 0x100 + data[2])
+            warnings3 = int(data[5] * 0x100 + data[4])
+            warnings_list = self.bitmask_to_strings(warnings1, BMS_WARNINGS) + self.bitmask_to_strings(warnings2, BMS_WARNINGS) + self.bitmask_to_strings(warnings3, BMS_WARNINGS3)
+            datapoints['warnings'] = warnings_list
+
+            errors = int(data[7] * 0x100 + data[6])
+            errors_list = self.bitmask_to_strings(errors, BMS_ERRORS)
+            datapoints['errors'] = errors_list
+
+            status = int(data[8])
+            if (status % 2) == 1:
+                status_list = self.bitmask_to_strings(status, BMS_STATUS_OFF)            
+            else:
+                status_list = self.bitmask_to_strings(status, BMS_STATUS_ON)
+            datapoints['status'] = status_list
+
+            if code == 9:
+                datapoints['bat_idle'] = data[9]
+                datapoints['target_soc'] = data[10]
+            elif code == 20:
+                datapoints['bmu_serial_v1'] = data[9]
+                datapoints['bmu_serial_v2'] = data[10]
+            else:
+                datapoints['soc'] = data[9]
+                datapoints['soh'] = data[10]
+                datapoints['bat_v'] = self.calculate_value(self.convert_from_byte_uint16(data,11,'LE'), -1, 1)
+                datapoints['out_v'] = self.calculate_value(self.convert_from_byte_uint16(data,13,'LE'), -1, 1)
+                datapoints['out_a'] = self.calculate_value(self.convert_from_byte_int16(data,15,'LE'), -1, 1)
+
+            if code == 21:
+                datapoints['c_max_v_n'] = data[17]
+                datapoints['c_min_v_n'] = data[18]
+                datapoints['c_max_t_n'] = data[20]
+                datapoints['c_min_t_n'] = data[21]
+            else:
+                datapoints['c_max_v'] = self.convert_from_byte_uint16(data,17,'LE')
+                datapoints['c_min_v'] = self.convert_from_byte_uint16(data,19,'LE')
+                datapoints['c_max_t'] = data[21]
+                datapoints['c_min_t'] = data[22]
+        elif code in [17,18]:
+            if code == 17:
+                bc = []
+                i = 0
+                for j in range(20):  
+                    b = int(data[j])
+                    for bit in range(8):
+                        if b >> bit & 1:
+                            bc.append(str(i))
+                        i += 1
+                datapoints['b_cells'] = bc
+
+            c_min_v = self.convert_from_byte_uint16(data,21,'LE')
+            datapoints['c_min_v'] = c_min_v
+        elif code in [101,102]:
+            if data[0] == 0:
+                datapoints['area'] = 'A'
+            else:
+                datapoints['area'] = 'B'
+            datapoints['firmware_p']  = f"{data[2]:d}" + "." + f"{data[1]:d}"
+            datapoints['firmware_n']  = f"{data[4]:d}" + "." + f"{data[3]:d}"
+        elif code == 105:
+            x = self.convert_from_byte_uint16(data, 0, type='LE')
+            y = self.convert_from_byte_uint16(data, 2, type='LE')
+#            datapoints['threshold']  = f"{x:d}" + "." + f"{y:d}"
+            datapoints['pt_v']  = f"{x:d}" + "." + f"{y:d}"
+        elif code == 106:
+            datapoints['sn_change'] = 1
+        elif code == 111:
+            try:
+                nt = datetime(year=data[0]+2000, month=data[1], day=data[2], hour=data[3], minute=data[4], second=data[5])
+                datapoints['nt'] = nt
+            except Exception as e:
+                _LOGGER.error(f'Failed to convert to datetime {data[0]} {data[1]} {data[2]} {data[3]} {data[4]} {data[5]} {e}')
+            #datapoints['dt'] = (ts - nt).total_seconds()
+
+        return datapoints
+
+    def log_data_to_str(self, data) -> str:
+        strings = []
+        for dp, v in data.items():
+            dp_config = DATA_POINTS.get(dp)
+            if not dp_config is None:
+                s = f"{dp_config['label']}: "
+                t = dp_config.get('type')
+                if t in ['nlist','slist']:
+                    if len(v) > 0:
+                        if t == 'slist':
+                            s += ', '.join(v)
+                        else:
+                            s += ','.join(v)                        
+                    else:
+                        s += '-'
+                elif t == 's': # string
+                    s = dp_config['label'].replace('{v}', f'{v}')
+                else: # 'n' numeric
+                    s += f"{v}"
+                    unit = dp_config.get('unit')
+                    if len(unit) > 0:
+                        s += f" {unit}"
+                strings.append(s)
+            else:
+                _LOGGER.error(f'Datapoint {dp} not defined')
+        return f"{'. '.join(strings)}."
+
+def decode_all(decode, entries) -> list:
+    results = []
+    for unit_id, code, data in entries:
+        try:
+            results.append(decode(unit_id, code, data))
+        except Exception as e:
+            results.append(type(e))
+    return results
+
+def check(name, entries, legacy, decoder) -> dict:
+    expected, result = decode_all(legacy, entries), decode_all(decoder, entries)
+    for entry, e, r in zip(entries, expected, result):
+        if e != r:
+            raise AssertionError(f'{name} decode of {entry[0]}, {entry[1]}, {bytes(entry[2]).hex()} differs: {e} != {r}')
+    return {'entries': len(entries), 'exceptions': sum(1 for e in expected if isinstance(e, type))}
+
+def random_entries(rng: random.Random, samples: int) -> list:
+    entries = []
+    for device, code in logdecoder.LOG_DECODERS:
+        unit_id = 0 if device == logdecoder.BMU else 1
+        for _ in range(samples):
+            data = bytearray(rng.randbytes(logdecoder.LOG_DATA_SIZE))
+            if rng.random() < 0.5:
+                # small values, e.g. defined status codes and valid dates
+                data = bytearray(b % 13 for b in data)
+            entries.append((unit_id, code, data))
+    return entries
+
+def main():
+    parser = argparse.ArgumentParser(description='BYD Battery Box log decoder benchmark')
+    parser.add_argument('--log', default=os.path.join(COMPONENT_PATH, 'logs', 'byd_logs.json'), help='log to decode')
+    parser.add_argument('--samples', type=int, default=200, help='random data per log code')
+    parser.add_argument('--number', type=int, default=20, help='decodes of all entries per measurement')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default=None, help='write JSON result to file instead of stdout')
+    args = parser.parse_args()
+
+    # the legacy and new decoders log the same errors for invalid dates
+    logging.disable(logging.ERROR)
+    with open(args.log, 'r') as infile:
+        log = json.load(infile)
+    corpus = [(int(e['u']), int(e['c']), bytearray.fromhex(e['data'])) for e in log.values()]
+    entries = {'corpus': corpus, 'random': random_entries(random.Random(args.seed), args.samples)}
+
+    legacy = LegacyLogDecoder()
+    def legacy_decode(unit_id, code, data):
+        return legacy.decode_log_data(unit_id, None, code, data)
+    def table_decode(unit_id, code, data):
+        return logdecoder.decode_log_data(unit_id, code, data)
+
+    result = {
+        'meta': {
+            'benchmark': 'logdecoder',
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'config': vars(args),
+        },
+    }
+    for name, samples in entries.items():
+        result[name] = check(name, samples, legacy_decode, table_decode)
+        legacy_s = min(timeit.repeat(lambda: decode_all(legacy_decode, samples), number=args.number, repeat=3)) / args.number / len(samples)
+        table_s = min(timeit.repeat(lambda: decode_all(table_decode, samples), number=args.number, repeat=3)) / args.number / len(samples)
+        result[name].update({'legacy_us': legacy_s * 1e6, 'table_us': table_s * 1e6, 'speedup': legacy_s / table_s})
+    output = json.dumps(result, indent=1)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, 'w') as outfile:
+            outfile.write(output)
+
+if __name__ == "__main__":
+    main()
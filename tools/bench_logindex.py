@@ -0,0 +1,117 @@
+"""Benchmark of the log queries, plain dict versus LogIndex.
+
+Generates logs of synthetic entries (see bench_logstore.py) and reports per
+log size the time in s of:
+
+    build           LogIndex of the entries loaded from the log store
+    latest          newest 20 entries, as get_log_list
+    since           entries of the last day
+    unit_range      entries of one unit over one day
+    sync_count      entries of a unit since a key, as the log sync watermark
+    insert_newest   insert of a new entry newer than all others
+    insert_oldest   insert of an entry older than all others, e.g. log history
+
+The dict figures are the scans and sorts used before the LogIndex.
+
+Usage:
+    python tools/bench_logindex.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import timeit
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+
+from bench_logstore import generate_log
+from benchmark import git_revision
+from component import import_module
+
+logindex = import_module('logindex')
+LogIndex = logindex.LogIndex
+
+def best(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+def bench_size(size: int, args, rng: random.Random) -> dict:
+    log = dict(sorted(generate_log(size, args.units, rng).items()))
+    index = LogIndex(log)
+    last_ts = max(e['ts'] for e in log.values())
+    day = last_ts - 86400
+    day_key = logindex.log_key_time(day)
+    unit_id = 1
+
+    def dict_latest():
+        return sorted(log.items(), reverse=True)[:20]
+
+    def dict_since():
+        return sorted((k, e) for k, e in log.items() if e['ts'] >= day)
+
+    def dict_unit_range():
+        return sorted((k, e) for k, e in log.items() if e['u'] == unit_id and day <= e['ts'] < last_ts)
+
+    def dict_sync_count():
+        return sum(1 for k, e in log.items() if e['u'] == unit_id and k >= day_key)
+
+    assert [k for k, e in index.latest(20)] == [k for k, e in dict_latest()]
+    assert index.since(day) == dict_since()
+    assert index.range(day, last_ts, unit_id=unit_id) == dict_unit_range()
+    assert index.count_keys(start=day_key, unit_id=unit_id) == dict_sync_count()
+
+    number = max(1, args.number // size)
+    result = {'entries': size}
+    result['build_s'] = best(lambda: LogIndex(log), 1)
+    for name, legacy, indexed in [
+        ('latest', dict_latest, lambda: index.latest(20)),
+        ('since', dict_since, lambda: index.since(day)),
+        ('unit_range', dict_unit_range, lambda: index.range(day, last_ts, unit_id=unit_id)),
+        ('sync_count', dict_sync_count, lambda: index.count_keys(start=day_key, unit_id=unit_id)),
+    ]:
+        result[name] = {'dict_s': best(legacy, number), 'index_s': best(indexed, 1000)}
+
+    # every insert adds a new key, so each batch is timed once
+    def insert(entries) -> float:
+        start = time.perf_counter()
+        for k, e in entries.items():
+            index[k] = e
+        return (time.perf_counter() - start) / len(entries)
+    result['insert_newest_s'] = insert(generate_log(1000, args.units, rng, start=last_ts))
+    result['insert_oldest_s'] = insert(generate_log(1000, args.units, rng, start=0))
+    assert len(index) == size + 2000
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='BYD Battery Box log index benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help='log entries')
+    parser.add_argument('--units', type=int, default=4, help='BMU plus BMS units')
+    parser.add_argument('--number', type=int, default=1000000, help='entries scanned per dict measurement')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default=None, help='write JSON result to file instead of stdout')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    result = {
+        'meta': {
+            'benchmark': 'logindex',
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'config': vars(args),
+        },
+        'sizes': [bench_size(size, args, rng) for size in args.sizes],
+    }
+    output = json.dumps(result, indent=1)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, 'w') as outfile:
+            outfile.write(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Benchmark of the log persistence, JSON file versus log store.
+
+Generates logs of synthetic entries in the format of BydBoxClient.log and
+reports per log size, in s:
+
+    json_save       rewrite of byd_log.json as done on every save before the log store
+    json_load       load of byd_log.json
+    store_import    import of byd_log.json into an empty log store
+    store_load      load of all entries from the log store
+    store_add       save of one poll of new entries (--new) to the log store
+    store_query     entries of one unit over one day, newest first
+    json_bytes / store_bytes    file sizes
+
+Usage:
+    python tools/bench_logstore.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+
+from benchmark import git_revision
+from component import import_module
+
+LogStore = import_module('logstore').LogStore
+
+START_TS = 1600000000.0
+
+def generate_log(size: int, units: int, rng: random.Random, start: float = START_TS) -> dict:
+    log = {}
+    ts = start
+    while len(log) < size:
+        ts += rng.randint(1, 600)
+        unit_id = rng.randrange(units)
+        code = rng.randrange(40)
+        key = f'{datetime.fromtimestamp(ts).strftime("%Y%m%d %H:%M:%S")}-{code}-{unit_id}'
+        log[key] = {'ts': ts, 'u': unit_id, 'c': code, 'data': rng.randbytes(23).hex()}
+    return log
+
+def timed(func) -> tuple:
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+def bench_size(size: int, args, rng: random.Random) -> dict:
+    path = tempfile.mkdtemp(prefix='byd_logstore_')
+    try:
+        log = generate_log(size, args.units, rng)
+        json_path = os.path.join(path, 'byd_log.json')
+        store = LogStore(os.path.join(path, 'byd_log.db'))
+
+        def json_save():
+            with open(json_path, 'w') as outfile:
+                json.dump(log, outfile, indent=1, sort_keys=False, default=str)
+
+        def json_load():
+            with open(json_path, 'r') as infile:
+                return json.load(infile)
+
+        result = {'entries': size}
+        result['json_save_s'], _ = timed(json_save)
+        result['json_load_s'], loaded = timed(json_load)
+        assert len(loaded) == size
+        result['store_import_s'], imported = timed(lambda: store.import_json(json_path))
+        assert imported == size
+        result['store_load_s'], loaded = timed(store.load)
+        assert loaded == dict(sorted(log.items()))
+
+        last_ts = max(e['ts'] for e in log.values())
+        adds = []
+        for _ in range(args.repeat):
+            new = generate_log(args.new, args.units, rng, start=last_ts)
+            last_ts = max(e['ts'] for e in new.values())
+            seconds, added = timed(lambda: store.add(new))
+            assert added == len(new)
+            adds.append(seconds)
+        result['store_add_s'] = min(adds)
+
+        day_start = START_TS + (last_ts - START_TS) / 2
+        queries = [timed(lambda: store.query(unit=1, start=day_start, end=day_start + 86400, newest_first=True)) for _ in range(args.repeat)]
+        result['store_query_s'] = min(q[0] for q in queries)
+        result['store_query_entries'] = len(queries[0][1])
+
+        store.close()
+        result['json_bytes'] = os.path.getsize(json_path)
+        result['store_bytes'] = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path) if f.startswith('byd_log.db'))
+        return result
+    finally:
+        shutil.rmtree(path)
+
+def main():
+    parser = argparse.ArgumentParser(description='BYD Battery Box log store benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help='log entries')
+    parser.add_argument('--units', type=int, default=4, help='BMU plus BMS units')
+    parser.add_argument('--new', type=int, default=20, help='new entries per save')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default=None, help='write JSON result to file instead of stdout')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    result = {
+        'meta': {
+            'benchmark': 'logstore',
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'config': vars(args),
+        },
+        'sizes': [bench_size(size, args, rng) for size in args.sizes],
+    }
+    output = json.dumps(result, indent=1)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, 'w') as outfile:
+            outfile.write(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Microbenchmark of the BMU and BMS status decoding.
+
+Compares the compiled register maps (registermap.BMU_STATUS_REGISTERS and
+BMS_STATUS_REGISTERS) and the batched cell decoding with the previous
+decoding of each field and cell by its own convert_from_registers call,
+checks both give the same values on random and simulated registers and
+reports the time per decode.
+
+Usage:
+    python tools/bench_registermap.py --number 20000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+
+from pymodbus.client import AsyncModbusTcpClient
+
+from component import import_module
+from simulator import SimulatedBox
+
+registermap = import_module('registermap')
+
+convert = AsyncModbusTcpClient.convert_from_registers
+DATATYPE = AsyncModbusTcpClient.DATATYPE
+
+def int8(regs):
+    return [int(regs[0] >> 8), int(regs[0] & 0xFF)]
+
+def legacy_bmu_status(regs) -> dict:
+    """Decoding of update_bmu_status_data before the register map."""
+    v = {}
+    v['soc'] = convert(regs[0:1], data_type = DATATYPE.UINT16)
+    v['max_cell_v'] = round(convert(regs[1:2], data_type = DATATYPE.UINT16) * 0.01,2)
+    v['min_cell_v'] = round(convert(regs[2:3], data_type = DATATYPE.UINT16) * 0.01,2)
+    v['soh'] = convert(regs[3:4], data_type = DATATYPE.UINT16)
+    v['current'] = round(convert(regs[4:5], data_type = DATATYPE.INT16) * 0.1,1)
+    v['bat_voltage'] = round(convert(regs[5:6], data_type = DATATYPE.UINT16) * 0.01,2)
+    v['max_cell_temp'] = convert(regs[6:7], data_type = DATATYPE.INT16)
+    v['min_cell_temp'] = convert(regs[7:8], data_type = DATATYPE.INT16)
+    v['bmu_temp'] = convert(regs[8:9], data_type = DATATYPE.INT16)
+    v['errors'] = convert(regs[13:14], data_type = DATATYPE.UINT16)
+    v['param_t_v1'], v['param_t_v2'] = int8(regs[14:15])
+    v['output_voltage'] = round(convert(regs[16:17], data_type = DATATYPE.UINT16) * 0.01,2)
+    v['charge_lfte'] = convert(regs[17:19], data_type = DATATYPE.UINT32, word_order='little') * 0.1
+    v['discharge_lfte'] = convert(regs[19:21], data_type = DATATYPE.UINT32, word_order='little') * 0.1
+    return v
+
+def legacy_bms_status(regs) -> dict:
+    """Decoding of the scalar fields of update_bms_status_data before the register map."""
+    v = {}
+    v['max_c_v'] = round(convert(regs[1:2], data_type = DATATYPE.INT16) * 0.001,3)
+    v['min_c_v'] = round(convert(regs[2:3], data_type = DATATYPE.INT16) * 0.001,3)
+    v['max_c_v_id'], v['min_c_v_id'] = int8(regs[3:4])
+    v['max_c_t'] = convert(regs[4:5], data_type = DATATYPE.INT16)
+    v['min_c_t'] = convert(regs[5:6], data_type = DATATYPE.INT16)
+    v['max_c_t_id'], v['min_c_t_id'] = int8(regs[6:7])
+    v['charge_lfte'] = convert(regs[15:17], data_type = DATATYPE.UINT32, word_order='little') * 0.001
+    v['discharge_lfte'] = convert(regs[17:19], data_type = DATATYPE.UINT32, word_order='little') * 0.001
+    v['reg20'] = convert(regs[20:21], data_type = DATATYPE.UINT16)
+    v['bat_voltage'] = round(convert(regs[21:22], data_type = DATATYPE.INT16) * 0.1,2)
+    v['output_voltage'] = round(convert(regs[24:25], data_type = DATATYPE.INT16) * 0.1,2)
+    v['soc'] = round(convert(regs[25:26], data_type = DATATYPE.INT16) * 0.1,2)
+    v['soh'] = convert(regs[26:27], data_type = DATATYPE.INT16)
+    v['current'] = round(convert(regs[27:28], data_type = DATATYPE.INT16) * 0.1,2)
+    v['warnings1'] = convert(regs[28:29], data_type = DATATYPE.UINT16)
+    v['warnings2'] = convert(regs[29:30], data_type = DATATYPE.UINT16)
+    v['warnings3'] = convert(regs[30:31], data_type = DATATYPE.UINT16)
+    v['errors'] = convert(regs[48:49], data_type = DATATYPE.UINT16)
+    return v
+
+def legacy_bms_cells(regs, modules, cells, temps) -> list:
+    """Cell voltages, temperatures, balancing flags and their aggregates of update_bms_status_data before the batched decoding."""
+    cell_balancing = []
+    balancing_cells = 0
+    for m in range(modules):
+        flags = convert(regs[7+m:7+m+1], data_type = DATATYPE.UINT16)
+        cell_balancing.append([flags >> bit & 1 for bit in range(16)])
+        balancing_cells += flags.bit_count()
+    regs_voltages = regs[49:65] + regs[66:130] + regs[131:180]
+    regs_temps = regs[180:195] + regs[196:213]
+    temp_parts = round(temps/2) if temps > 0 else 0
+    cell_voltages, cell_temps = [], []
+    all_cell_voltages, all_cell_temps = [], []
+    for m in range(modules):
+        values = []
+        for i in range(cells):
+            values.append(convert(regs_voltages[i+m*16:i+m*16+1], data_type = DATATYPE.INT16))
+        cell_voltages.append(values)
+        all_cell_voltages += values
+        values = []
+        for i in range(temp_parts):
+            values += int8(regs_temps[i+m*4:i+m*4+1])
+        cell_temps.append(values)
+        all_cell_temps += values
+    avg_cell_voltage = round(sum(all_cell_voltages) / len(all_cell_voltages) * 0.001, 3)
+    avg_cell_temp = round(sum(all_cell_temps) / len(all_cell_temps),1)
+    return [cell_voltages, cell_temps, cell_balancing, balancing_cells, avg_cell_voltage, avg_cell_temp]
+
+def register_buffer(regs) -> registermap.RegisterBuffer:
+    buffer = registermap.RegisterBuffer(len(regs))
+    buffer.append(regs)
+    return buffer
+
+def batched_bms_cells(regs, modules, cells, temps) -> list:
+    temp_parts = round(temps/2) if temps > 0 else 0
+    cell_voltages = registermap.decode_cell_voltages(regs, modules, cells)
+    cell_temps = registermap.decode_cell_temps(regs, modules, temp_parts)
+    return [cell_voltages, cell_temps, registermap.decode_cell_balancing(regs, modules), registermap.count_cell_balancing(regs, modules),
+            registermap.cell_average(cell_voltages, 0.001, 3), registermap.cell_average(cell_temps, 1, 1)]
+
+class BufferDecoder:
+    """Adapter of a decoder of register buffers to the register lists of the legacy decoding."""
+
+    def __init__(self, decoder) -> None:
+        self._decoder = decoder
+        self._buffers = {}
+
+    def decode(self, regs):
+        # the buffers are filled once per sample, the timing only covers the decoding
+        buffer = self._buffers.get(id(regs))
+        if buffer is None:
+            buffer = self._buffers[id(regs)] = register_buffer(regs)
+        return self._decoder.decode(buffer)
+
+class CellDecoder:
+    """Adapter of the cell decoding of a model to the check and timing helpers."""
+
+    def __init__(self, decode, modules, cells, temps) -> None:
+        self._args = (modules, cells, temps)
+        self._decode = decode
+
+    def __call__(self, regs):
+        return self._decode(regs, *self._args)
+
+    def decode(self, regs):
+        return self._decode(regs, *self._args)
+
+def check(name, legacy, decoder, samples) -> int:
+    for regs in samples:
+        expected, result = legacy(regs), decoder.decode(regs)
+        if expected != result:
+            diff = {k: (expected[k], result.get(k)) for k in expected if expected[k] != result.get(k)}
+            raise AssertionError(f'{name} decode differs: {diff}')
+    return len(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description='BYD Battery Box register map microbenchmark')
+    parser.add_argument('--number', type=int, default=20000, help='decodes per measurement')
+    parser.add_argument('--samples', type=int, default=1000, help='random register blocks to compare')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    box = SimulatedBox(model='HVS', towers=1)
+    bmu = [box.bmu_status_registers()] + [[rng.randrange(0x10000) for _ in range(21)] for _ in range(args.samples)]
+    bms = [box.bms_status_stream(1)] + [[rng.randrange(0x10000) for _ in range(260)] for _ in range(args.samples)]
+
+    result = {'checked': {
+        'bmu_status': check('bmu_status', legacy_bmu_status, registermap.BMU_STATUS_REGISTERS, bmu),
+        'bms_status': check('bms_status', legacy_bms_status, registermap.BMS_STATUS_REGISTERS, bms),
+        'bms_status_buffer': check('bms_status_buffer', legacy_bms_status, BufferDecoder(registermap.BMS_STATUS_REGISTERS), bms),
+    }}
+    benchmarks = [('bmu_status', legacy_bmu_status, registermap.BMU_STATUS_REGISTERS, bmu[0]),
+                  ('bms_status', legacy_bms_status, registermap.BMS_STATUS_REGISTERS, bms[0])]
+    # modules, cells and temperature sensors within the 129 cell voltage registers
+    for model, modules, cells, temps in [('HVS', 4, 32, 12), ('HVM', 8, 16, 8), ('LVS', 8, 16, 8)]:
+        name = f'bms_cells_{model}_{modules}'
+        legacy = CellDecoder(legacy_bms_cells, modules, cells, temps)
+        batched = BufferDecoder(CellDecoder(batched_bms_cells, modules, cells, temps))
+        result['checked'][name] = check(name, legacy, batched, bms)
+        benchmarks.append((name, legacy, batched, bms[0]))
+    for name, legacy, decoder, regs in benchmarks:
+        legacy_s = min(timeit.repeat(lambda: legacy(regs), number=args.number, repeat=3)) / args.number
+        compiled_s = min(timeit.repeat(lambda: decoder.decode(regs), number=args.number, repeat=3)) / args.number
+        result[name] = {'legacy_us': legacy_s * 1e6, 'batched_us': compiled_s * 1e6, 'speedup': legacy_s / compiled_s}
+    print(json.dumps(result, indent=1))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Benchmark of the log load on startup, whole log versus log summary.
+
+Creates log folders with logs of synthetic entries, copies of the entries of
+the bundled log at new times, with the log store, balancing counters, sync
+watermarks, log summary and export files as saved by the client, and reports
+per log size the time in s of:
+
+    eager           update_log_from_file, the whole log loaded before setup
+                    finishes as before the log summary
+    summary         load_log_summary, the startup path of the integration
+    background      load_log, the whole log loaded after setup finished
+
+The export files hold a line per entry, so the load checks them without
+rebuilding them.
+
+Usage:
+    python tools/bench_startup.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+
+from benchmark import git_revision
+from component import COMPONENT_PATH, import_module
+from bench_logstore import START_TS
+
+BydBoxClient = import_module('bydboxclient').BydBoxClient
+
+def corpus_log(size: int, rng: random.Random) -> dict:
+    """Entries of the bundled log in random order, one every 1 to 600 s."""
+    with open(os.path.join(COMPONENT_PATH, 'logs', 'byd_logs.json'), 'r') as infile:
+        corpus = list(json.load(infile).values())
+    log = {}
+    ts = START_TS
+    while len(log) < size:
+        ts += rng.randint(1, 600)
+        entry = rng.choice(corpus)
+        key = f'{datetime.fromtimestamp(ts).strftime("%Y%m%d %H:%M:%S")}-{entry["c"]}-{entry["u"]}'
+        log[key] = {'ts': ts, 'u': entry['u'], 'c': entry['c'], 'data': entry['data']}
+    return log
+
+def client(path: str) -> BydBoxClient:
+    return BydBoxClient(host='127.0.0.1', port=0, unit_id=1, timeout=3, log_path=path)
+
+def prepare(path: str, log: dict) -> None:
+    box = client(path)
+    box._log_store.add(log)
+    box.log = log
+    box.log_loaded = True
+    box.rebuild_log_balancing()
+    box.save_log_balancing_file()
+    box.save_log_sync_file()
+    box.save_log_summary_file()
+    box.close()
+    with open(box._log_csv_path, 'w') as outfile:
+        outfile.write('header\n' + 'row\n' * len(log))
+    with open(box._log_txt_path, 'w') as outfile:
+        outfile.write('row\n' * len(log))
+
+def load_summary(box: BydBoxClient) -> bool:
+    entries = box.load_log_summary()
+    if entries is None:
+        return False
+    box.update_log_entries_data(entries)
+    return True
+
+def load_background(box: BydBoxClient) -> bool:
+    if box.load_log() is None:
+        return False
+    box.update_log_entries_data()
+    return True
+
+def timed(path: str, load) -> tuple:
+    box = client(path)
+    try:
+        start = time.perf_counter()
+        result = load(box)
+        return time.perf_counter() - start, result, box
+    finally:
+        box.close()
+
+def bench_size(size: int, args, rng: random.Random) -> dict:
+    path = tempfile.mkdtemp(prefix='byd_startup_') + '/'
+    try:
+        prepare(path, corpus_log(size, rng))
+        result = {'entries': size, 'summary_bytes': os.path.getsize(path + 'byd_log_summary.json')}
+        for name, load in [
+            ('eager', lambda box: box.update_log_from_file()),
+            ('summary', load_summary),
+            ('background', lambda box: load_summary(box) and load_background(box)),
+        ]:
+            runs = [timed(path, load) for _ in range(args.repeat)]
+            assert all(r[1] for r in runs), f'{name} load failed'
+            box = runs[0][2]
+            assert box.data['log_entries'] == size and len(box.data['log']) == 20
+            result[f'{name}_s'] = min(r[0] for r in runs)
+        # background includes the summary, as on startup
+        result['background_s'] -= result['summary_s']
+        return result
+    finally:
+        shutil.rmtree(path)
+
+async def run_benchmark(args) -> dict:
+    rng = random.Random(args.seed)
+    return {
+        'meta': {
+            'benchmark': 'startup',
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'config': vars(args),
+        },
+        'sizes': [bench_size(size, args, rng) for size in args.sizes],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='BYD Battery Box startup log load benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help='log entries')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default=None, help='write JSON result to file instead of stdout')
+    args = parser.parse_args()
+
+    # the client is created on a running event loop
+    result = asyncio.run(run_benchmark(args))
+    output = json.dumps(result, indent=1)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, 'w') as outfile:
+            outfile.write(output)
+
+if __name__ == "__main__":
+    main()
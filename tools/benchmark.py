@@ -0,0 +1,235 @@
+"""Poll cycle benchmark for BydBoxClient against the local simulator.
+
+Runs the same sequence as Hub.async_update_data (log data, BMS status, BMU
+status) plus a log history update, a repeated log history update that stops
+at the sync watermark and reports per phase:
+
+    wall_s          wall clock time
+    transactions    Modbus transactions seen by the simulator (incl. retries)
+    reads / writes  read and write transactions
+    bytes_rx/tx     bytes received / sent by the simulator
+    wait_s          time spent in BydBoxClient._wait_for_response
+    wait_sleep_s    part of wait_s not spent in register reads (sleeps)
+
+Results are written as JSON so runs can be compared over time.
+
+Usage:
+    python tools/benchmark.py --model HVS --towers 3 --cycles 3 --output bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+
+from component import ROOT_PATH, import_module
+from simulator import BydBoxSimulator
+
+BydBoxClient = import_module('bydboxclient').BydBoxClient
+
+PHASES = ['init', 'log_data', 'bms_status', 'bmu_status', 'log_history', 'log_resync', 'bmu_under_load']
+
+
+class PhaseRecorder:
+    """Collect timing and traffic per benchmark phase."""
+
+    def __init__(self, simulator: BydBoxSimulator) -> None:
+        self._simulator = simulator
+        self.phases = {}
+        self._wait = 0.0
+        self._wait_reads = 0.0
+        self._in_wait = False
+
+    def instrument(self, client: BydBoxClient) -> None:
+        """Wrap the client methods that are timed."""
+        read_holding_registers = client.read_holding_registers
+        wait_for_response = client._wait_for_response
+
+        async def timed_read_holding_registers(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await read_holding_registers(*args, **kwargs)
+            finally:
+                if self._in_wait:
+                    self._wait_reads += time.perf_counter() - start
+
+        async def timed_wait_for_response(*args, **kwargs):
+            start = time.perf_counter()
+            self._in_wait = True
+            try:
+                return await wait_for_response(*args, **kwargs)
+            finally:
+                self._in_wait = False
+                self._wait += time.perf_counter() - start
+
+        client.read_holding_registers = timed_read_holding_registers
+        client._wait_for_response = timed_wait_for_response
+
+    @contextmanager
+    def phase(self, name: str):
+        stats = dict(self._simulator.stats)
+        wait, wait_reads = self._wait, self._wait_reads
+        start = time.perf_counter()
+        run = {'result': None}
+        try:
+            yield run
+        finally:
+            wall = time.perf_counter() - start
+            sim = self._simulator.stats
+            run.update({
+                'wall_s': wall,
+                'transactions': sim['transactions'] - stats['transactions'],
+                'reads': sim['reads'] - stats['reads'],
+                'writes': sim['writes'] - stats['writes'],
+                'errors': sim['errors'] - stats['errors'],
+                'bytes_rx': sim['bytes_rx'] - stats['bytes_rx'],
+                'bytes_tx': sim['bytes_tx'] - stats['bytes_tx'],
+                'wait_s': self._wait - wait,
+                'wait_sleep_s': (self._wait - wait) - (self._wait_reads - wait_reads),
+            })
+            self.phases.setdefault(name, []).append(run)
+
+    def summary(self) -> dict:
+        result = {}
+        for name in PHASES:
+            runs = self.phases.get(name)
+            if not runs:
+                continue
+            walls = [r['wall_s'] for r in runs]
+            phase = {
+                'runs': len(runs),
+                'ok': sum(1 for r in runs if r['result']),
+                'wall_s': {'mean': sum(walls) / len(walls), 'min': min(walls), 'max': max(walls)},
+            }
+            for k in ['transactions', 'reads', 'writes', 'errors', 'bytes_rx', 'bytes_tx', 'wait_s', 'wait_sleep_s']:
+                phase[k] = sum(r[k] for r in runs) / len(runs)
+            for k in ['log_entries', 'bmu_polls', 'bmu_latency_max_s']:
+                if k in runs[-1]:
+                    phase[k] = runs[-1][k]
+            result[name] = phase
+        return result
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_PATH, text=True).strip()
+    except Exception:
+        return None
+
+async def run_benchmark(args) -> dict:
+    simulator = BydBoxSimulator(latency=args.latency, latency_jitter=args.latency_jitter, error_rate=args.error_rate,
+                                max_read_count=args.max_read_count, drop_large_reads=args.drop_large_reads, seed=args.seed)
+    simulator.add_box(model=args.model, towers=args.towers, modules=args.modules, ready_delay=args.ready_delay,
+                      ready_jitter=args.ready_jitter, log_history=args.log_history)
+    recorder = PhaseRecorder(simulator)
+
+    with tempfile.TemporaryDirectory(prefix='byd_bench_') as log_path:
+        async with simulator:
+            client = BydBoxClient(host='127.0.0.1', port=simulator.port, unit_id=1, timeout=3, log_path=log_path + '/')
+            recorder.instrument(client)
+
+            with recorder.phase('init') as run:
+                run['result'] = await client.init_data()
+
+            cycles = []
+            for _ in range(args.cycles):
+                start = time.perf_counter()
+                with recorder.phase('log_data') as run:
+                    run['result'] = await client.update_all_log_data()
+                with recorder.phase('bms_status') as run:
+                    run['result'] = await client.update_all_bms_status_data()
+                with recorder.phase('bmu_status') as run:
+                    run['result'] = await client.update_bmu_status_data()
+                cycles.append(time.perf_counter() - start)
+
+            if args.log_depth > 0:
+                with recorder.phase('log_history') as run:
+                    run['result'] = await client.update_log_data(args.log_unit, log_depth=args.log_depth)
+                run['log_entries'] = len(client.log)
+
+                # same log history again, stops at the sync watermark
+                with recorder.phase('log_resync') as run:
+                    run['result'] = await client.update_log_data(args.log_unit, log_depth=args.log_depth)
+                run['log_entries'] = len(client.log)
+
+                # BMU status polls while a full log history update is running
+                client.log = {}
+                client.log_sync = {}
+                with recorder.phase('bmu_under_load') as run:
+                    history = asyncio.create_task(client.update_log_data(args.log_unit, log_depth=args.log_depth))
+                    latencies = []
+                    while not history.done():
+                        start = time.perf_counter()
+                        await client.update_bmu_status_data()
+                        latencies.append(time.perf_counter() - start)
+                        await asyncio.sleep(args.bmu_interval)
+                    run['result'] = await history
+                    run['bmu_polls'] = len(latencies)
+                    run['bmu_latency_max_s'] = max(latencies)
+
+            response_latencies = client.response_latencies
+            scheduler_stats = client.scheduler_stats
+            mailbox_read_size = client.mailbox_read_size
+            counters = dict(client.counters)
+            client.close(linger=0)
+            client._log_store.close()
+
+    return {
+        'meta': {
+            'benchmark': 'poll_cycle',
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'config': vars(args),
+        },
+        'cycle': {
+            'runs': len(cycles),
+            'wall_s': {'mean': sum(cycles) / len(cycles), 'min': min(cycles), 'max': max(cycles)} if cycles else None,
+        },
+        'phases': recorder.summary(),
+        'response_latencies': response_latencies,
+        'scheduler': scheduler_stats,
+        'mailbox_read_size': mailbox_read_size,
+        'counters': counters,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='BYD Battery Box poll cycle benchmark')
+    parser.add_argument('--model', default='HVS')
+    parser.add_argument('--towers', type=int, default=3)
+    parser.add_argument('--modules', type=int, default=None)
+    parser.add_argument('--cycles', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.01, help='simulated delay per request in s')
+    parser.add_argument('--latency-jitter', type=float, default=0.0)
+    parser.add_argument('--ready-delay', type=float, default=0.3, help='simulated mailbox ready delay in s')
+    parser.add_argument('--ready-jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--max-read-count', type=int, default=125)
+    parser.add_argument('--drop-large-reads', action='store_true', help='simulated gateway does not answer reads over max read count')
+    parser.add_argument('--log-history', type=int, default=None, help='simulated log entries per unit')
+    parser.add_argument('--log-unit', type=int, default=1)
+    parser.add_argument('--log-depth', type=int, default=5, help='log history pages, 0 to skip')
+    parser.add_argument('--bmu-interval', type=float, default=0.2, help='delay between BMU status polls under load in s')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default=None, help='write JSON result to file instead of stdout')
+    args = parser.parse_args()
+
+    result = asyncio.run(run_benchmark(args))
+    output = json.dumps(result, indent=1)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, 'w') as outfile:
+            outfile.write(output)
+
+if __name__ == "__main__":
+    main()
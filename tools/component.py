@@ -0,0 +1,45 @@
+"""Helpers to import the integration modules from the development tools.
+
+The integration package __init__ pulls in Home Assistant. The client modules
+(bydboxclient, extmodbusclient, bydbox_const) do not need it, so the tools
+register the component folder as a bare package and import those modules
+without running the package __init__. Tools that need the platforms (e.g.
+sensor) import the whole package with import_integration, which needs Home
+Assistant installed.
+"""
+
+import importlib.machinery
+import importlib.util
+import os
+import sys
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+COMPONENT_PATH = os.path.join(ROOT_PATH, 'custom_components', 'byd_battery_box')
+PACKAGE = 'byd_battery_box'
+
+def load_component():
+    """Register the component folder as package and return it."""
+    package = sys.modules.get(PACKAGE)
+    if package is None:
+        spec = importlib.machinery.ModuleSpec(PACKAGE, None, is_package=True)
+        package = importlib.util.module_from_spec(spec)
+        package.__path__ = [COMPONENT_PATH]
+        sys.modules[PACKAGE] = package
+    return package
+
+def import_module(name: str):
+    """Import a module of the integration, e.g. import_module('bydboxclient')."""
+    load_component()
+    return importlib.import_module(f'{PACKAGE}.{name}')
+
+def import_integration(name: str):
+    """Import a module of the integration with the package __init__, e.g. import_integration('sensor').
+
+    Must run before import_module, which registers the bare package.
+    """
+    package = sys.modules.get(PACKAGE)
+    if not package is None and getattr(package, '__file__', None) is None:
+        raise ImportError(f'{PACKAGE} already imported as bare package, call import_integration first')
+    if not os.path.dirname(COMPONENT_PATH) in sys.path:
+        sys.path.append(os.path.dirname(COMPONENT_PATH))
+    return importlib.import_module(f'{PACKAGE}.{name}')
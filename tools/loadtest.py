@@ -0,0 +1,130 @@
+"""Load test of BydBoxManager with many simulated boxes.
+
+Starts one simulated gateway per box, polls all boxes with the manager and
+reports:
+
+    loop_lag_s      delay of a periodic probe task beyond its sleep, a measure
+                    of how long the event loop is blocked
+    jobs            latency of BMU status, BMS status and log jobs over all boxes
+    gateways        Modbus transactions and bytes over all simulated gateways
+
+Usage:
+    python tools/loadtest.py --boxes 24 --duration 30 --output load.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from contextlib import AsyncExitStack
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+
+from benchmark import git_revision
+from manager import BydBoxManager
+from simulator import BydBoxSimulator
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return None
+    values = sorted(values)
+    def p(q):
+        return values[min(len(values) - 1, int(q * len(values)))]
+    return {'n': len(values), 'mean': sum(values) / len(values), 'p50': p(0.5), 'p95': p(0.95), 'p99': p(0.99), 'max': values[-1]}
+
+async def monitor_loop_lag(interval: float, lags: list) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - start - interval))
+
+async def run_loadtest(args) -> dict:
+    async with AsyncExitStack() as stack:
+        simulators = []
+        for i in range(args.boxes):
+            simulator = BydBoxSimulator(latency=args.latency, latency_jitter=args.latency_jitter, seed=args.seed + i)
+            simulator.add_box(model=args.model, towers=args.towers, ready_delay=args.ready_delay, ready_jitter=args.ready_jitter)
+            await stack.enter_async_context(simulator)
+            simulators.append(simulator)
+
+        log_path = tempfile.mkdtemp(prefix='byd_load_') + '/' if args.save_logs else None
+        manager = BydBoxManager(max_concurrency=args.concurrency, log_path=log_path)
+        for i, simulator in enumerate(simulators):
+            manager.add_box(f'box{i + 1}', '127.0.0.1', simulator.port, scan_interval=args.scan_interval,
+                            scan_interval_bms=args.scan_interval_bms, scan_interval_log=args.scan_interval_log)
+
+        lags = []
+        monitor = asyncio.create_task(monitor_loop_lag(args.lag_interval, lags))
+        start = time.perf_counter()
+        async with manager:
+            await asyncio.sleep(args.duration)
+        wall = time.perf_counter() - start
+        monitor.cancel()
+
+        stats = manager.stats
+        limiter_stats = manager.limiter_stats
+        jobs = {}
+        for job in BydBoxManager.JOBS:
+            runs = [s[job] for s in stats.values()]
+            jobs[job] = {
+                'runs': sum(r['runs'] for r in runs),
+                'failed': sum(r['failed'] for r in runs),
+                'latency_avg_s': percentiles([r['avg'] for r in runs if r['runs'] > 0]),
+                'latency_max_s': max(r['max'] for r in runs),
+            }
+        gateways = {}
+        for k in ['transactions', 'reads', 'writes', 'errors', 'bytes_rx', 'bytes_tx']:
+            gateways[k] = sum(s.stats[k] for s in simulators)
+
+    return {
+        'meta': {
+            'benchmark': 'loadtest',
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'config': vars(args),
+        },
+        'wall_s': wall,
+        'loop_lag_s': percentiles(lags),
+        'jobs': jobs,
+        'gateways': gateways,
+        'limiter': limiter_stats,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='BYD Battery Box multi box load test')
+    parser.add_argument('--boxes', type=int, default=24)
+    parser.add_argument('--model', default='HVS')
+    parser.add_argument('--towers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=8, help='max jobs talking to the gateways at once')
+    parser.add_argument('--duration', type=float, default=30.0, help='test duration in s')
+    parser.add_argument('--scan-interval', type=float, default=5.0, help='BMU status interval in s')
+    parser.add_argument('--scan-interval-bms', type=float, default=30.0)
+    parser.add_argument('--scan-interval-log', type=float, default=30.0)
+    parser.add_argument('--latency', type=float, default=0.01, help='simulated delay per request in s')
+    parser.add_argument('--latency-jitter', type=float, default=0.0)
+    parser.add_argument('--ready-delay', type=float, default=0.3, help='simulated mailbox ready delay in s')
+    parser.add_argument('--ready-jitter', type=float, default=0.0)
+    parser.add_argument('--lag-interval', type=float, default=0.01, help='event loop lag probe interval in s')
+    parser.add_argument('--save-logs', action='store_true', help='save logs of the boxes to a temporary folder')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default=None, help='write JSON result to file instead of stdout')
+    args = parser.parse_args()
+
+    result = asyncio.run(run_loadtest(args))
+    output = json.dumps(result, indent=1)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, 'w') as outfile:
+            outfile.write(output)
+
+if __name__ == "__main__":
+    main()
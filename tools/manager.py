@@ -0,0 +1,184 @@
+"""BYD Battery Box manager for several boxes, used by the load test"""
+
+import asyncio
+import functools
+import logging
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+
+from component import import_module
+
+BydBoxClient = import_module('bydboxclient').BydBoxClient
+Priority = import_module('scheduler').Priority
+RequestScheduler = import_module('scheduler').RequestScheduler
+
+_LOGGER = logging.getLogger(__name__)
+
+def raise_if_cancelled() -> None:
+    """Raise a cancel of the task that was swallowed, e.g. by pymodbus turning it into a failed request."""
+    if asyncio.current_task().cancelling() > 0:
+        raise asyncio.CancelledError()
+
+class ManagedBox:
+    """Client, poll intervals and statistics of one box."""
+
+    def __init__(self, name: str, client: BydBoxClient, intervals: dict) -> None:
+        """Init Class"""
+        self.name = name
+        self.client = client
+        self.intervals = intervals # job -> interval in s
+        self.stats = {job: {'runs': 0, 'failed': 0, 'last': None, 'max': 0.0, 'total': 0.0} for job in intervals}
+        self.tasks = []
+        self.init = None # init of the client, shared by the jobs of the box
+
+    def record(self, job: str, latency: float, result: bool) -> None:
+        stats = self.stats[job]
+        stats['runs'] += 1
+        if not result:
+            stats['failed'] += 1
+        stats['last'] = latency
+        stats['max'] = max(stats['max'], latency)
+        stats['total'] += latency
+
+class BydBoxManager:
+    """Poll several battery boxes concurrently.
+
+    Every box runs its BMU status, BMS status and log jobs on their own
+    intervals; the start of the jobs is spread over the interval so boxes do
+    not poll in lockstep. A request scheduler bounds the number of jobs
+    talking to the gateways at the same time and starts waiting BMU status
+    jobs before BMS and log jobs, as does the request scheduler of each box.
+    """
+
+    JOBS = {'bmu_status': Priority.BMU_STATUS, 'bms_status': Priority.BMS_STATUS, 'log_data': Priority.LOG_POLL}
+
+    def __init__(self, max_concurrency: int = 8, log_path: str | None = None) -> None:
+        """Init Class"""
+        self._limiter = RequestScheduler(concurrency=max_concurrency)
+        self._log_path = log_path # logs of a box are saved in a sub folder named after the box, None to not save logs
+        self._boxes = {}
+        self._running = False
+
+    @property
+    def boxes(self) -> dict:
+        return self._boxes
+
+    def add_box(self, name: str, host: str, port: int, unit_id: int = 1, scan_interval: int = 10,
+                scan_interval_bms: int = 600, scan_interval_log: int = 600) -> BydBoxClient:
+        """Add a box, it is polled from the next start."""
+        if name in self._boxes:
+            raise ValueError(f'box {name} already added')
+        log_path = None if self._log_path is None else os.path.join(self._log_path, name) + '/'
+        client = BydBoxClient(host=host, port=port, unit_id=unit_id, timeout=max(3, (scan_interval - 1)), log_path=log_path)
+        intervals = {'bmu_status': scan_interval, 'bms_status': scan_interval_bms, 'log_data': scan_interval_log}
+        self._boxes[name] = ManagedBox(name, client, intervals)
+        return client
+
+    async def start(self) -> None:
+        """Start polling all boxes."""
+        if self._running:
+            return
+        self._running = True
+        loop = asyncio.get_running_loop()
+        for i, box in enumerate(self._boxes.values()):
+            for job in self.JOBS:
+                offset = box.intervals[job] * i / len(self._boxes)
+                box.tasks.append(loop.create_task(self._run_job(box, job, offset), name=f'byd_{box.name}_{job}'))
+
+    async def stop(self) -> None:
+        """Stop polling and disconnect all boxes."""
+        self._running = False
+        tasks = [task for box in self._boxes.values() for task in box.tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for box in self._boxes.values():
+            if not box.init is None:
+                box.init.cancel()
+                box.init = None
+            box.tasks = []
+            box.client.close(linger=0)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    @property
+    def limiter_stats(self) -> dict:
+        """Queue depth and wait time statistics of the jobs waiting for a free slot."""
+        return self._limiter.stats
+
+    @property
+    def stats(self) -> dict:
+        """Job runs, failures and latencies in s per box."""
+        result = {}
+        for name, box in self._boxes.items():
+            result[name] = {job: dict(s, avg=s['total'] / s['runs'] if s['runs'] > 0 else 0.0) for job, s in box.stats.items()}
+        return result
+
+    async def _run_job(self, box: ManagedBox, job: str, offset: float) -> None:
+        await self._init_box(box)
+        await asyncio.sleep(offset)
+        interval = box.intervals[job]
+        loop = asyncio.get_running_loop()
+        next_run = loop.time()
+        while True:
+            start = time.perf_counter()
+            try:
+                result = await self._limiter.submit(functools.partial(self._poll, box, job), priority=self.JOBS[job])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _LOGGER.error(f'Error in {job} of box {box.name} {e}', exc_info=True)
+                result = False
+            raise_if_cancelled()
+            box.record(job, time.perf_counter() - start, result)
+
+            # keep the interval without drift, skip runs that were missed
+            next_run += interval
+            now = loop.time()
+            if next_run < now:
+                next_run = now
+            await asyncio.sleep(next_run - now)
+
+    async def _init_box(self, box: ManagedBox) -> None:
+        # the jobs of a box share the init, the first job to start runs it
+        if box.init is None:
+            box.init = asyncio.ensure_future(self._init_client(box))
+        await asyncio.shield(box.init)
+
+    async def _init_client(self, box: ManagedBox) -> None:
+        loop = asyncio.get_running_loop()
+        if self._log_path is not None:
+            await loop.run_in_executor(None, os.makedirs, self._log_path, 0o777, True)
+            entries = await loop.run_in_executor(None, box.client.load_log)
+            box.client.log_loaded = True
+            if not entries is None:
+                box.client.update_log_entries_data()
+        delay = box.intervals['bmu_status']
+        while True:
+            try:
+                if await self._limiter.submit(box.client.init_data, priority=Priority.BMU_STATUS):
+                    return
+            except Exception as e:
+                _LOGGER.warning(f'Failed init of box {box.name} {e}')
+            raise_if_cancelled()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 300)
+
+    async def _poll(self, box: ManagedBox, job: str) -> bool:
+        client = box.client
+        if job == 'bmu_status':
+            return await client.update_bmu_status_data()
+        if job == 'bms_status':
+            return await client.update_all_bms_status_data()
+        result = await client.update_all_log_data()
+        if result and self._log_path is not None and client.data.get('log_new_entries', 0) > 0:
+            await asyncio.get_running_loop().run_in_executor(None, client.save_log_entries)
+        return result
@@ -0,0 +1,502 @@
+"""Local BYD Battery Box simulator.
+
+Acts as the RS485 gateway plus BMU of a BYD Battery Box so BydBoxClient can be
+run, benchmarked and load tested without a real battery. The simulator speaks
+Modbus RTU framing over TCP (the framing the client uses) and serves:
+
+    0x0000  info block (serial, versions, towers/modules, application, phase)
+    0x0010  ext info block (inverter, battery type)
+    0x0500  BMU status block
+    0x0550  BMS mailbox: write [bms_id, 0x8100], ready flag 0x8801 on 0x0551,
+            4 pages of 65 registers on 0x0558
+    0x05A0  log mailbox: write [unit_id, 0x8100], ready flag 0x8801 on 0x05A1,
+            5 pages of 65 registers on 0x05A8 holding 20 log entries
+
+Mailbox data is served as a register stream: each read at the data address
+returns the next `count` registers, so reading 4 x 65 or 2 x 125 + 10 gives
+the same registers. Every page starts with a length register (64).
+
+Log entries are generated from the bundled logs/byd_logs.json. Repeated log
+requests for the same unit page back in history. The history cursor resets
+when another unit or mailbox is requested, or after `log_cursor_timeout` s.
+
+Usage:
+    python tools/simulator.py --port 8080 --model HVS --towers 3 --modules 5
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import struct
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+
+from component import COMPONENT_PATH, import_module
+
+MODULE_SPECS = import_module('bydbox_const').MODULE_SPECS
+
+_LOGGER = logging.getLogger(__name__)
+
+LOG_CORPUS_PATH = os.path.join(COMPONENT_PATH, 'logs', 'byd_logs.json')
+
+READY = 0x8801
+REQUEST = 0x8100
+PAGE_SIZE = 65
+BMS_PAGES = 4
+LOG_PAGES = 5
+LOG_ENTRIES_PER_PAGE = 20
+LOG_ENTRY_SIZE = 15
+MAX_READ_COUNT = 125
+
+MODELS = {
+    # model: (serial prefix, battery type id, default modules)
+    'HVS': ('P030T020Z2101', 2, 4),
+    'HVM': ('P030T020Z2102', 1, 4),
+    'LVS': ('P021T020Z2103', 2, 2),
+}
+
+BMS_CONSTANTS = [6659, 7683, 256, 20528, 13104, 21552, 12848, 23090, 12848, 14129, 12593, 13619, 12920, 30840, 30840, 270, 270]
+
+# register positions in the 260 register BMS stream (page headers at 0, 65, 130, 195)
+BMS_VOLTAGE_REGS = list(range(49, 65)) + list(range(66, 130)) + list(range(131, 180))
+BMS_TEMP_REGS = list(range(180, 195)) + list(range(196, 213))
+
+ILLEGAL_FUNCTION = 0x01
+ILLEGAL_ADDRESS = 0x02
+ILLEGAL_VALUE = 0x03
+DEVICE_BUSY = 0x06
+
+def compute_crc(data: bytes) -> bytes:
+    """Modbus CRC16, low byte first."""
+    crc = 0xFFFF
+    for b in data:
+        crc ^= b
+        for _ in range(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ 0xA001
+            else:
+                crc >>= 1
+    return struct.pack('<H', crc)
+
+def load_log_corpus(path=LOG_CORPUS_PATH) -> dict:
+    """Return the bundled log entries per unit id, newest first."""
+    with open(path, 'r') as openfile:
+        log = json.load(openfile)
+    units = {}
+    for k in sorted(log.keys(), reverse=True):
+        entry = log[k]
+        units.setdefault(int(entry['u']), []).append((float(entry['ts']), int(entry['c']), bytes.fromhex(entry['data'])))
+    return units
+
+def encode_log_entry(ts: float, code: int, data: bytes) -> list:
+    """Encode one log entry into 15 registers as read from the log mailbox."""
+    dt = datetime.fromtimestamp(ts)
+    payload = bytes([code, dt.year - 2000, dt.month, dt.day, dt.hour, dt.minute, dt.second]) + data[:23].ljust(23, b'\x00')
+    return list(struct.unpack('>15H', payload))
+
+def paginate(data: list, pages: int) -> list:
+    """Split data registers into mailbox pages, each prefixed by a length register."""
+    size = PAGE_SIZE - 1
+    regs = []
+    for p in range(pages):
+        page = data[p * size:(p + 1) * size]
+        regs.append(size)
+        regs += page + [0] * (size - len(page))
+    return regs
+
+
+class SimulatedBox:
+    """One BYD Battery Box (BMU plus BMS towers) behind the gateway."""
+
+    def __init__(self, model: str = 'HVS', towers: int = 1, modules: int | None = None,
+                 ready_delay: float = 0.3, bms_ready_delay: float | None = None, log_ready_delay: float | None = None,
+                 ready_jitter: float = 0.0, log_history: int | None = None, log_cursor_timeout: float = 30.0,
+                 log_corpus: dict | None = None, rng: random.Random | None = None) -> None:
+        if model not in MODELS:
+            raise ValueError(f'Unsupported model {model}, use one of {", ".join(MODELS)}')
+        serial, bat_type_id, default_modules = MODELS[model]
+        self.model = model
+        self.towers = towers
+        self.modules = modules if modules is not None else default_modules
+        if not 0 < self.modules <= 15:
+            raise ValueError(f'Modules must be 1-15: {self.modules}')
+        if model.startswith('HV') and not 0 < towers <= 3:
+            raise ValueError(f'HV towers must be 1-3: {towers}')
+        self.cells = MODULE_SPECS[model]['cells']
+        self.temps = MODULE_SPECS[model]['sensors_t']
+        self.serial = (serial + '000000')[:19] + '0'
+        self.bat_type_id = bat_type_id
+        self.ready_delay = {0x0550: bms_ready_delay if bms_ready_delay is not None else ready_delay,
+                            0x05A0: log_ready_delay if log_ready_delay is not None else ready_delay}
+        self.ready_jitter = ready_jitter
+        self.log_cursor_timeout = log_cursor_timeout
+        self._rng = rng or random.Random()
+
+        self.soc = 60.0
+        self.current = 0.0
+        self.charge_lfte = 12000.0
+        self.discharge_lfte = 11000.0
+        self.cell_v = 3.32
+
+        self.log = self._build_log(log_corpus if log_corpus is not None else load_log_corpus(), log_history)
+        self._log_cursor = {}
+        self._last_log_request = (None, 0.0)
+
+        self._mailboxes = {
+            0x0550: {'ready_address': 0x0551, 'data_address': 0x0558, 'ready_at': None, 'stream': [], 'pos': 0},
+            0x05A0: {'ready_address': 0x05A1, 'data_address': 0x05A8, 'ready_at': None, 'stream': [], 'pos': 0},
+        }
+
+    def _build_log(self, corpus: dict, log_history: int | None) -> dict:
+        """Log entries per unit id (0 BMU, 1..towers BMS), newest first."""
+        log = {}
+        for unit_id in range(self.towers + 1):
+            source = corpus.get(unit_id)
+            if source is None:
+                # reuse the log of the first BMS for towers not in the corpus
+                source = corpus.get(1 if unit_id > 0 else 0, [])
+            entries = list(source)
+            if log_history is not None and len(source) > 0:
+                span = source[0][0] - source[-1][0] + 86400
+                shift = 0
+                while len(entries) < log_history:
+                    shift += span
+                    entries += [(ts - shift, code, data) for ts, code, data in source]
+                entries = entries[:log_history]
+            log[unit_id] = entries
+        return log
+
+    def add_log_entry(self, unit_id: int, code: int, data: bytes, ts: float | None = None) -> None:
+        """Add a new (newest) log entry, e.g. to simulate events during a test."""
+        if ts is None:
+            ts = float(int(time.time()))
+        self.log.setdefault(unit_id, []).insert(0, (ts, code, data))
+
+    def _tick(self) -> None:
+        """Move the live values a little."""
+        self.current = max(-50.0, min(50.0, self.current + self._rng.uniform(-2, 2)))
+        self.soc = max(5.0, min(100.0, self.soc + self.current * 0.001))
+        self.cell_v = 3.2 + self.soc * 0.0015
+        if self.current > 0:
+            self.charge_lfte += self.current * 0.001
+        else:
+            self.discharge_lfte -= self.current * 0.001
+
+    @property
+    def cells_in_series(self) -> int:
+        if self.model.startswith('HV'):
+            return self.modules * self.cells
+        return self.cells
+
+    def info_registers(self) -> list:
+        towers = self.towers if self.model.startswith('HV') else self.towers - 1
+        regs = list(struct.unpack('>10H', self.serial.encode('ascii')))
+        regs += [0, 0]
+        regs.append(3 << 8 | 24)                    # BMU version A
+        regs.append(3 << 8 | 24)                    # BMU version B
+        regs.append(3 << 8 | 29)                    # BMS version
+        regs.append(0 << 8 | 1)                     # BMU area, BMS area
+        regs.append((towers & 0x0F) << 4 | (self.modules & 0x0F))
+        regs.append(1 << 8 | 0)                     # application, LVS type
+        regs.append(1 << 8)                         # phase
+        regs.append(0)
+        return regs
+
+    def ext_info_registers(self) -> list:
+        return [0 << 8, self.bat_type_id << 8]       # inverter, battery type
+
+    def bmu_status_registers(self) -> list:
+        self._tick()
+        bat_voltage = self.cell_v * self.cells_in_series
+        charge = int(self.charge_lfte * 10)
+        discharge = int(self.discharge_lfte * 10)
+        regs = [
+            int(self.soc),
+            int(round((self.cell_v + 0.01) * 100)),
+            int(round((self.cell_v - 0.01) * 100)),
+            100,
+            int(round(self.current * 10)) & 0xFFFF,
+            int(round(bat_voltage * 100)) & 0xFFFF,
+            22, 19, 25,
+            0, 792, 0, 0,
+            0,                                      # errors
+            1 << 8 | 4,                             # param table version
+            0,
+            int(round(bat_voltage * 100)) & 0xFFFF,
+            charge & 0xFFFF, charge >> 16 & 0xFFFF,
+            discharge & 0xFFFF, discharge >> 16 & 0xFFFF,
+        ]
+        return regs
+
+    def bms_status_stream(self, bms_id: int) -> list:
+        regs = [0] * (PAGE_SIZE * BMS_PAGES)
+        for p in range(BMS_PAGES):
+            regs[p * PAGE_SIZE] = PAGE_SIZE - 1
+        voltages = [int(self.cell_v * 1000) + self._rng.randint(-15, 15) for _ in BMS_VOLTAGE_REGS]
+        temps = [self._rng.randint(18, 24) for _ in range(len(BMS_TEMP_REGS) * 2)]
+        for r, v in zip(BMS_VOLTAGE_REGS, voltages):
+            regs[r] = v & 0xFFFF
+        for i, r in enumerate(BMS_TEMP_REGS):
+            regs[r] = temps[2 * i] << 8 | temps[2 * i + 1]
+        regs[1] = max(voltages)
+        regs[2] = min(voltages)
+        regs[3] = (voltages.index(max(voltages)) + 1) << 8 | (voltages.index(min(voltages)) + 1)
+        regs[4] = max(temps)
+        regs[5] = min(temps)
+        regs[6] = (temps.index(max(temps)) + 1) << 8 | (temps.index(min(temps)) + 1)
+        for m in range(min(self.modules, 8)):
+            regs[7 + m] = 1 << self._rng.randrange(16) if self._rng.random() < 0.2 else 0
+        charge = int(self.charge_lfte * 1000 / self.towers)
+        discharge = int(self.discharge_lfte * 1000 / self.towers)
+        regs[15], regs[16] = charge & 0xFFFF, charge >> 16 & 0xFFFF
+        regs[17], regs[18] = discharge & 0xFFFF, discharge >> 16 & 0xFFFF
+        bat_voltage = int(round(self.cell_v * self.cells_in_series * 10))
+        regs[21] = bat_voltage
+        regs[23] = 1560
+        regs[24] = bat_voltage
+        regs[25] = int(self.soc * 10)
+        regs[26] = 100
+        regs[27] = int(round(self.current / self.towers * 10)) & 0xFFFF
+        regs[31:48] = BMS_CONSTANTS
+        return regs
+
+    def log_stream(self, unit_id: int) -> list:
+        now = time.monotonic()
+        last_unit, last_time = self._last_log_request
+        if last_unit != unit_id or now - last_time > self.log_cursor_timeout:
+            self._log_cursor = {}
+        self._last_log_request = (unit_id, now)
+        cursor = self._log_cursor.get(unit_id, 0)
+        entries = self.log.get(unit_id, [])[cursor:cursor + LOG_ENTRIES_PER_PAGE]
+        self._log_cursor[unit_id] = cursor + len(entries)
+        data = []
+        for ts, code, payload in entries:
+            data += encode_log_entry(ts, code, payload)
+        return paginate(data, LOG_PAGES)
+
+    def write(self, address: int, values: list) -> int | None:
+        """Handle a register write, returns a Modbus exception code or None."""
+        mailbox = self._mailboxes.get(address)
+        if mailbox is None or len(values) != 2 or values[1] != REQUEST:
+            return ILLEGAL_ADDRESS
+        unit_id = values[0]
+        if address == 0x0550:
+            if not 0 < unit_id <= self.towers:
+                return ILLEGAL_VALUE
+            self._log_cursor = {}
+            stream = self.bms_status_stream(unit_id)
+        else:
+            if not 0 <= unit_id <= self.towers:
+                return ILLEGAL_VALUE
+            stream = self.log_stream(unit_id)
+        delay = self.ready_delay[address] + self._rng.uniform(0, self.ready_jitter)
+        mailbox.update(ready_at=time.monotonic() + delay, stream=stream, pos=0)
+        return None
+
+    def read(self, address: int, count: int) -> list | int:
+        """Handle a register read, returns registers or a Modbus exception code."""
+        if address == 0x0000 and count <= 20:
+            return self.info_registers()[:count]
+        if address == 0x0010 and count <= 2:
+            return self.ext_info_registers()[:count]
+        if address == 0x0500 and count <= 21:
+            return self.bmu_status_registers()[:count]
+        for command, mailbox in self._mailboxes.items():
+            if address == mailbox['ready_address'] and count == 1:
+                if mailbox['ready_at'] is not None and time.monotonic() >= mailbox['ready_at']:
+                    return [READY]
+                return [REQUEST if mailbox['ready_at'] is not None else 0]
+            if address == mailbox['data_address']:
+                if mailbox['ready_at'] is None or time.monotonic() < mailbox['ready_at']:
+                    return DEVICE_BUSY
+                pos = mailbox['pos']
+                regs = mailbox['stream'][pos:pos + count]
+                mailbox['pos'] = pos + count
+                return regs + [0] * (count - len(regs))
+        return ILLEGAL_ADDRESS
+
+
+class BydBoxSimulator:
+    """Modbus RTU over TCP gateway serving one or more simulated boxes."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, latency_jitter: float = 0.0,
+                 error_rate: float = 0.0, drop_rate: float = 0.0, max_read_count: int = MAX_READ_COUNT,
+                 drop_large_reads: bool = False, seed: int | None = None) -> None:
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.max_read_count = max_read_count
+        self.drop_large_reads = drop_large_reads # reads over max_read_count are not answered instead of an exception
+        self.boxes = {}
+        self._rng = random.Random(seed)
+        self._server = None
+        self._writers = set() # open client connections
+        self._bus_lock = asyncio.Lock()
+        self.reset_stats()
+
+    def add_box(self, unit_id: int = 1, **kwargs) -> SimulatedBox:
+        """Add a box behind the gateway, kwargs are passed to SimulatedBox."""
+        kwargs.setdefault('rng', random.Random(self._rng.random()))
+        box = SimulatedBox(**kwargs)
+        self.boxes[unit_id] = box
+        return box
+
+    def reset_stats(self) -> None:
+        self.stats = {'transactions': 0, 'reads': 0, 'writes': 0, 'errors': 0, 'dropped': 0,
+                      'bytes_rx': 0, 'bytes_tx': 0, 'registers_read': 0, 'connections': 0}
+
+    async def start(self) -> None:
+        if not self.boxes:
+            self.add_box()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        _LOGGER.debug(f'simulator listening on {self.host}:{self.port}')
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            # wait_closed waits for the client connections, e.g. of clients lingering on a shared connection
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.stop()
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _read_frame(self, reader: asyncio.StreamReader) -> bytes:
+        head = await reader.readexactly(2)
+        fc = head[1]
+        if fc == 0x03:
+            rest = await reader.readexactly(6)
+        elif fc == 0x10:
+            rest = await reader.readexactly(5)
+            rest += await reader.readexactly(rest[4] + 2)
+        else:
+            # unknown function, drain what is there
+            rest = await reader.read(256)
+        return head + rest
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.stats['connections'] += 1
+        self._writers.add(writer)
+        try:
+            while True:
+                frame = await self._read_frame(reader)
+                self.stats['bytes_rx'] += len(frame)
+                async with self._bus_lock:
+                    if self.latency > 0 or self.latency_jitter > 0:
+                        await asyncio.sleep(self.latency + self._rng.uniform(0, self.latency_jitter))
+                    response = self._process(frame)
+                if response is None:
+                    continue
+                writer.write(response)
+                await writer.drain()
+                self.stats['bytes_tx'] += len(response)
+        except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionResetError, ConnectionError):
+            # client disconnected or the simulator shuts down with open connections
+            pass
+        finally:
+            self._writers.discard(writer)
+            try:
+                writer.close()
+            except RuntimeError:
+                # event loop already closed
+                pass
+
+    def _exception(self, unit_id: int, fc: int, code: int) -> bytes:
+        self.stats['errors'] += 1
+        pdu = bytes([unit_id, fc | 0x80, code])
+        return pdu + compute_crc(pdu)
+
+    def _process(self, frame: bytes) -> bytes | None:
+        if len(frame) < 4 or compute_crc(frame[:-2]) != frame[-2:]:
+            _LOGGER.debug(f'simulator dropped invalid frame {frame.hex()}')
+            return None
+        unit_id, fc = frame[0], frame[1]
+        box = self.boxes.get(unit_id)
+        if box is None:
+            return None
+        self.stats['transactions'] += 1
+        if self.drop_rate > 0 and self._rng.random() < self.drop_rate:
+            self.stats['dropped'] += 1
+            return None
+        if self.error_rate > 0 and self._rng.random() < self.error_rate:
+            return self._exception(unit_id, fc, DEVICE_BUSY)
+
+        if fc == 0x03:
+            self.stats['reads'] += 1
+            address, count = struct.unpack('>HH', frame[2:6])
+            if count > self.max_read_count and self.drop_large_reads:
+                self.stats['dropped'] += 1
+                return None
+            if not 0 < count <= self.max_read_count:
+                return self._exception(unit_id, fc, ILLEGAL_VALUE)
+            regs = box.read(address, count)
+            if isinstance(regs, int):
+                return self._exception(unit_id, fc, regs)
+            self.stats['registers_read'] += len(regs)
+            pdu = bytes([unit_id, fc, 2 * len(regs)]) + struct.pack(f'>{len(regs)}H', *regs)
+        elif fc == 0x10:
+            self.stats['writes'] += 1
+            address, count = struct.unpack('>HH', frame[2:6])
+            values = list(struct.unpack(f'>{count}H', frame[7:7 + 2 * count]))
+            code = box.write(address, values)
+            if code is not None:
+                return self._exception(unit_id, fc, code)
+            pdu = frame[:6]
+        else:
+            return self._exception(unit_id, fc, ILLEGAL_FUNCTION)
+        return pdu + compute_crc(pdu)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BYD Battery Box Modbus simulator')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--unit-id', type=int, default=1)
+    parser.add_argument('--model', choices=list(MODELS), default='HVS')
+    parser.add_argument('--towers', type=int, default=1)
+    parser.add_argument('--modules', type=int, default=None)
+    parser.add_argument('--latency', type=float, default=0.0, help='delay per request in s')
+    parser.add_argument('--ready-delay', type=float, default=0.3, help='mailbox ready delay in s')
+    parser.add_argument('--ready-jitter', type=float, default=0.0)
+    parser.add_argument('--log-history', type=int, default=None, help='log entries per unit')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with an exception')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='share of requests not answered')
+    parser.add_argument('--max-read-count', type=int, default=MAX_READ_COUNT)
+    parser.add_argument('--drop-large-reads', action='store_true', help='do not answer reads over max read count')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG)
+    simulator = BydBoxSimulator(host=args.host, port=args.port, latency=args.latency, error_rate=args.error_rate,
+                                drop_rate=args.drop_rate, max_read_count=args.max_read_count,
+                                drop_large_reads=args.drop_large_reads, seed=args.seed)
+    simulator.add_box(unit_id=args.unit_id, model=args.model, towers=args.towers, modules=args.modules,
+                      ready_delay=args.ready_delay, ready_jitter=args.ready_jitter, log_history=args.log_history)
+    try:
+        asyncio.run(simulator.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()